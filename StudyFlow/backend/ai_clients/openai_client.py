@@ -1,25 +1,19 @@
-import openai
 import re
 import traceback
-from StudyFlow import config  # Ensures the OpenAI key is set globally
+from StudyFlow.backend.llm_client import chat
+from StudyFlow.backend.prompts import render
 from StudyFlow.logging_utils import debug_log
 
 def get_openai_answer(ocr_json):
-    prompt = (
-        "Here is the OCR output in JSON format:\n" +
-        str(ocr_json) +
-        "\nBased on the above, which answer option is correct? "
-        "Return only the number corresponding to the correct answer with no extra text."
-    )
-    debug_log("🟢 Sending prompt to OpenAI: " + prompt)
+    messages = render("answer_vote", ocr_json=ocr_json)
+    debug_log("🟢 Sending prompt to OpenAI: " + messages[-1]["content"])
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
+        ai_response = chat(
+            "openai", "gpt-4o",
+            messages,
             temperature=0.0
         )
-        ai_response = response['choices'][0]['message']['content'].strip()
         debug_log("📨 Extracted OpenAI response: " + ai_response)
 
         match = re.fullmatch(r'\s*(\d+)\s*', ai_response)
@@ -1,28 +1,41 @@
 from flask import Flask, request, jsonify, send_from_directory, render_template_string
-from PIL import Image
-from io import BytesIO
 import pytesseract
-import subprocess
 import os
 import json
-import openai
 import re
 import cv2
 import numpy as np
-import psycopg2
 import traceback
 import requests
 import stripe
 
 
+from StudyFlow.backend import db
 from StudyFlow.backend.image_processing import preprocess_image
+from StudyFlow.backend.ocr_pool import run_ocr
+from StudyFlow.backend.ocr_logic import build_tag_mapping
+from StudyFlow.backend.uploads import (
+    ImageTooLarge, open_upload_image, scale_mapping, report_peak_rss, register_upload_limits
+)
 from StudyFlow.config import TESSERACT_PATH
+from StudyFlow.backend.llm_client import chat
+from StudyFlow.backend.encoding import register_encoding
+from StudyFlow.backend.health import check_tesseract, register_health
+from StudyFlow.backend.metrics import register_metrics
+from StudyFlow.backend.model_router import register_model_router
+from StudyFlow.backend.profiler import register_profiler
+from StudyFlow.backend.prompts import render as render_prompt
+from StudyFlow.backend.rate_limit import rate_limited, register_rate_limit
+from StudyFlow.backend.response_cache import cached_chat, canonical_json, register_response_cache
 from StudyFlow.logging_utils import debug_log
+from StudyFlow.backend.study_sessions import SessionNotFound, next_session_question, register_study_sessions
 from StudyFlow.backend.submit_button_storage import register_submit_button_upload
-from StudyFlow.backend.tasks import process_question_async, celery_app
+from StudyFlow.backend.topic_packs import BANK_SCHEMA, register_topic_packs
+from StudyFlow.backend.tracing import register_tracing
+from StudyFlow.backend.warmup import next_deepflow_question, register_warmup
+from StudyFlow.backend.tasks import process_question_async, send_access_key_email_async, celery_app
 from StudyFlow.backend import tasks  # 🧠 registers the Celery task
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, MailSettings, SandBoxMode
 
 BACKEND_URL = os.environ.get("BACKEND_URL", "https://studyflowsuite.onrender.com")
 
@@ -41,66 +54,36 @@ from StudyFlow.backend.deepflow import get_deepflow_question
 # Set up Tesseract
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
 
-# Set up OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# Log Tesseract version
-try:
-    version_output = subprocess.check_output([TESSERACT_PATH, "--version"]).decode("utf-8")
-    debug_log("✅ Tesseract version output:\n" + version_output)
-except Exception as e:
-    debug_log("❌ Failed to call Tesseract: " + str(e) + "\n" + traceback.format_exc())
+# Log Tesseract version (checked once; /readyz reports the same result)
+tesseract_ok, tesseract_info = check_tesseract()
+if tesseract_ok:
+    debug_log("✅ Tesseract version output:\n" + tesseract_info)
+else:
+    debug_log("❌ Failed to call Tesseract: " + tesseract_info)
 
 app = Flask(__name__)
 
-def send_access_key_email(to_email: str, stripe_id: str) -> bool:
-    # Build your message bodies
-    html_content = (
-        "<p>Welcome to StudyFlow!</p>"
-        "<p>Your access key is:</p>"
-        f"<pre style='background:#f4f4f4;padding:8px;border-radius:4px;'>{stripe_id}</pre>"
-        "<p>Keep it safe—enter it when launching the app.</p>"
-    )
-    plain_text_content = (
-        f"Welcome to StudyFlow!\n\n"
-        f"Your access key is: {stripe_id}\n\n"
-        "Keep it safe—enter it when launching the app."
-    )
-
-    # Create the SendGrid client from env var
-    sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-
-    # Construct the Mail object
-    message = Mail(
-        from_email=Email("info@studyflowsuite.com", "StudyFlow Suite"),
-        to_emails=to_email,
-        subject="Your StudyFlow Access Key",
-        plain_text_content=plain_text_content,
-        html_content=html_content
-    )
-    # Make sure sandbox is off
-    message.mail_settings = MailSettings(sandbox_mode=SandBoxMode(enable=False))
-
-    try:
-        app.logger.debug(f"➤ Sending access key email to {to_email}")
-        response = sg.send(message)
-        app.logger.info(f"✔️  SendGrid replied {response.status_code}")
-        app.logger.debug(f"   body: {response.body}")
-        app.logger.debug(f"   headers: {response.headers}")
-        return True
-    except Exception as e:
-        app.logger.error("❌  SendGrid error sending access key email", exc_info=e)
-        return False
-
 import logging
 logging.basicConfig(level=logging.INFO)
 app.logger.setLevel(logging.INFO)
+register_encoding(app)
+register_tracing(app)
+register_profiler(app)
+register_health(app)
 register_submit_button_upload(app)
+register_upload_limits(app)
+register_rate_limit(app)
+register_response_cache(app)
+register_metrics(app)
+register_topic_packs(app)
+register_model_router(app)
+register_study_sessions(app)
+register_warmup(app)
 
 
 def init_postgres_db():
     try:
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS qa_pairs (
@@ -114,10 +97,19 @@ def init_postgres_db():
                 key   TEXT PRIMARY KEY,
                 value TEXT NOT NULL
             );
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key        TEXT PRIMARY KEY,
+                provider   TEXT NOT NULL,
+                model      TEXT NOT NULL,
+                response   TEXT NOT NULL,
+                hits       INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
         """)
+        cur.execute(BANK_SCHEMA)
         conn.commit()
         conn.close()
-        print("✅ PostgreSQL: qa_pairs and app_config tables ready.")
+        print("✅ PostgreSQL: qa_pairs, app_config, response_cache and deepflow_question_bank tables ready.")
     except Exception as e:
         print(f"❌ DB init error: {e}")
 
@@ -139,7 +131,7 @@ def process_data():
             return jsonify({"error": "No question text provided"}), 400
 
         # Connect and check cache
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute("SELECT answer, count FROM qa_pairs WHERE question = %s", (question_text,))
         row = cur.fetchone()
@@ -187,6 +179,14 @@ def process_data():
 
 from StudyFlow.logging_utils import debug_log
 
+def queue_access_key_email(email, cust_id):
+    # Sent by the email worker so a slow SendGrid call never holds up Stripe's webhook
+    try:
+        send_access_key_email_async.delay(email, cust_id)
+        app.logger.info(f"📨 Access key email queued for {email}")
+    except Exception as e:
+        app.logger.error(f"❌ Could not queue access key email to {email}: {e}")
+
 @app.route("/api/stripe_webhook", methods=["POST"])
 def stripe_webhook():
     # 1) Raw body + signature header
@@ -203,7 +203,7 @@ def stripe_webhook():
 
     # 3) Connect to Postgres
     try:
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur  = conn.cursor()
     except Exception as db_err:
         app.logger.error(f"❌ DB connection error: {db_err}")
@@ -238,10 +238,7 @@ def stripe_webhook():
             conn.commit()
             app.logger.info(f"📥 Subscription created/upserted: {cust_id} → {status}")
             
-            if send_access_key_email(email, cust_id):
-                app.logger.info(f"✅ Access key emailed to {email}")
-            else:
-                app.logger.error(f"❌ Could not email access key to {email}")
+            queue_access_key_email(email, cust_id)
 
         except Exception as e:
             app.logger.error(f"❌ Failed to upsert subscription_status: {e}")
@@ -283,10 +280,7 @@ def stripe_webhook():
     elif evt_type == "checkout.session.completed":
         cust_id = obj["customer"]
         email   = obj["customer_details"]["email"]
-        if send_access_key_email(email, cust_id):
-            app.logger.info(f"✅ Access key emailed to {email}")
-        else:
-            app.logger.error(f"❌ Could not email access key to {email}")
+        queue_access_key_email(email, cust_id)
         try:
             cur.execute(
                 """
@@ -308,15 +302,28 @@ def stripe_webhook():
     conn.close()
     return jsonify({"received": True}), 200
 
+def find_deepflow_question(topic, previous_questions, exclude_hashes=()):
+    # An unseen banked question if there is one, else a fresh one (see backend.warmup)
+    return next_deepflow_question(topic, previous_questions, get_deepflow_question, exclude_hashes)
+
+
 @app.route("/api/deepflow_question", methods=["POST"])
+@rate_limited("deepflow")
 def deepflow_question():
     try:
         data = request.get_json()
-        topic = data.get("topic", "default topic")
-        previous_questions = data.get("previous_questions", [])
-        debug_log(f"Received deepflow question request for topic '{topic}' with previous questions: {previous_questions}")
-
-        question_data = get_deepflow_question(topic, previous_questions)
+        session_id = data.get("session_id")
+        if session_id:
+            # Topic and asked questions live in the server-side session
+            try:
+                question_data, topic = next_session_question(session_id, find_deepflow_question)
+            except SessionNotFound:
+                return jsonify({"error": "Session not found or expired"}), 404
+        else:
+            topic = data.get("topic", "default topic")
+            previous_questions = data.get("previous_questions", [])
+            debug_log(f"Received deepflow question request for topic '{topic}' with previous questions: {previous_questions}")
+            question_data = find_deepflow_question(topic, previous_questions)
         if question_data is None:
             debug_log("Failed to generate deepflow question.")
             return jsonify({"error": "Failed to generate question"}), 500
@@ -335,7 +342,7 @@ def check_subscription():
         return jsonify({"error": "Missing stripe_id"}), 400
 
     try:
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute(
             "SELECT subscription_status FROM users WHERE stripe_id = %s",
@@ -356,6 +363,8 @@ def check_subscription():
 
 
 @app.route("/ocr", methods=["POST"])
+@rate_limited("ocr")
+@report_peak_rss
 def ocr_endpoint():
     debug_log("🔍 /ocr endpoint hit")
     if "image" not in request.files:
@@ -363,37 +372,20 @@ def ocr_endpoint():
         return jsonify({"error": "No image provided"}), 400
     try:
         file = request.files["image"]
-        image = Image.open(file.stream)
+        image, scale = open_upload_image(file)
         processed = preprocess_image(image)
 
-        ocr_text = pytesseract.image_to_string(processed)
-        data = pytesseract.image_to_data(
-            processed,
-            output_type=pytesseract.Output.DICT,
-            config="--psm 6 --oem 3"
-        )
-        mapping = {}
-        tag_number = 1
-        for i, txt in enumerate(data["text"]):
-            text = txt.strip()
-            try:
-                conf = float(data["conf"][i])
-            except:
-                continue
-            if text and conf > 0:
-                mapping[str(tag_number)] = {
-                    "text": text,
-                    "left": data["left"][i],
-                    "top": data["top"][i],
-                    "width": data["width"][i],
-                    "height": data["height"][i],
-                    "line_num": data["line_num"][i]
-                }
-                tag_number += 1
+        # One recognition pass gives both the plain text and the word boxes
+        result = run_ocr(processed, config="--psm 6 --oem 3")
+        # Boxes go back in the coordinates of the image the client sent
+        mapping = scale_mapping(build_tag_mapping(result.data), scale)
 
         tagged_text = " ".join(f"[{k}] {v['text']}" for k, v in mapping.items())
-        return jsonify({"ocr_text": tagged_text, "mapping": mapping})
+        return jsonify({"ocr_text": tagged_text, "plain_text": result.text, "mapping": mapping})
 
+    except ImageTooLarge as e:
+        debug_log(f"❌ {e}")
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         debug_log(f"🔥 OCR processing failed: {e}\n{traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
@@ -408,40 +400,14 @@ def layout():
 
     try:
         # 1) Let the model extract question + answers, preserving tags
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+        content = chat(
+            "openai", "gpt-3.5-turbo",
             temperature=0,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an OCR layout engine. The input text is annotated with "
-                        "bracketed numeric tags, for example:\n\n"
-                        "[12] A. Clostridium difficile\n"
-                        "[15] B. Helicobacter pylori\n"
-                        "[18] C. Helicobacter baculiformis\n"
-                        "[21] D. Vibrio vulnificus\n\n"
-                        "Extract the question and the answer options into JSON using "
-                        "exactly those same bracket numbers as both the keys and the "
-                        "`tag` values. Do NOT renumber anything.\n\n"
-                        "Return JSON in this shape:\n"
-                        "{\n"
-                        '  "question": "<the question text>",\n'
-                        '  "answers": {\n'
-                        '    "12": {"text": "A. Clostridium difficile",       "tag": 12},\n'
-                        '    "15": {"text": "B. Helicobacter pylori",        "tag": 15},\n'
-                        '    "18": {"text": "C. Helicobacter baculiformis", "tag": 18},\n'
-                        '    "21": {"text": "D. Vibrio vulnificus",         "tag": 21}\n'
-                        "  }\n"
-                        "}"
-                    )
-                },
-                {"role": "user", "content": text}
-            ]
+            messages=render_prompt("ocr_layout", text=text)
         )
 
         # 2) Parse the model’s output
-        extracted = json.loads(resp.choices[0].message.content.strip())
+        extracted = json.loads(content)
         raw_answers = extracted.get("answers", {})
 
         # 3) Remap into position-based keys "1", "2", … while keeping the original tag
@@ -506,16 +472,14 @@ def select_best_ocr():
     if len(cands) == 1:
         return jsonify({"chosen_index": 1}), 200
 
-    prompt = "Below are OCR candidate outputs:\n\n" + "\n\n".join(
-        f"Candidate {i+1}:\n{txt}" for i, txt in enumerate(cands)
-    ) + f"\n\nWhich is best? Return only the number 1–{len(cands)}."
+    candidates = "\n\n".join(f"Candidate {i+1}:\n{txt}" for i, txt in enumerate(cands))
     try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
+        content = chat(
+            "openai", "gpt-3.5-turbo",
+            render_prompt("select_best_ocr", candidates=candidates, count=len(cands)),
+            temperature=0, timeout=15
         )
-        m = re.search(r"(\d+)", resp.choices[0].message.content)
+        m = re.search(r"(\d+)", content)
         return jsonify({"chosen_index": int(m.group(1)) if m else 1}), 200
     except Exception as e:
         debug_log(f"🔥 /api/select-best-ocr error: {e}")
@@ -538,6 +502,7 @@ def receive_log():
 
 
 @app.route("/api/explanation", methods=["POST"])
+@rate_limited("explanation")
 def generate_explanation():
     try:
         data = request.get_json()
@@ -546,16 +511,12 @@ def generate_explanation():
         if ocr_json is None or idx is None:
             return jsonify({"error": "Missing data"}), 400
 
-        prompt = (
-            f"Here is the OCR output in JSON:\n{ocr_json}\n"
-            f"Explain why answer option {idx} is correct (max 100 words)."
-        )
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        explanation = cached_chat(
+            "openai", "gpt-3.5-turbo",
+            render_prompt("explanation", ocr_json=canonical_json(ocr_json), index=idx),
             temperature=0
         )
-        return jsonify({"explanation": resp.choices[0].message.content.strip()}), 200
+        return jsonify({"explanation": explanation}), 200
 
     except Exception as e:
         debug_log(f"🔥 /api/explanation error: {e}")
@@ -563,6 +524,7 @@ def generate_explanation():
 
 
 @app.route("/api/focusflow", methods=["POST"])
+@report_peak_rss
 def api_focusflow():
     try:
         from StudyFlow.backend.ocr_logic import fallback_structure, merge_ai_and_fallback
@@ -571,27 +533,11 @@ def api_focusflow():
         if "image" not in request.files:
             return jsonify({"error":"No image file provided"}), 400
         file = request.files["image"]
-        img = Image.open(file.stream).convert("RGB")
+        img, _ = open_upload_image(file)
 
         # 2️⃣ preprocess & OCR
         proc = preprocess_image(img)
-        data = pytesseract.image_to_data(proc, output_type=pytesseract.Output.DICT)
-        mapping = {}
-        tag = 1
-        for i, txt in enumerate(data["text"]):
-            w = txt.strip()
-            try: conf = float(data["conf"][i])
-            except: continue
-            if w and conf > 0:
-                mapping[str(tag)] = {
-                    "text": w,
-                    "left":   data["left"][i],
-                    "top":    data["top"][i],
-                    "width":  data["width"][i],
-                    "height": data["height"][i],
-                    "line_num": data["line_num"][i]
-                }
-                tag += 1
+        mapping = build_tag_mapping(run_ocr(proc, config="").data)
         tagged = " ".join(f"[{k}] {v['text']}" for k,v in mapping.items())
 
         # 3️⃣ layout via API
@@ -610,16 +556,11 @@ def api_focusflow():
         full = merged["answers"].get(str(idx), {}).get("text", "Unknown")
 
     # 6️⃣ Generate explanation inline
-        prompt = (
-            f"Here is the OCR output in JSON:\n{json.dumps(merged)}\n"
-            f"Explain why answer option {idx} is correct (max 100 words)."
-        )
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        explanation = cached_chat(
+            "openai", "gpt-3.5-turbo",
+            render_prompt("explanation", ocr_json=canonical_json(merged), index=idx),
             temperature=0
         )
-        explanation = resp.choices[0].message.content.strip()
 
     # 7️⃣ Return everything
         return jsonify({
@@ -629,6 +570,8 @@ def api_focusflow():
             "tagged_text": tagged
         }), 200
 
+    except ImageTooLarge as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         debug_log(f"🔥 /api/focusflow error: {e}\n{traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
@@ -719,7 +662,7 @@ def serve_button_template(filename):
 @app.route("/admin/view-qa")
 def view_qa():
     try:
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute("SELECT question, answer, timestamp, count FROM qa_pairs ORDER BY count DESC")
         rows = cur.fetchall()
@@ -758,7 +701,7 @@ def get_task_status(task_id):
 
 @app.route("/api/home_message", methods=["GET", "POST"])
 def home_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -785,7 +728,7 @@ def home_message():
 
 @app.route("/api/freeflow_message", methods=["GET", "POST"])
 def freeflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -809,7 +752,7 @@ def freeflow_message():
 
 @app.route("/api/focusflow_message", methods=["GET", "POST"])
 def focusflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -833,7 +776,7 @@ def focusflow_message():
 
 @app.route("/api/deepflow_message", methods=["GET", "POST"])
 def deepflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -857,7 +800,7 @@ def deepflow_message():
 
 @app.route("/admin/freeflow_message", methods=["GET", "POST"])
 def admin_freeflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -899,7 +842,7 @@ def admin_freeflow_message():
 
 @app.route("/admin/focusflow_message", methods=["GET", "POST"])
 def admin_focusflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -941,7 +884,7 @@ def admin_focusflow_message():
 
 @app.route("/admin/deepflow_message", methods=["GET", "POST"])
 def admin_deepflow_message():
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -985,7 +928,7 @@ def admin_deepflow_message():
 @app.route("/admin/home_message", methods=["GET", "POST"])
 def admin_home_message():
     # connect to DB
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn = db.connect()
     cur = conn.cursor()
 
     if request.method == "POST":
@@ -1,6 +1,10 @@
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_ready
+from kombu import Queue
 import os
-import psycopg2
+from StudyFlow.backend import db
+from StudyFlow.backend.tracing import register_celery_tracing
 
 print("🔍 WEB sees CELERY_BROKER_URL =", os.getenv("CELERY_BROKER_URL"))
 
@@ -15,15 +19,74 @@ celery_app = Celery(
     backend=redis_url
 )
 
+# One queue per class of work, so a backlog of slow DeepFlow generations
+# can't hold up emails or OCR answers. Run a worker per queue (or group of
+# queues) with -Q; see CELERY_QUEUES in the Dockerfile and render.yaml.
+QUEUES = ("ocr", "deepflow", "email", "celery")
+
+celery_app.conf.task_queues = [Queue(name) for name in QUEUES]
+celery_app.conf.task_default_queue = "celery"
 celery_app.conf.task_routes = {
-    "StudyFlow.backend.tasks.process_question_async": {"queue": "celery"},
+    "StudyFlow.backend.tasks.process_question_async": {"queue": "ocr"},
+    "StudyFlow.backend.tasks.send_access_key_email_async": {"queue": "email"},
+    "StudyFlow.backend.tasks.warm_trending_topics": {"queue": "deepflow"},
+    "StudyFlow.backend.tasks.warm_topic_async": {"queue": "deepflow"},
+    "StudyFlow.backend.tasks.purge_response_cache": {"queue": "deepflow"},
 }
-celery_app.conf.task_default_queue = "celery"
+
+# Pre-generate questions for trending DeepFlow topics off-peak (backend/warmup.py)
+# and trim expired response_cache rows (backend/response_cache.py).
+# Beat runs inside the worker started with CELERY_BEAT=1 (one instance only).
+celery_app.conf.timezone = "UTC"
+celery_app.conf.beat_schedule = {
+    "warm-trending-deepflow-topics": {
+        "task": "StudyFlow.backend.tasks.warm_trending_topics",
+        "schedule": crontab(minute=0, hour=int(os.getenv("WARMUP_HOUR", "3"))),
+    },
+    "purge-response-cache": {
+        "task": "StudyFlow.backend.tasks.purge_response_cache",
+        "schedule": crontab(minute=30, hour=int(os.getenv("WARMUP_HOUR", "3"))),
+    },
+}
+
+# Hard time limit; tasks get SoftTimeLimitExceeded TASK_SOFT_TIME_LIMIT seconds in
+TASK_TIME_LIMIT = int(os.getenv("CELERY_TASK_TIME_LIMIT", "120"))
+
+celery_app.conf.update(
+    # Results are polled once by /api/status; don't keep them in Redis forever
+    result_expires=int(os.getenv("CELERY_RESULT_EXPIRES", "3600")),
+    # Ack after the task finishes, so a worker that dies mid-task hands it
+    # back instead of losing it. Tasks that aren't safe to run twice opt
+    # out with acks_late=False (see tasks.py).
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Reserve one message per process at a time: long model calls would
+    # otherwise strand prefetched messages behind them.
+    worker_prefetch_multiplier=int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1")),
+    task_soft_time_limit=int(os.getenv("CELERY_TASK_SOFT_TIME_LIMIT", "90")),
+    task_time_limit=TASK_TIME_LIMIT,
+    # With late acks on Redis, a message is redelivered after this long
+    # unacked, so it must outlast the hard time limit.
+    broker_transport_options={"visibility_timeout": TASK_TIME_LIMIT * 3},
+    # Recycle worker processes now and then to cap memory creep
+    worker_max_tasks_per_child=int(os.getenv("CELERY_MAX_TASKS_PER_CHILD", "500")),
+)
+
+# Carry request traces into tasks (no-op unless TRACING is set)
+register_celery_tracing()
+
+@worker_ready.connect
+def announce_worker(sender, **kwargs):
+    # Heartbeat for /readyz and the container health check
+    from StudyFlow.backend.health import start_worker_heartbeat
+    queues = [q for q in os.getenv("CELERY_QUEUES", ",".join(QUEUES)).split(",") if q]
+    start_worker_heartbeat(sender.hostname, queues)
+
 
 # Postgres DB check (optional)
 def ensure_db_ready():
     try:
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS qa_pairs (
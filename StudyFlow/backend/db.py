@@ -0,0 +1,118 @@
+# db.py
+"""
+Postgres connections for the backend.
+
+    conn = db.connect()
+
+Every cursor adds its execute() time to the running request's DB timer
+(see track_db_time), which the metrics middleware reports per route, and
+with TRACING on each query is a span (backend.tracing).
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import psycopg2
+import psycopg2.extensions
+
+from StudyFlow.backend import tracing
+
+# [seconds, queries] for the request/task currently running in this context
+_db_time = contextvars.ContextVar("studyflow_db_time", default=None)
+
+
+def _add_db_time(seconds):
+    totals = _db_time.get()
+    if totals is not None:
+        totals[0] += seconds
+        totals[1] += 1
+
+
+def _db_span(name, query=None):
+    if not tracing.ENABLED:
+        return nullcontext()
+    attributes = {"db.statement": tracing.db_statement(query)} if query is not None else {}
+    return tracing.span(name, kind="client", **attributes)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            with _db_span("db.query", query):
+                return super().execute(query, vars)
+        finally:
+            _add_db_time(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            with _db_span("db.query", query):
+                return super().executemany(query, vars_list)
+        finally:
+            _add_db_time(time.perf_counter() - start)
+
+
+def connect(**kwargs):
+    with _db_span("db.connect"):
+        return psycopg2.connect(os.environ["DATABASE_URL"], cursor_factory=TimedCursor, **kwargs)
+
+
+# One connection per process kept open for health checks, so probes
+# never pay for (or pile up) new connections
+_ping_conn = None
+_ping_lock = threading.Lock()
+
+
+def ping():
+    """SELECT 1 on the shared health-check connection; raises if Postgres is unreachable."""
+    global _ping_conn
+    with _ping_lock:
+        try:
+            if _ping_conn is None or _ping_conn.closed:
+                _ping_conn = connect(connect_timeout=3)
+                _ping_conn.autocommit = True
+            with _ping_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+        except Exception:
+            if _ping_conn is not None:
+                _ping_conn.close()
+            _ping_conn = None
+            raise
+
+
+# One autocommit connection per process for short hot-path queries (cache
+# lookups, customer checks), so a burst of them doesn't open a connection each
+_shared_conn = None
+_shared_lock = threading.Lock()
+
+
+@contextmanager
+def shared_cursor():
+    """Cursor on the process-wide autocommit connection; reconnects after an error."""
+    global _shared_conn
+    with _shared_lock:
+        try:
+            if _shared_conn is None or _shared_conn.closed:
+                _shared_conn = connect(connect_timeout=3)
+                _shared_conn.autocommit = True
+            with _shared_conn.cursor() as cur:
+                yield cur
+        except Exception:
+            if _shared_conn is not None:
+                _shared_conn.close()
+            _shared_conn = None
+            raise
+
+
+@contextmanager
+def track_db_time():
+    """Collect DB time inside the block; yields a [seconds, queries] list."""
+    totals = [0.0, 0]
+    token = _db_time.set(totals)
+    try:
+        yield totals
+    finally:
+        _db_time.reset(token)
@@ -1,10 +1,14 @@
 # deepflow.py
-import openai
 import json
+import time
+from StudyFlow.backend.llm_client import chat
+from StudyFlow.backend.model_router import choose_model, record_outcome
+from StudyFlow.backend.prompts import render
+from StudyFlow.backend.topic_packs import is_valid_question
 
 def get_deepflow_question(topic, previous_questions):
     """
-    Generates a multiple-choice question using the OpenAI API.
+    Generates a multiple-choice question with the model backend.model_router picks for the topic.
     
     Args:
         topic (str): The topic the user wants to learn about.
@@ -14,37 +18,29 @@ def get_deepflow_question(topic, previous_questions):
         dict: A dictionary with keys "question", "options", "correct_index", and "explanation",
               or None if an error occurs.
     """
-    prompt = (
-        f"You are a helpful study assistant. The user wants to learn about '{topic}'. "
-        "Generate a multiple-choice question with 4 answer options (only one of which is correct). "
-        "Return a JSON object with the following keys:\n"
-        "  - 'question': the question text\n"
-        "  - 'options': a list of 4 answer options\n"
-        "  - 'correct_index': the 0-indexed number of the correct option\n"
-        "  - 'explanation': a brief explanation of why that answer is correct.\n"
-    )
-    
-    # If there are previous questions, include them to avoid repetition.
-    if previous_questions:
-        prompt += "Do not repeat any of the following questions: " + ", ".join(previous_questions) + "."
-    
+    messages = render("deepflow_question", topic=topic, previous_questions=previous_questions or [])
+
+    route = choose_model(topic)
+    start = time.perf_counter()
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=300,
+        result_text = chat(
+            route.provider, route.model,
+            messages,
+            max_tokens=route.max_tokens,
             temperature=0.7,
         )
     except Exception as e:
-        print("Error calling OpenAI API:", e)
+        record_outcome(route, topic, time.perf_counter() - start, False)
+        print(f"Error calling {route.name}:", e)
         return None
+    elapsed = time.perf_counter() - start
 
-    result_text = response.choices[0].message["content"]
-    
     try:
         result = json.loads(result_text)
-        return result
     except json.JSONDecodeError as e:
+        record_outcome(route, topic, elapsed, False)
         print("Error decoding JSON:", e)
         print("Received response:", result_text)
         return None
+    record_outcome(route, topic, elapsed, is_valid_question(result))
+    return result
@@ -0,0 +1,52 @@
+# emails.py
+import logging
+import os
+
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail, Email, MailSettings, SandBoxMode
+
+from StudyFlow.backend import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def send_access_key_email(to_email: str, stripe_id: str) -> bool:
+    # Build your message bodies
+    html_content = (
+        "<p>Welcome to StudyFlow!</p>"
+        "<p>Your access key is:</p>"
+        f"<pre style='background:#f4f4f4;padding:8px;border-radius:4px;'>{stripe_id}</pre>"
+        "<p>Keep it safe—enter it when launching the app.</p>"
+    )
+    plain_text_content = (
+        f"Welcome to StudyFlow!\n\n"
+        f"Your access key is: {stripe_id}\n\n"
+        "Keep it safe—enter it when launching the app."
+    )
+
+    # Create the SendGrid client from env var
+    sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+
+    # Construct the Mail object
+    message = Mail(
+        from_email=Email("info@studyflowsuite.com", "StudyFlow Suite"),
+        to_emails=to_email,
+        subject="Your StudyFlow Access Key",
+        plain_text_content=plain_text_content,
+        html_content=html_content
+    )
+    # Make sure sandbox is off
+    message.mail_settings = MailSettings(sandbox_mode=SandBoxMode(enable=False))
+
+    try:
+        logger.debug(f"➤ Sending access key email to {to_email}")
+        with tracing.span("sendgrid.send", kind="client") as span:
+            response = sg.send(message)
+            span.set_attribute("http.status_code", response.status_code)
+        logger.info(f"✔️  SendGrid replied {response.status_code}")
+        logger.debug(f"   body: {response.body}")
+        logger.debug(f"   headers: {response.headers}")
+        return True
+    except Exception as e:
+        logger.error("❌  SendGrid error sending access key email", exc_info=e)
+        return False
@@ -0,0 +1,140 @@
+# encoding.py
+"""
+How responses go over the wire: JSON encoding and compression.
+
+register_encoding(app) installs
+- a JSON provider picked by JSON_PROVIDER: "orjson" (default when the
+  package is installed) or "stdlib" (Flask's own). jsonify(), request.get_json()
+  and returning a dict from a view all go through it.
+- compression of compressible responses of at least COMPRESS_MIN_BYTES,
+  as brotli or gzip depending on the client's Accept-Encoding. Small
+  bodies go out as-is: under ~1 kB the header overhead and CPU aren't
+  worth it.
+
+Numbers for both are in benchmarks/encoding_bench.py.
+"""
+import gzip
+import os
+
+from flask.json.provider import DefaultJSONProvider
+from flask import request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Quality 5 beats gzip -6 on size for our JSON at a similar CPU cost
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+# ---------------------------------------------------------------
+# JSON
+# ---------------------------------------------------------------
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider with orjson doing the work. Output is compact and,
+    like Flask's, keys are sorted unless sort_keys is False, so cache keys
+    and response bytes don't change. numpy values from the OCR pipeline and
+    non-string dict keys are handled; any other type falls back to Flask's
+    default() (dates, UUIDs, dataclasses). Options orjson has no equivalent
+    for (separators, ensure_ascii, indent other than 2...) go to Flask's
+    stdlib encoder rather than being dropped.
+    """
+
+    base_option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def _option(self, sort_keys=None, indent=None):
+        option = self.base_option
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop("sort_keys", None)
+        indent = kwargs.pop("indent", None)
+        if kwargs or indent not in (None, 0, 2):
+            return super().dumps(obj, sort_keys=self.sort_keys if sort_keys is None else sort_keys,
+                                 indent=indent, **kwargs)
+        return self.dumps_bytes(obj, self._option(sort_keys, indent)).decode("utf-8")
+
+    def dumps_bytes(self, obj, option=None):
+        return orjson.dumps(obj, default=self.default, option=self._option() if option is None else option)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand Flask the bytes directly instead of str -> bytes again
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def json_provider_class(name=JSON_PROVIDER):
+    if name == "orjson" and orjson is not None:
+        return OrjsonProvider
+    return DefaultJSONProvider
+
+
+# ---------------------------------------------------------------
+# Compression
+# ---------------------------------------------------------------
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a werkzeug Accept-Encoding header."""
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compressible(response):
+    return (
+        not response.direct_passthrough  # files from send_from_directory stream as-is
+        and not response.is_streamed
+        and 200 <= response.status_code < 300
+        and response.status_code != 204
+        and "Content-Encoding" not in response.headers
+        and (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compress_response(response):
+    if not _compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def register_encoding(app):
+    app.json_provider_class = json_provider_class()
+    app.json = app.json_provider_class(app)
+    app.after_request(compress_response)
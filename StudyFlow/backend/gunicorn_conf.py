@@ -0,0 +1,96 @@
+# gunicorn_conf.py
+"""
+Production gunicorn settings for the web role.
+
+    gunicorn -c StudyFlow/backend/gunicorn_conf.py StudyFlow.backend.app:app
+
+- gevent workers. gevent's monkey-patching and psycogreen are applied
+  here, at the very top, because gunicorn loads this file before anything
+  else. With preload_app the app (requests, redis, ssl, psycopg2...) is
+  imported in the master, so patching in the worker would be too late.
+  psycogreen makes psycopg2 wait on the event loop instead of blocking
+  the whole worker for the length of every query.
+- The app is imported once in the master and forked (faster boots, shared
+  memory). Per-process connections and clients are dropped in post_fork so
+  no two workers share a socket.
+- Workers: WEB_CONCURRENCY, else one per available core (cgroup limits
+  included). Each one serves up to GUNICORN_WORKER_CONNECTIONS requests at once.
+- Workers are recycled after ~GUNICORN_MAX_REQUESTS requests to cap memory
+  creep, and get GUNICORN_GRACEFUL_TIMEOUT seconds to finish in-flight
+  requests on restart or deploy.
+
+Set GUNICORN_WORKER_CLASS=sync to run without gevent (no patching).
+"""
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+
+if worker_class == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def _cpu_count():
+    """Cores this container may actually use (affinity and cgroup CPU quota)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or _cpu_count())
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Longer than the slowest legitimate request (LLM_TIMEOUT with retries)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+# Stagger restarts so the workers don't all recycle at once
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    server.log.info(
+        f"✅ {workers} {worker_class} worker(s) x {worker_connections} connections, "
+        f"preload={preload_app}, max_requests={max_requests}"
+    )
+
+
+def post_fork(server, worker):
+    # Anything the master opened while importing the app belongs to the
+    # master; each worker builds its own on first use.
+    from StudyFlow import config
+    from StudyFlow.backend import db, llm_client, metrics, rate_limit
+    config.get_openai.cache_clear()
+    config.get_anthropic_client.cache_clear()
+    config.get_cohere_client.cache_clear()
+    config.get_redis_client.cache_clear()
+    llm_client._openai.cache_clear()
+    metrics._broker.cache_clear()
+    rate_limit._scripts.clear()
+    db._ping_conn = None
+    db._shared_conn = None
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (requests in flight) from /metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,197 @@
+# health.py
+"""
+Health checks for the web and worker roles.
+
+    GET /healthz   liveness: the process is up and serving. No I/O at all.
+    GET /readyz    readiness: Postgres and Redis answer a ping and Tesseract
+                   ran at startup. 503 when Postgres or Tesseract is
+                   missing; 200 with "degraded" when only Redis is down
+                   (cache and rate limiter fail open, so most routes work).
+
+Render's health check (render.yaml) uses /healthz, because failing it
+restarts the instance and a database outage shouldn't do that. /readyz
+is for dashboards and deploy gating. It reuses one long-lived Postgres
+connection for its ping and caches its result for READY_CACHE_SECONDS,
+so probes never open connections or add load however often they hit it.
+
+Celery workers write a heartbeat key to Redis every WORKER_HEARTBEAT_SECONDS
+(see start_worker_heartbeat). /readyz lists the live workers and any queue
+nobody is consuming, and `python -m StudyFlow.backend.health` exits
+non-zero when this container's role is unhealthy (for a Docker HEALTHCHECK).
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+
+from StudyFlow import config
+from StudyFlow.backend import db
+from StudyFlow.logging_utils import debug_log
+
+READY_CACHE_SECONDS = float(os.getenv("READY_CACHE_SECONDS", "5"))
+WORKER_HEARTBEAT_SECONDS = int(os.getenv("WORKER_HEARTBEAT_SECONDS", "15"))
+HEARTBEAT_PREFIX = "sf:worker:"
+
+
+# ---------------------------------------------------------------
+# Individual checks
+# ---------------------------------------------------------------
+@lru_cache(maxsize=None)
+def check_tesseract():
+    """(ok, `tesseract --version` output or the error), run once per process."""
+    try:
+        output = subprocess.check_output(
+            [config.TESSERACT_PATH, "--version"], stderr=subprocess.STDOUT, timeout=10
+        )
+        return True, output.decode("utf-8", "replace")
+    except Exception as e:
+        return False, str(e)
+
+
+def check_postgres():
+    db.ping()
+
+
+def check_redis():
+    config.get_redis_client().ping()
+
+
+def _timed(check):
+    start = time.perf_counter()
+    try:
+        check()
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+# ---------------------------------------------------------------
+# Worker heartbeats
+# ---------------------------------------------------------------
+def write_worker_heartbeat(name, queues):
+    config.get_redis_client().set(
+        f"{HEARTBEAT_PREFIX}{name}",
+        json.dumps({"queues": queues, "ts": time.time()}),
+        ex=WORKER_HEARTBEAT_SECONDS * 3,
+    )
+
+
+def start_worker_heartbeat(name, queues):
+    """Refresh this worker's heartbeat key from a daemon thread."""
+    def beat():
+        while True:
+            try:
+                write_worker_heartbeat(name, queues)
+            except Exception as e:
+                debug_log(f"⚠️ Worker heartbeat failed: {e}")
+            time.sleep(WORKER_HEARTBEAT_SECONDS)
+
+    threading.Thread(target=beat, name="worker-heartbeat", daemon=True).start()
+
+
+def worker_heartbeats():
+    """{worker name: {"queues", "age_s"}} for every worker with a live heartbeat."""
+    r = config.get_redis_client()
+    keys = list(r.scan_iter(match=f"{HEARTBEAT_PREFIX}*", count=100))
+    workers = {}
+    for key, value in zip(keys, r.mget(keys) if keys else []):
+        if value:
+            beat = json.loads(value)
+            beat["age_s"] = round(time.time() - beat.pop("ts"), 1)
+            workers[key[len(HEARTBEAT_PREFIX):]] = beat
+    return workers
+
+
+# ---------------------------------------------------------------
+# Readiness
+# ---------------------------------------------------------------
+_ready_lock = threading.Lock()
+_ready_cache = {"expires": 0.0, "result": None}
+
+
+def readiness():
+    """(payload, http status), computed at most once per READY_CACHE_SECONDS."""
+    with _ready_lock:
+        if time.monotonic() < _ready_cache["expires"]:
+            return _ready_cache["result"]
+
+        tesseract_ok, tesseract_info = check_tesseract()
+        checks = {
+            "postgres": _timed(check_postgres),
+            "redis": _timed(check_redis),
+            "tesseract": {"ok": tesseract_ok} if tesseract_ok else {"ok": False, "error": tesseract_info},
+        }
+        payload = {"checks": checks}
+        if checks["redis"]["ok"]:
+            from StudyFlow.backend.celery_worker import QUEUES
+            try:
+                workers = worker_heartbeats()
+                served = {q for w in workers.values() for q in w["queues"]}
+                payload["workers"] = workers
+                payload["queues_without_workers"] = [q for q in QUEUES if q not in served]
+            except Exception as e:
+                payload["workers"] = {"error": str(e)}
+
+        if not (checks["postgres"]["ok"] and checks["tesseract"]["ok"]):
+            payload["status"], status = "unavailable", 503
+        elif not checks["redis"]["ok"]:
+            payload["status"], status = "degraded", 200
+        else:
+            payload["status"], status = "ready", 200
+
+        _ready_cache["result"] = (payload, status)
+        _ready_cache["expires"] = time.monotonic() + READY_CACHE_SECONDS
+        return payload, status
+
+
+def register_health(app):
+    @app.route("/healthz")
+    def healthz():
+        return {"status": "ok"}, 200
+
+    @app.route("/readyz")
+    def readyz():
+        payload, status = readiness()
+        if status != 200:
+            debug_log(f"❌ /readyz: {payload}")
+        return payload, status
+
+
+# ---------------------------------------------------------------
+# Container health check:  python -m StudyFlow.backend.health
+# ---------------------------------------------------------------
+def main():
+    role = os.getenv("ROLE", "web")
+    if role == "worker":
+        # Workers are named <queue>@<hostname> (see the Dockerfile)
+        host = socket.gethostname()
+        try:
+            ages = [w["age_s"] for name, w in worker_heartbeats().items() if name.endswith(f"@{host}")]
+        except Exception as e:
+            print(f"Redis unavailable: {e}")
+            ages = []
+        healthy = bool(ages) and max(ages) < WORKER_HEARTBEAT_SECONDS * 2
+        print(f"worker heartbeat age on {host}: {max(ages) if ages else 'none'}")
+    else:
+        import urllib.request
+        if role == "flower":
+            url = f"http://127.0.0.1:{os.getenv('FLOWER_PORT', '5555')}/healthcheck"
+        else:
+            url = f"http://127.0.0.1:{os.getenv('PORT', '10000')}/healthz"
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                healthy = response.status == 200
+        except OSError as e:
+            print(f"{url} failed: {e}")
+            healthy = False
+    sys.exit(0 if healthy else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,68 @@
-from PIL import ImageOps, ImageEnhance
+from PIL import Image
+import numpy as np
+import cv2
 import os
+import random
 import time
-from StudyFlow.config import DEBUG_DIR
+from StudyFlow.config import DEBUG_DIR, DEBUG_IMAGE_SAMPLE_RATE
+from StudyFlow.backend.constants import DEFAULT_CONTRAST, DEFAULT_THRESHOLD
 from StudyFlow.logging_utils import debug_log
 
+_LEVELS = np.arange(256, dtype=np.float32)
+
+
+def _to_gray_array(image):
+    """Grayscale uint8 array from a PIL image or an RGB/gray numpy array."""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        return image
+    return np.asarray(image.convert("L"))
+
+
+def binarize(image, contrast_factor=DEFAULT_CONTRAST, threshold_val=DEFAULT_THRESHOLD):
+    """
+    Grayscale -> contrast stretch -> threshold, as one 256-entry lookup table.
+
+    Matches ImageEnhance.Contrast (blend against the mean grey level) followed
+    by `point(lambda x: 0 if x < threshold_val else 255, '1')`, but never
+    materialises the intermediate contrast image.
+    """
+    gray = _to_gray_array(image)
+    mean = int(cv2.mean(gray)[0] + 0.5)
+    enhanced = mean + contrast_factor * (_LEVELS - mean)
+    lut = (enhanced >= threshold_val).astype(np.uint8)
+    binary = cv2.LUT(np.ascontiguousarray(gray), lut)
+    return Image.fromarray(binary.view(np.bool_))
+
+
+def save_debug_image(processed, sample_rate=None):
+    """Write `processed` to DEBUG_DIR for a sampled fraction of calls (0 = never)."""
+    rate = DEBUG_IMAGE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or random.random() >= rate:
+        return None
+
+    # Default to safe directory
+    safe_debug_dir = DEBUG_DIR or "/app/debug"
+    os.makedirs(safe_debug_dir, exist_ok=True)
+
+    debug_path = os.path.join(safe_debug_dir, f"processed_{time.time_ns()}.png")
+    processed.save(debug_path)
+    debug_log(f"✅ Processed image saved to {debug_path}")
+    return debug_path
+
+
 def preprocess_image_custom(image, contrast_factor, threshold_val):
     """Preprocess an image with given contrast factor and threshold value."""
-    gray = ImageOps.grayscale(image)
-    enhancer = ImageEnhance.Contrast(gray)
-    enhanced = enhancer.enhance(contrast_factor)
-    processed = enhanced.point(lambda x: 0 if x < threshold_val else 255, '1')
-    return processed
+    return binarize(image, contrast_factor, threshold_val)
+
 
 def preprocess_image(image):
     debug_log("🔧 Starting image preprocessing.")
 
     try:
-        gray = ImageOps.grayscale(image)
-        enhancer = ImageEnhance.Contrast(gray)
-        enhanced = enhancer.enhance(3.0)
-        processed = enhanced.point(lambda x: 0 if x < 130 else 255, '1')
-
-        # Default to safe directory
-        safe_debug_dir = DEBUG_DIR or "/app/debug"
-        if not os.path.exists(safe_debug_dir):
-            os.makedirs(safe_debug_dir, exist_ok=True)
-
-        debug_path = os.path.join(safe_debug_dir, f"processed_{int(time.time())}.png")
-        processed.save(debug_path)
-        debug_log(f"✅ Processed image saved to {debug_path}")
-
+        processed = binarize(image)
+        save_debug_image(processed)
         return processed
 
     except Exception as e:
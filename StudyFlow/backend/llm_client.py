@@ -0,0 +1,214 @@
+# llm_client.py
+"""
+Single entry point for every chat-model call in the study features.
+
+    from StudyFlow.backend.llm_client import chat
+    text = chat("openai", "gpt-3.5-turbo",
+                [{"role": "user", "content": prompt}],
+                temperature=0, timeout=20)
+
+- Connections are kept alive: one pooled HTTP session/client per provider
+  per process, instead of a new TLS handshake per call.
+- Every attempt has a timeout (LLM_TIMEOUT seconds unless given).
+- Timeouts, connection errors, 429s and 5xx are retried with full-jitter
+  exponential backoff (honouring Retry-After when the provider sends one).
+- At most LLM_MAX_CONCURRENCY calls per provider are in flight at once
+  (override per provider with e.g. LLM_MAX_CONCURRENCY_OPENAI).
+- Every attempt's model, route, latency, tokens and outcome goes to
+  backend.metrics (Prometheus, /metrics), and is a span when tracing is on.
+
+Returns the reply text; raises LLMError once every attempt has failed.
+"""
+import math
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from StudyFlow import config
+from StudyFlow.backend import tracing
+from StudyFlow.logging_utils import debug_log
+
+try:
+    from StudyFlow.backend.metrics import record_llm_call
+except ImportError:  # desktop installs don't ship prometheus_client
+    def record_llm_call(*args, **kwargs):
+        pass
+
+PROVIDERS = ("openai", "anthropic", "cohere")
+
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = ("Timeout", "Connection", "RateLimit", "ServiceUnavailable", "Overloaded")
+
+
+class LLMError(RuntimeError):
+    """A model call failed for good, or never got a free slot."""
+
+
+def _max_concurrency(provider):
+    return int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", str(DEFAULT_CONCURRENCY)))
+
+
+_slots = {provider: threading.BoundedSemaphore(_max_concurrency(provider)) for provider in PROVIDERS}
+
+
+# ---------------------------------------------------------------
+# Provider adapters:
+#   (model, messages, timeout, **kwargs) -> (text, prompt_tokens, completion_tokens)
+# ---------------------------------------------------------------
+class _PooledSession(requests.Session):
+    # openai 0.28 "recycles" its session every few minutes by closing it.
+    # This one is shared by every thread, so keep its pool open instead.
+    def close(self):
+        pass
+
+
+@lru_cache(maxsize=None)
+def _openai():
+    openai = config.get_openai()
+    session = _PooledSession()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    openai.requestssession = session
+    return openai
+
+
+def _call_openai(model, messages, timeout, **kwargs):
+    response = _openai().ChatCompletion.create(
+        model=model, messages=messages, request_timeout=timeout, **kwargs
+    )
+    usage = response.get("usage") or {}
+    return (
+        response.choices[0].message["content"],
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens"),
+    )
+
+
+def _call_anthropic(model, messages, timeout, max_tokens=1024, **kwargs):
+    # Anthropic takes the system prompt as a separate argument
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    if system:
+        # backend.prompts keeps system prompts static, so let Anthropic cache them
+        kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+    response = config.get_anthropic_client().messages.create(
+        model=model,
+        messages=[m for m in messages if m["role"] != "system"],
+        max_tokens=max_tokens,
+        timeout=timeout,
+        **kwargs
+    )
+    return (
+        "".join(getattr(block, "text", "") for block in response.content),
+        response.usage.input_tokens,
+        response.usage.output_tokens,
+    )
+
+
+def _call_cohere(model, messages, timeout, **kwargs):
+    response = config.get_cohere_client().chat(
+        model=model,
+        messages=messages,
+        request_options={"timeout_in_seconds": math.ceil(timeout), "max_retries": 0},
+        **kwargs
+    )
+    tokens = response.usage.tokens if response.usage else None
+    return (
+        "".join(getattr(item, "text", "") for item in response.message.content or []),
+        tokens.input_tokens if tokens else None,
+        tokens.output_tokens if tokens else None,
+    )
+
+
+_CALLS = {
+    "openai": _call_openai,
+    "anthropic": _call_anthropic,
+    "cohere": _call_cohere,
+}
+
+
+# ---------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------
+def _status_code(exc):
+    return getattr(exc, "http_status", None) or getattr(exc, "status_code", None)
+
+
+def _is_retryable(exc):
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return any(word in type(exc).__name__ for word in RETRYABLE_ERRORS)
+
+
+def _retry_after(exc):
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt, exc):
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+
+def _record_quietly(*args):
+    try:
+        record_llm_call(*args)
+    except Exception as e:
+        debug_log(f"⚠️ Could not record LLM metrics: {e}")
+
+
+def chat(provider, model, messages, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, **kwargs):
+    """Send `messages` to `provider`/`model` and return the reply text."""
+    if provider not in _CALLS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    call = _CALLS[provider]
+    slots = _slots[provider]
+
+    for attempt in range(retries + 1):
+        # Waiting for a slot counts against the same budget as the call itself
+        if not slots.acquire(timeout=timeout):
+            raise LLMError(f"{provider}: no free slot within {timeout:.0f}s")
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"llm {provider} {model}", kind="client",
+                              **{"llm.provider": provider, "llm.model": model, "llm.attempt": attempt}) as s:
+                text, prompt_tokens, completion_tokens = call(model, messages, timeout, **kwargs)
+                s.set_attribute("llm.prompt_tokens", prompt_tokens)
+                s.set_attribute("llm.completion_tokens", completion_tokens)
+        except Exception as e:
+            final = attempt == retries or not _is_retryable(e)
+            _record_quietly(provider, model, time.perf_counter() - start,
+                            "failed" if final else "retried")
+            if final:
+                raise LLMError(f"{provider} {model}: {e}") from e
+            delay = _backoff(attempt, e)
+            debug_log(f"🔁 {provider} {model} attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+        else:
+            # Outside the try: the call succeeded (and is paid for) whatever metrics do
+            _record_quietly(provider, model, time.perf_counter() - start, "ok",
+                            prompt_tokens, completion_tokens)
+            return text.strip()
+        finally:
+            slots.release()
+        time.sleep(delay)
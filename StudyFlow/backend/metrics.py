@@ -0,0 +1,236 @@
+# metrics.py
+"""
+Prometheus metrics for the backend, served at /metrics.
+
+register_metrics(app) wraps the WSGI app in MetricsMiddleware, which
+records per-route latency, status codes, requests in flight and the time
+each request spent in Postgres (via backend.db). Celery queue depth is
+read from the broker at scrape time.
+
+Under gunicorn with more than one worker, set PROMETHEUS_MULTIPROC_DIR to
+an empty, writable directory so /metrics aggregates every worker.
+"""
+import os
+import time
+from functools import lru_cache
+
+from flask import Response, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from StudyFlow.backend.db import track_db_time
+from StudyFlow.logging_utils import debug_log
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Queues whose backlog /metrics reports (comma-separated)
+CELERY_QUEUES = [q for q in os.getenv("CELERY_METRICS_QUEUES", "ocr,deepflow,email,celery").split(",") if q]
+
+# ---------------------------------------------------------------
+# HTTP requests (recorded by MetricsMiddleware)
+# ---------------------------------------------------------------
+HTTP_REQUESTS = Counter(
+    "studyflow_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "studyflow_http_request_duration_seconds",
+    "Time from request start until the view returned",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "studyflow_http_requests_in_flight",
+    "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+HTTP_DB_TIME = Histogram(
+    "studyflow_http_request_db_seconds",
+    "Time a request spent executing Postgres queries",
+    ["route"],
+    buckets=DB_BUCKETS,
+)
+HTTP_DB_QUERIES = Counter(
+    "studyflow_http_request_db_queries_total",
+    "Postgres queries executed, by route",
+    ["route"],
+)
+
+RATE_LIMITED = Counter(
+    "studyflow_http_rate_limited_total",
+    "Requests rejected by the rate limiter (rate) or the in-flight cap (in_flight)",
+    ["route", "reason"],
+)
+
+# ---------------------------------------------------------------
+# Model calls (recorded by llm_client)
+# ---------------------------------------------------------------
+LLM_CALLS = Counter(
+    "studyflow_llm_calls_total",
+    "Model call attempts by outcome (ok, retried, failed)",
+    ["provider", "model", "route", "outcome"],
+)
+LLM_LATENCY = Histogram(
+    "studyflow_llm_latency_seconds",
+    "Wall time of a single model call attempt",
+    ["provider", "model", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "studyflow_llm_tokens",
+    "Tokens per successful model call",
+    ["provider", "model", "route", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+
+DEEPFLOW_ROUTES = Counter(
+    "studyflow_deepflow_routes_total",
+    "DeepFlow model routing decisions by model and reason (preferred, fallback, fastest, no stats)",
+    ["model", "reason"],
+)
+DEEPFLOW_SERVES = Counter(
+    "studyflow_deepflow_questions_total",
+    "DeepFlow questions served, by source: warmed (pre-generated by the warm-up job), "
+    "banked (generated earlier for another user) or generated (the user waited for the model)",
+    ["source"],
+)
+
+# ---------------------------------------------------------------
+# Response cache (recorded by response_cache)
+# ---------------------------------------------------------------
+CACHE_LOOKUPS = Counter(
+    "studyflow_response_cache_lookups_total",
+    "Response cache lookups by outcome (hit_redis, hit_postgres, miss)",
+    ["outcome"],
+)
+
+
+def current_route():
+    """Flask route pattern, or task:<name> inside a Celery task, else 'background'."""
+    if has_request_context():
+        rule = request.url_rule
+        return rule.rule if rule is not None else "unmatched"
+    from celery import current_task
+    if current_task and current_task.request.id:
+        return f"task:{current_task.name}"
+    return "background"
+
+
+def record_llm_call(provider, model, seconds, outcome, prompt_tokens=None, completion_tokens=None):
+    route = current_route()
+    LLM_CALLS.labels(provider, model, route, outcome).inc()
+    LLM_LATENCY.labels(provider, model, route).observe(seconds)
+    if prompt_tokens is not None:
+        LLM_TOKENS.labels(provider, model, route, "prompt").observe(prompt_tokens)
+    if completion_tokens is not None:
+        LLM_TOKENS.labels(provider, model, route, "completion").observe(completion_tokens)
+    debug_log(
+        f"📊 {provider} {model} [{route}] {outcome} in {seconds:.2f}s, "
+        f"tokens {prompt_tokens or 0}+{completion_tokens or 0}"
+    )
+
+
+# ---------------------------------------------------------------
+# WSGI middleware
+# ---------------------------------------------------------------
+ROUTE_ENVIRON_KEY = "studyflow.route"
+
+
+class MetricsMiddleware:
+    """
+    Times every request around the wrapped WSGI app. The route label is the
+    Flask rule (stashed in the environ by a before_request hook), so
+    /api/status/<task_id> is one series and 404 probes all land in
+    'unmatched'.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        status_holder = []
+
+        def capture_status(status, headers, exc_info=None):
+            status_holder.append(status.split(" ", 1)[0])
+            return start_response(status, headers, exc_info)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with track_db_time() as db_totals:
+                return self.wsgi_app(environ, capture_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            route = environ.get(ROUTE_ENVIRON_KEY, "unmatched")
+            method = environ.get("REQUEST_METHOD", "GET")
+            status = status_holder[0] if status_holder else "500"
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            HTTP_DB_TIME.labels(route).observe(db_totals[0])
+            HTTP_DB_QUERIES.labels(route).inc(db_totals[1])
+
+
+# ---------------------------------------------------------------
+# Celery queue depth (read from the Redis broker at scrape time)
+# ---------------------------------------------------------------
+@lru_cache(maxsize=None)
+def _broker():
+    import redis
+    from StudyFlow import config
+    broker_url = os.getenv("CELERY_BROKER_URL", config.REDIS_URL)
+    return redis.Redis.from_url(broker_url, socket_timeout=config.REDIS_SOCKET_TIMEOUT)
+
+
+class CeleryQueueCollector:
+    def collect(self):
+        depth = GaugeMetricFamily(
+            "studyflow_celery_queue_depth", "Messages waiting in each Celery queue", labels=["queue"]
+        )
+        unacked = GaugeMetricFamily(
+            "studyflow_celery_unacked", "Messages reserved by workers but not yet acknowledged"
+        )
+        try:
+            pipe = _broker().pipeline(transaction=False)
+            for queue in CELERY_QUEUES:
+                pipe.llen(queue)
+            pipe.hlen("unacked")
+            *lengths, reserved = pipe.execute()
+        except Exception as e:
+            debug_log(f"⚠️ metrics: Celery broker unavailable: {e}")
+            return
+        for queue, length in zip(CELERY_QUEUES, lengths):
+            depth.add_metric([queue], length)
+        unacked.add_metric([], reserved)
+        yield depth
+        yield unacked
+
+
+def _registry():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(CeleryQueueCollector())
+        return registry
+    return REGISTRY
+
+
+def register_metrics(app):
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        REGISTRY.register(CeleryQueueCollector())
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+    @app.before_request
+    def stash_route_for_metrics():
+        if request.url_rule is not None:
+            request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
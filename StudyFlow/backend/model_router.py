@@ -0,0 +1,259 @@
+# model_router.py
+"""
+Picks the model for each DeepFlow question.
+
+    route = choose_model(topic)
+    ... chat(route.provider, route.model, messages, max_tokens=route.max_tokens) ...
+    record_outcome(route, topic, seconds, valid)
+
+DEEPFLOW_MODELS lists the candidates best first, as provider:model
+(default openai:gpt-4-turbo,openai:gpt-4o-mini,openai:gpt-3.5-turbo,
+also used when the setting has no valid entry). For every candidate the
+router keeps, in Redis so all workers share it, over the last
+ROUTER_WINDOW_SECONDS (at most ROUTER_WINDOW calls):
+
+- the latency of its calls (any topic), and
+- per topic, whether its answers passed validation (JSON with a
+  question, options and a correct index in range).
+
+A candidate is healthy when its p95 latency is within
+DEEPFLOW_LATENCY_BUDGET seconds and its failure rate on this topic is at
+most DEEPFLOW_MAX_FAILURE_RATE (with fewer than ROUTER_MIN_SAMPLES
+measurements it gets the benefit of the doubt). The first candidate is
+used while it is healthy. Otherwise the router falls back to the healthy
+candidate with the lowest expected cost per valid question, and if none
+is healthy, to the one with the lowest p95.
+
+An unhealthy model only gets new samples when it is called, so a
+ROUTER_PROBE_RATE share of calls that would have fallen back goes to an
+unhealthy candidate instead. Together with the time window, a model that
+had a bad spell is back in use minutes after it recovers.
+
+Every decision is logged, counted in studyflow_deepflow_routes_total and
+kept in a short list shown with the current stats at /admin/deepflow-router.
+If Redis is down the first candidate is used.
+"""
+import json
+import os
+import random
+import time
+import uuid
+
+from flask import jsonify, request
+
+from StudyFlow import config
+from StudyFlow.backend.metrics import DEEPFLOW_ROUTES
+from StudyFlow.backend.profiler import admin_required
+from StudyFlow.backend.topic_packs import topic_key
+from StudyFlow.logging_utils import debug_log
+
+DEFAULT_MODELS = "openai:gpt-4-turbo,openai:gpt-4o-mini,openai:gpt-3.5-turbo"
+LATENCY_BUDGET = float(os.getenv("DEEPFLOW_LATENCY_BUDGET", "8"))
+MAX_FAILURE_RATE = float(os.getenv("DEEPFLOW_MAX_FAILURE_RATE", "0.2"))
+MAX_TOKENS = int(os.getenv("DEEPFLOW_MAX_TOKENS", "300"))
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "100"))
+ROUTER_WINDOW_SECONDS = int(os.getenv("ROUTER_WINDOW_SECONDS", "900"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "10"))
+ROUTER_PROBE_RATE = float(os.getenv("ROUTER_PROBE_RATE", "0.05"))
+DECISIONS_KEPT = 100
+
+KEY_PREFIX = "sf:router:"
+DECISIONS_KEY = "sf:router:decisions"
+
+# USD per million (prompt, completion) tokens, for ranking fallbacks
+MODEL_PRICES = {
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "claude-3-7-sonnet-20250219": (3.0, 15.0),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+    "command-r-plus-08-2024": (2.5, 10.0),
+    "command-r-08-2024": (0.15, 0.6),
+}
+# Roughly what a rendered deepflow_question prompt costs
+PROMPT_TOKENS_ESTIMATE = 250
+
+
+class Route:
+    def __init__(self, provider, model, reason):
+        self.provider = provider
+        self.model = model
+        self.reason = reason
+        self.max_tokens = MAX_TOKENS
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+
+def _parse_models(specs):
+    models = []
+    for spec in specs.split(","):
+        provider, _, model = spec.strip().partition(":")
+        if provider and model:
+            models.append((provider, model))
+    return models
+
+
+_warned_models = False
+
+
+def candidates():
+    global _warned_models
+    models = _parse_models(os.getenv("DEEPFLOW_MODELS", DEFAULT_MODELS))
+    if not models:
+        if not _warned_models:
+            debug_log(f"⚠️ DEEPFLOW_MODELS has no provider:model entries; using {DEFAULT_MODELS}")
+            _warned_models = True
+        models = _parse_models(DEFAULT_MODELS)
+    return models
+
+
+def expected_cost(model, failure_rate=0.0):
+    """Estimated USD per *valid* question (failed answers have to be paid for too)."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (10.0, 30.0))
+    cost = (PROMPT_TOKENS_ESTIMATE * prompt_price + MAX_TOKENS * completion_price) / 1e6
+    return cost / max(1.0 - (failure_rate or 0.0), 0.05)
+
+
+def _p95(samples):
+    if len(samples) < ROUTER_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def _failure_rate(outcomes):
+    if len(outcomes) < ROUTER_MIN_SAMPLES:
+        return None
+    return outcomes.count("0") / len(outcomes)
+
+
+# Samples are sorted sets scored by time; members are "<value>:<nonce>"
+def _latency_key(name):
+    return f"{KEY_PREFIX}lat:{name}"
+
+
+def _outcomes_key(name, topic):
+    return f"{KEY_PREFIX}valid:{name}:{topic_key(topic)}"
+
+
+def _values(members):
+    return [member.rsplit(":", 1)[0] for member in members]
+
+
+def model_stats(topic):
+    """{provider:model: {"p95_s", "failure_rate", "cost_usd", "samples"}} for every candidate."""
+    models = candidates()
+    since = time.time() - ROUTER_WINDOW_SECONDS
+    pipe = config.get_redis_client().pipeline(transaction=False)
+    for provider, model in models:
+        name = f"{provider}:{model}"
+        pipe.zrangebyscore(_latency_key(name), since, "+inf")
+        pipe.zrangebyscore(_outcomes_key(name, topic), since, "+inf")
+    results = pipe.execute()
+    stats = {}
+    for i, (provider, model) in enumerate(models):
+        latencies = [float(x) for x in _values(results[2 * i])]
+        failure_rate = _failure_rate(_values(results[2 * i + 1]))
+        stats[f"{provider}:{model}"] = {
+            "p95_s": _p95(latencies),
+            "failure_rate": failure_rate,
+            "cost_usd": round(expected_cost(model, failure_rate), 6),
+            "samples": len(latencies),
+        }
+    return stats
+
+
+def _decide(models, stats):
+    def healthy(name):
+        s = stats[name]
+        return ((s["p95_s"] is None or s["p95_s"] <= LATENCY_BUDGET)
+                and (s["failure_rate"] is None or s["failure_rate"] <= MAX_FAILURE_RATE))
+
+    names = [f"{p}:{m}" for p, m in models]
+    preferred = names[0]
+    if healthy(preferred):
+        return preferred, "preferred"
+
+    s = stats[preferred]
+    if s["p95_s"] is not None and s["p95_s"] > LATENCY_BUDGET:
+        why = f"{preferred} p95 {s['p95_s']:.1f}s over budget"
+    else:
+        why = f"{preferred} failing {s['failure_rate']:.0%} on topic"
+    unhealthy = [n for n in names if not healthy(n)]
+    if random.random() < ROUTER_PROBE_RATE:
+        # Unhealthy models only get fresh samples when called
+        return random.choice(unhealthy), f"probe: {why}"
+    fallbacks = [n for n in names[1:] if healthy(n)]
+    if fallbacks:
+        return min(fallbacks, key=lambda n: stats[n]["cost_usd"]), f"fallback: {why}"
+    # Nobody is healthy: at least answer quickly
+    fastest = min(names, key=lambda n: stats[n]["p95_s"] if stats[n]["p95_s"] is not None else 0.0)
+    return fastest, f"fastest: no healthy model ({why})"
+
+
+def choose_model(topic):
+    models = candidates()
+    try:
+        name, reason = _decide(models, model_stats(topic))
+    except Exception as e:
+        debug_log(f"⚠️ DeepFlow router: stats unavailable ({e}); using {models[0][1]}")
+        name, reason = f"{models[0][0]}:{models[0][1]}", "no stats"
+    provider, _, model = name.partition(":")
+    route = Route(provider, model, reason)
+
+    DEEPFLOW_ROUTES.labels(route.name, reason.split(":", 1)[0]).inc()
+    if reason != "preferred":
+        debug_log(f"🔀 DeepFlow '{topic_key(topic)}' -> {route.name} ({reason})")
+    try:
+        r = config.get_redis_client()
+        pipe = r.pipeline(transaction=False)
+        pipe.lpush(DECISIONS_KEY, json.dumps({
+            "ts": time.time(), "topic": topic_key(topic), "model": route.name, "reason": reason,
+        }))
+        pipe.ltrim(DECISIONS_KEY, 0, DECISIONS_KEPT - 1)
+        pipe.execute()
+    except Exception:
+        pass
+    return route
+
+
+def record_outcome(route, topic, seconds, valid):
+    """Feed one call's latency and validation result back into the router."""
+    now = time.time()
+    try:
+        pipe = config.get_redis_client().pipeline(transaction=False)
+        for key, value in ((_latency_key(route.name), f"{seconds:.3f}"),
+                           (_outcomes_key(route.name, topic), "1" if valid else "0")):
+            pipe.zadd(key, {f"{value}:{uuid.uuid4().hex[:8]}": now})
+            pipe.zremrangebyscore(key, "-inf", now - ROUTER_WINDOW_SECONDS)
+            pipe.zremrangebyrank(key, 0, -ROUTER_WINDOW - 1)
+            pipe.expire(key, ROUTER_WINDOW_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        debug_log(f"⚠️ DeepFlow router: could not record outcome: {e}")
+
+
+def recent_decisions(limit=DECISIONS_KEPT):
+    return [json.loads(d) for d in config.get_redis_client().lrange(DECISIONS_KEY, 0, limit - 1)]
+
+
+def register_model_router(app):
+    @app.route("/admin/deepflow-router")
+    @admin_required
+    def deepflow_router():
+        topic = request.args.get("topic", "")
+        try:
+            return jsonify({
+                "latency_budget_s": LATENCY_BUDGET,
+                "max_failure_rate": MAX_FAILURE_RATE,
+                "window_s": ROUTER_WINDOW_SECONDS,
+                "probe_rate": ROUTER_PROBE_RATE,
+                "models": model_stats(topic),
+                "decisions": recent_decisions(),
+            }), 200
+        except Exception as e:
+            debug_log(f"🔥 /admin/deepflow-router error: {e}")
+            return jsonify({"error": str(e)}), 500
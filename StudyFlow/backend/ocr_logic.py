@@ -1,6 +1,28 @@
 import difflib
 from StudyFlow.logging_utils import debug_log
 
+def build_tag_mapping(data):
+    """Number every confident OCR word: {"1": {"text", "left", ...}, ...}."""
+    mapping = {}
+    tag_number = 1
+    for i, txt in enumerate(data.get("text", [])):
+        text = txt.strip()
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            continue
+        if text and conf > 0:
+            mapping[str(tag_number)] = {
+                "text": text,
+                "left": data["left"][i],
+                "top": data["top"][i],
+                "width": data["width"][i],
+                "height": data["height"][i],
+                "line_num": data["line_num"][i]
+            }
+            tag_number += 1
+    return mapping
+
 def fallback_structure(mapping, expected_answers):
     lines = {}
     for tag, info in mapping.items():
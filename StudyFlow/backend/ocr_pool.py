@@ -0,0 +1,204 @@
+# ocr_pool.py
+import os
+import csv
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import namedtuple
+
+from StudyFlow import config
+from StudyFlow.logging_utils import debug_log
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent_monkey = None
+
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "2"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+
+# Same keys pytesseract.image_to_data(..., output_type=Output.DICT) returns,
+# so callers can switch over without touching their parsing code.
+TSV_INT_FIELDS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height",
+)
+
+# GetTSVText() omits the header row the CLI writes
+_TSV_HEADER = "\t".join(TSV_INT_FIELDS + ("conf", "text")) + "\n"
+
+OcrResult = namedtuple("OcrResult", ["text", "data"])
+
+
+def parse_tsv(tsv_text):
+    """Turn Tesseract TSV output into the dict-of-lists shape of image_to_data."""
+    rows = csv.reader(tsv_text.splitlines(), delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = next(rows, None)
+    if not header:
+        return {}
+
+    data = {key: [] for key in header}
+    for row in rows:
+        # Word text is the last column and may be missing on non-word levels
+        row = row + [""] * (len(header) - len(row))
+        for key, value in zip(header, row):
+            if key in TSV_INT_FIELDS:
+                try:
+                    value = int(value)
+                except ValueError:
+                    value = -1
+            data[key].append(value)
+    return data
+
+
+def _off_event_loop(fn, *args):
+    """
+    Run fn on a real OS thread when gevent has patched this process (the
+    gunicorn web workers), so a page being recognised doesn't freeze every
+    other request in the worker. tesserocr releases the GIL while it works.
+    """
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+def _parse_psm_oem(config):
+    """Pull --psm / --oem out of a pytesseract-style config string."""
+    psm, oem = 3, 3
+    parts = config.split()
+    for i, part in enumerate(parts[:-1]):
+        if part == "--psm":
+            psm = int(parts[i + 1])
+        elif part == "--oem":
+            oem = int(parts[i + 1])
+    return psm, oem
+
+
+class OcrPool:
+    """
+    Long-lived OCR workers that return plain text and word boxes from ONE
+    recognition pass.
+
+    With tesserocr installed, each worker is a persistent TessBaseAPI handle
+    (no process spawn per image). Without it, each call runs a single
+    `tesseract ... txt tsv` subprocess instead of the two separate
+    image_to_string / image_to_data runs. Either way at most `size` pages are
+    recognised concurrently so OCR can't eat every core on the box.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, tesseract_cmd=None):
+        self.size = max(1, size)
+        self.tesseract_cmd = tesseract_cmd or config.TESSERACT_PATH
+        self.backend = "tesserocr" if tesserocr is not None else "subprocess"
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._apis = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------
+    # tesserocr handles (created lazily, reused forever)
+    # ---------------------------------------------------------------
+    def _checkout_api(self, psm, oem):
+        try:
+            api = self._apis.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._created += 1
+                number = self._created
+            kwargs = {"oem": oem}
+            tessdata = os.getenv("TESSDATA_PREFIX")
+            if tessdata:
+                kwargs["path"] = tessdata
+            # Loading the traineddata is slow native work too
+            api = _off_event_loop(lambda: tesserocr.PyTessBaseAPI(**kwargs))
+            debug_log(f"🧵 OCR pool: started tesserocr worker #{number}")
+        api.SetPageSegMode(psm)
+        return api
+
+    @staticmethod
+    def _run_api(api, image):
+        # Only the native calls; runs on a real thread under gevent
+        api.SetImage(image)
+        api.Recognize()
+        return api.GetUTF8Text(), api.GetTSVText(0)
+
+    def _recognize_tesserocr(self, image, config):
+        # The handle queue is only touched from the caller's side; the
+        # threadpool never sees it
+        psm, oem = _parse_psm_oem(config)
+        api = self._checkout_api(psm, oem)
+        try:
+            text, tsv = _off_event_loop(self._run_api, api, image)
+        finally:
+            api.Clear()
+            self._apis.put(api)
+        return OcrResult(text, parse_tsv(_TSV_HEADER + tsv))
+
+    # ---------------------------------------------------------------
+    # Single-pass CLI fallback
+    # ---------------------------------------------------------------
+    def _recognize_subprocess(self, image, config):
+        workdir = tempfile.mkdtemp(prefix="ocr_")
+        try:
+            input_path = os.path.join(workdir, "input.png")
+            output_base = os.path.join(workdir, "output")
+            image.save(input_path)
+            cmd = [self.tesseract_cmd, input_path, output_base] + config.split() + ["txt", "tsv"]
+            subprocess.run(
+                cmd,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=OCR_TIMEOUT,
+            )
+            with open(output_base + ".txt", encoding="utf-8") as f:
+                text = f.read()
+            with open(output_base + ".tsv", encoding="utf-8") as f:
+                data = parse_tsv(f.read())
+            return OcrResult(text, data)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def recognize(self, image, config="--psm 6 --oem 3"):
+        """OCR `image` once and return OcrResult(text, data)."""
+        with self._slots:
+            if self.backend == "tesserocr":
+                return self._recognize_tesserocr(image, config)
+            return self._recognize_subprocess(image, config)
+
+    def close(self):
+        """Release any tesserocr handles (they are re-created on demand)."""
+        while True:
+            try:
+                api = self._apis.get_nowait()
+            except queue.Empty:
+                break
+            api.End()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """Process-wide OCR pool, built on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OcrPool()
+                debug_log(f"✅ OCR pool ready ({_pool.backend}, size={_pool.size})")
+    return _pool
+
+
+def run_ocr(image, config="--psm 6 --oem 3"):
+    """Convenience wrapper: one OCR pass through the shared pool."""
+    return get_ocr_pool().recognize(image, config)
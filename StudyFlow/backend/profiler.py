@@ -0,0 +1,317 @@
+# profiler.py
+"""
+On-demand sampling profiler for the live backend.
+
+    # Profile this web worker for 15 s (every thread), open in speedscope.app
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" \
+         "$BACKEND/admin/profile?seconds=15&format=speedscope" -o web.speedscope.json
+
+    # Collapsed stacks for flamegraph.pl / inferno
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" "$BACKEND/admin/profile?seconds=15&format=collapsed" \
+        | flamegraph.pl > web.svg
+
+    # Profile a single request to any route
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" -H "X-Profile: speedscope" -F image=@page.png "$BACKEND/ocr"
+    # -> X-Profile-Id: <id>;  fetch it with GET /admin/profiles/<id>
+
+A real OS thread (not a greenlet, even under gevent) reads every thread's
+Python stack with sys._current_frames() every PROFILE_INTERVAL_MS (or
+?interval_ms=, clamped to 1-100 ms). Nothing is hooked into the code
+being profiled, so the cost is that one thread waking up and walking the
+stacks. Under gevent, a sample shows
+whatever greenlet is on the CPU, or the hub when the worker is idle.
+
+Only the gunicorn worker that receives the request is profiled. Every
+endpoint needs the ADMIN_TOKEN (Authorization: Bearer or X-Admin-Token)
+and is disabled while ADMIN_TOKEN is unset. Per-request profiles keep
+only the samples taken inside that request, and the last
+PROFILE_KEEP of them stay in PROFILE_DIR.
+"""
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import Response, g, jsonify, request, send_from_directory
+
+from StudyFlow.logging_utils import debug_log
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Sampling intervals outside this range are clamped
+MIN_INTERVAL_MS, MAX_INTERVAL_MS = 1.0, 100.0
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/studyflow-profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+FORMATS = ("speedscope", "collapsed")
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# Only one whole-worker profile at a time per process
+_busy = threading.Lock()
+
+
+def _originals():
+    """start_new_thread, allocate_lock and get_ident that are never gevent-patched."""
+    import _thread
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            return (monkey.get_original("_thread", "start_new_thread"),
+                    monkey.get_original("_thread", "allocate_lock"),
+                    monkey.get_original("_thread", "get_ident"))
+    except ImportError:
+        pass
+    return _thread.start_new_thread, _thread.allocate_lock, _thread.get_ident
+
+
+# ---------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------
+class Sampler:
+    """
+    Samples Python stacks on a background OS thread.
+
+    With thread_id/root_frame, only that thread's samples taken while
+    `root_frame` is on its stack are kept (one request's samples).
+    """
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, thread_id=None, root_frame=None):
+        self.interval = min(max(interval_ms, MIN_INTERVAL_MS), MAX_INTERVAL_MS) / 1000
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.stacks = Counter()  # (thread name, (frame, ...) root first) -> samples
+        self.samples = 0
+        self.started = self.stopped = None
+        self._start_thread, allocate_lock, self._get_ident = _originals()
+        # Real (unpatched) locks: held while sampling / until the last pass is done.
+        # The sampler waits on _stop instead of sleeping, so stop() wakes it at once.
+        self._stop = allocate_lock()
+        self._done = allocate_lock()
+
+    def start(self):
+        self._stop.acquire()
+        self._done.acquire()
+        self.started = time.time()
+        self._start_thread(self._run, ())
+        return self
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to finish its current pass."""
+        if self.stopped is None:
+            self.stopped = time.time()
+            self._stop.release()
+            self._done.acquire()
+        return self
+
+    def _run(self):
+        own = self._get_ident()
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        try:
+            # The deadline stops a sampler nobody stopped (e.g. a request that never finished)
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or (self.thread_id is not None and ident != self.thread_id):
+                        continue
+                    stack = self._stack(frame)
+                    if stack:
+                        self.stacks[names.get(ident, f"thread-{ident}"), stack] += 1
+                        self.samples += 1
+                if self._stop.acquire(timeout=self.interval):
+                    break
+        finally:
+            self._done.release()
+
+    def _stack(self, frame):
+        stack = []
+        inside = self.root_frame is None
+        while frame is not None:
+            if frame is self.root_frame:
+                inside = True
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return tuple(reversed(stack)) if inside else None
+
+    # ---- output ------------------------------------------------------
+    def collapsed(self):
+        """Brendan Gregg's folded format: 'thread;root;...;leaf count' per line."""
+        lines = []
+        for (thread, stack), count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({_short_path(path)}:{line})" for name, path, line in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name):
+        """A speedscope.app file with one sampled profile per thread."""
+        frames, index = [], {}
+        profiles = {}
+        for (thread, stack), count in self.stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            profile = profiles.setdefault(thread, {
+                "type": "sampled", "name": f"{name} [{thread}]", "unit": "milliseconds",
+                "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+            })
+            weight = count * self.interval * 1000
+            profile["samples"].append(ids)
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "studyflow-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": sorted(profiles.values(), key=lambda p: p["endValue"], reverse=True),
+        }
+
+    def render(self, fmt, name):
+        if fmt == "collapsed":
+            return self.collapsed(), "text/plain; charset=utf-8", "txt"
+        return json.dumps(self.speedscope(name)), "application/json", "speedscope.json"
+
+
+def _short_path(path):
+    marker = f"{os.sep}site-packages{os.sep}"
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return os.path.relpath(path) if os.path.isabs(path) and path.startswith(os.getcwd()) else path
+
+
+# ---------------------------------------------------------------
+# Auth
+# ---------------------------------------------------------------
+def _admin_token_from_request():
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[len("Bearer "):].strip()
+    return request.headers.get("X-Admin-Token", "")
+
+
+def is_admin():
+    token = _admin_token_from_request()
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Profiling is disabled (ADMIN_TOKEN not set)"}), 404
+        if not is_admin():
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# ---------------------------------------------------------------
+# Stored per-request profiles
+# ---------------------------------------------------------------
+def save_profile(profile_id, body, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    filename = f"{profile_id}.{extension}"
+    with open(os.path.join(PROFILE_DIR, filename), "w", encoding="utf-8") as f:
+        f.write(body)
+    # Keep only the newest PROFILE_KEEP profiles
+    stored = sorted(
+        (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old in stored[PROFILE_KEEP:]:
+        os.remove(old)
+    return filename
+
+
+def register_profiler(app):
+    @app.route("/admin/profile", methods=["GET", "POST"])
+    @admin_required
+    def admin_profile():
+        try:
+            seconds = float(request.args.get("seconds", "10"))
+            interval = float(request.args.get("interval_ms", PROFILE_INTERVAL_MS))
+        except ValueError:
+            return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+        fmt = request.args.get("format", "speedscope")
+        if fmt not in FORMATS or not 0 < seconds <= PROFILE_MAX_SECONDS:
+            return jsonify({"error": f"format must be one of {FORMATS}, "
+                                     f"seconds between 0 and {PROFILE_MAX_SECONDS:g}"}), 400
+        if not _busy.acquire(blocking=False):
+            return jsonify({"error": "A profile is already running on this worker"}), 409
+        try:
+            sampler = Sampler(interval)
+            debug_log(f"🔬 Profiling worker {os.getpid()} for {seconds:g}s every {sampler.interval * 1000:g}ms")
+            sampler.start()
+            time.sleep(seconds)  # yields to other requests under gevent
+            sampler.stop()
+        finally:
+            _busy.release()
+
+        name = f"worker-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}"
+        body, mimetype, extension = sampler.render(fmt, name)
+        debug_log(f"🔬 Profile {name}: {sampler.samples} samples")
+        return Response(body, mimetype=mimetype, headers={
+            "Content-Disposition": f'attachment; filename="{name}.{extension}"',
+            "X-Profile-Samples": str(sampler.samples),
+        })
+
+    @app.route("/admin/profiles/<profile_id>")
+    @admin_required
+    def admin_stored_profile(profile_id):
+        if not _PROFILE_ID.match(profile_id):
+            return jsonify({"error": "Bad profile id"}), 400
+        for extension in ("speedscope.json", "txt"):
+            if os.path.exists(os.path.join(PROFILE_DIR, f"{profile_id}.{extension}")):
+                return send_from_directory(PROFILE_DIR, f"{profile_id}.{extension}", as_attachment=True)
+        return jsonify({"error": "Profile not found"}), 404
+
+    # Per-request profiling: X-Profile: speedscope|collapsed (admins only)
+    @app.before_request
+    def start_request_profile():
+        fmt = request.headers.get("X-Profile")
+        if not fmt or not ADMIN_TOKEN or not is_admin():
+            return
+        # The dispatch frame is on the stack for the whole request, so it
+        # tells this request's samples apart from other greenlets'
+        frame = sys._getframe()
+        while frame is not None and frame.f_code.co_name != "full_dispatch_request":
+            frame = frame.f_back
+        sampler = Sampler(thread_id=_originals()[2](), root_frame=frame)
+        g._profile = (sampler.start(), fmt if fmt in FORMATS else "speedscope")
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop("_profile", None)
+        if profile is None:
+            return response
+        sampler, fmt = profile
+        sampler.stop()
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        profile_id = (f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9]+', '-', rule).strip('-')}"
+                      f"-{os.getpid()}-{secrets.token_hex(4)}")
+        try:
+            body, _, extension = sampler.render(fmt, f"{request.method} {rule}")
+            save_profile(profile_id, body, extension)
+            response.headers["X-Profile-Id"] = profile_id
+            response.headers["X-Profile-Samples"] = str(sampler.samples)
+        except OSError as e:
+            debug_log(f"⚠️ Could not save profile for {rule}: {e}")
+        return response
+
+    @app.teardown_request
+    def drop_request_profile(exc):
+        # Requests that ended without after_request still stop their sampler
+        profile = g.pop("_profile", None)
+        if profile is not None:
+            profile[0].stop()
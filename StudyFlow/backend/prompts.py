@@ -0,0 +1,234 @@
+# prompts.py
+"""
+Versioned, precompiled prompt templates for the study features.
+
+    from StudyFlow.backend.prompts import render
+    messages = render("explanation", ocr_json=canonical_json(ocr), index=2)
+    text = chat("openai", "gpt-3.5-turbo", messages, temperature=0)
+
+Every template keeps its instructions in a static system message and puts
+what changes per call (topic, OCR JSON, candidates) last, in the user
+message. The leading tokens are then byte-identical on every call, which
+is what provider-side prompt caching keys on (OpenAI caches long shared
+prefixes automatically; llm_client marks the Anthropic system block as
+cacheable).
+
+Templates are parsed once at import, so a render is a join of literal
+parts and values; a missing or unexpected variable raises ValueError.
+A template registered with `prepare` takes the caller's inputs (e.g. a
+list of previous questions) and turns them into its placeholders, so
+versions can shape the same inputs differently.
+Each (name, version) is immutable: change a prompt by registering the next
+version. The newest version is used unless pinned, e.g.
+PROMPT_VERSION_DEEPFLOW_QUESTION=1. benchmarks/prompt_bench.py compares
+versions by token count, cacheable prefix and latency.
+"""
+import os
+from string import Formatter
+
+_formatter = Formatter()
+
+
+class PromptTemplate:
+    """One version of a prompt: [(role, text)] with {name} placeholders."""
+
+    def __init__(self, name, version, messages, prepare=None):
+        self.name = name
+        self.version = version
+        self.messages = tuple(messages)
+        self.prepare = prepare
+        self._compiled = [(role, self._compile(text)) for role, text in self.messages]
+        self.variables = frozenset(
+            field for _, parts in self._compiled for _, field in parts if field is not None
+        )
+
+    def _compile(self, text):
+        parts = []
+        for literal, field, spec, conversion in _formatter.parse(text):
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise ValueError(f"{self.key}: placeholders must be plain names, got {{{field}}}")
+            parts.append((literal, field))
+        return parts
+
+    @property
+    def key(self):
+        return f"{self.name}@v{self.version}"
+
+    @property
+    def static_prefix(self):
+        """The leading text that is identical on every call (what providers can cache)."""
+        prefix = []
+        for _, parts in self._compiled:
+            for literal, field in parts:
+                prefix.append(literal)
+                if field is not None:
+                    return "".join(prefix)
+        return "".join(prefix)
+
+    def render(self, **values):
+        """[{"role", "content"}] with `values` filled in."""
+        if self.prepare is not None:
+            try:
+                values = self.prepare(**values)
+            except TypeError as e:
+                raise ValueError(f"{self.key}: {e}") from None
+        missing = self.variables - values.keys()
+        unexpected = values.keys() - self.variables
+        if missing or unexpected:
+            raise ValueError(
+                f"{self.key}: missing {sorted(missing)}, unexpected {sorted(unexpected)}"
+            )
+        return [
+            {"role": role, "content": "".join(
+                literal + ("" if field is None else str(values[field])) for literal, field in parts
+            )}
+            for role, parts in self._compiled
+        ]
+
+
+_REGISTRY = {}
+
+
+def register(name, version, messages, prepare=None):
+    versions = _REGISTRY.setdefault(name, {})
+    if version in versions:
+        raise ValueError(f"Prompt {name}@v{version} is already registered")
+    versions[version] = PromptTemplate(name, version, messages, prepare)
+    return versions[version]
+
+
+def versions(name):
+    return sorted(_REGISTRY[name])
+
+
+def get(name, version=None):
+    """The pinned (argument, then PROMPT_VERSION_<NAME>) or newest version of `name`."""
+    if name not in _REGISTRY:
+        raise KeyError(f"Unknown prompt: {name}")
+    if version is None:
+        pinned = os.getenv(f"PROMPT_VERSION_{name.upper()}")
+        version = int(pinned) if pinned else max(_REGISTRY[name])
+    try:
+        return _REGISTRY[name][version]
+    except KeyError:
+        raise KeyError(f"Unknown prompt version: {name}@v{version}") from None
+
+
+def render(name, version=None, **values):
+    return get(name, version).render(**values)
+
+
+def all_templates():
+    return [_REGISTRY[name][v] for name in sorted(_REGISTRY) for v in versions(name)]
+
+
+# ---------------------------------------------------------------
+# Templates
+# ---------------------------------------------------------------
+# DeepFlow question generation, called with topic and previous_questions
+# (a list). v1 is the original prompt, word for word: it opened with the
+# topic, so no two topics shared more than a few tokens, and only asked
+# not to repeat questions when there were any. All versions of a prompt
+# take the same inputs, so pinning one is safe.
+def _deepflow_v1(topic, previous_questions):
+    avoid = ""
+    if previous_questions:
+        avoid = "Do not repeat any of the following questions: " + ", ".join(previous_questions) + "."
+    return {"topic": topic, "avoid": avoid}
+
+
+def _deepflow_v2(topic, previous_questions):
+    return {"topic": topic, "previous": "; ".join(previous_questions) if previous_questions else "none"}
+
+
+register("deepflow_question", 1, [
+    ("system",
+     "You are a helpful study assistant. The user wants to learn about '{topic}'. "
+     "Generate a multiple-choice question with 4 answer options (only one of which is correct). "
+     "Return a JSON object with the following keys:\n"
+     "  - 'question': the question text\n"
+     "  - 'options': a list of 4 answer options\n"
+     "  - 'correct_index': the 0-indexed number of the correct option\n"
+     "  - 'explanation': a brief explanation of why that answer is correct.\n"
+     "{avoid}"),
+], prepare=_deepflow_v1)
+
+register("deepflow_question", 2, [
+    ("system",
+     "You are a helpful study assistant. Generate a multiple-choice question with 4 answer "
+     "options (only one of which is correct) about the topic the user gives. It must not "
+     "repeat any question the user has already been asked.\n"
+     "Return only a JSON object with the following keys:\n"
+     "  - 'question': the question text\n"
+     "  - 'options': a list of 4 answer options\n"
+     "  - 'correct_index': the 0-indexed number of the correct option\n"
+     "  - 'explanation': a brief explanation of why that answer is correct."),
+    ("user", "Topic: {topic}\nAlready asked: {previous}"),
+], prepare=_deepflow_v2)
+
+# /api/explanation and /api/focusflow. v1 led with the OCR JSON.
+register("explanation", 1, [
+    ("user", "Here is the OCR output in JSON:\n{ocr_json}\n"
+             "Explain why answer option {index} is correct (max 100 words)."),
+])
+
+register("explanation", 2, [
+    ("system",
+     "You are a study assistant. The user sends an exam question and its answer options "
+     "as OCR output in JSON, and the number of the correct answer option. Explain why "
+     "that answer option is correct (max 100 words)."),
+    ("user", "Correct answer option: {index}\nOCR output in JSON:\n{ocr_json}"),
+])
+
+# The OpenAI / Claude / Cohere answer vote (ai_clients)
+register("answer_vote", 1, [
+    ("user", "Here is the OCR output in JSON format:\n{ocr_json}\n"
+             "Based on the above, which answer option is correct? "
+             "Return only the number corresponding to the correct answer with no extra text."),
+])
+
+register("answer_vote", 2, [
+    ("system",
+     "The user sends an exam question and its answer options as OCR output in JSON "
+     "format. Which answer option is correct? Return only the number corresponding to "
+     "the correct answer with no extra text."),
+    ("user", "{ocr_json}"),
+])
+
+# v1 is the original single user message
+register("select_best_ocr", 1, [
+    ("user", "Below are OCR candidate outputs:\n\n{candidates}\n\n"
+             "Which is best? Return only the number 1–{count}."),
+])
+
+register("select_best_ocr", 2, [
+    ("system",
+     "Below are OCR candidate outputs for the same image. Which is best? "
+     "Return only the candidate number."),
+    ("user", "{candidates}\n\nReturn only the number 1–{count}."),
+])
+
+# Already static; registered so it is versioned and benchmarked with the rest
+register("ocr_layout", 1, [
+    ("system",
+     "You are an OCR layout engine. The input text is annotated with "
+     "bracketed numeric tags, for example:\n\n"
+     "[12] A. Clostridium difficile\n"
+     "[15] B. Helicobacter pylori\n"
+     "[18] C. Helicobacter baculiformis\n"
+     "[21] D. Vibrio vulnificus\n\n"
+     "Extract the question and the answer options into JSON using "
+     "exactly those same bracket numbers as both the keys and the "
+     "`tag` values. Do NOT renumber anything.\n\n"
+     "Return JSON in this shape:\n"
+     "{{\n"
+     '  "question": "<the question text>",\n'
+     '  "answers": {{\n'
+     '    "12": {{"text": "A. Clostridium difficile",       "tag": 12}},\n'
+     '    "15": {{"text": "B. Helicobacter pylori",        "tag": 15}},\n'
+     '    "18": {{"text": "C. Helicobacter baculiformis", "tag": 18}},\n'
+     '    "21": {{"text": "D. Vibrio vulnificus",         "tag": 21}}\n'
+     "  }}\n"
+     "}}"),
+    ("user", "{text}"),
+])
@@ -0,0 +1,235 @@
+# rate_limit.py
+"""
+Rate limiting and load shedding for the expensive endpoints, shared by
+every gunicorn worker through Redis.
+
+    @app.route("/api/deepflow_question", methods=["POST"])
+    @rate_limited("deepflow")
+    def deepflow_question(): ...
+
+- Token bucket per client and endpoint: RATE_LIMIT_PER_MINUTE tokens a
+  minute, up to RATE_LIMIT_BURST at once (override per endpoint with e.g.
+  RATE_LIMIT_OCR=20/5 for 20 a minute, burst 5). Over the limit -> 429.
+- Clients are identified by stripe_id (query string, JSON body or the
+  X-Stripe-Id header) once it is found in `users` (cached in Redis), and
+  otherwise by IP. Uncached IDs cost a Postgres query, so those lookups
+  have their own per-IP bucket (RATE_LIMIT_CUSTOMER_LOOKUP, default 10/5);
+  past it the request is simply counted against the IP. The IP is the address the last PROXY_HOPS proxies saw
+  (ProxyFix, see register_rate_limit); the client can write anything in
+  the earlier X-Forwarded-For entries.
+- At most MAX_IN_FLIGHT requests to rate-limited endpoints run at once
+  across all workers; the rest get an immediate 503 instead of queueing
+  until gunicorn kills the worker.
+
+Both rejections carry Retry-After. Each check is a single Lua script run
+on the Redis server, so workers never race. If Redis is unreachable
+requests are let through: the limiter must never be what takes the API
+down.
+"""
+import math
+import os
+import uuid
+from functools import wraps
+
+from flask import jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from StudyFlow import config
+from StudyFlow.backend import db
+from StudyFlow.backend.metrics import RATE_LIMITED
+from StudyFlow.logging_utils import debug_log
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+DEFAULT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+DEFAULT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "32"))
+# A slot older than this belonged to a worker that died mid-request
+IN_FLIGHT_STALE_SECONDS = int(os.getenv("IN_FLIGHT_STALE_SECONDS", "180"))
+IN_FLIGHT_RETRY_AFTER = int(os.getenv("IN_FLIGHT_RETRY_AFTER", "2"))
+# Proxies in front of gunicorn that append to X-Forwarded-For (Render: 1)
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", "1"))
+CUSTOMER_CACHE_SECONDS = int(os.getenv("RATE_LIMIT_CUSTOMER_CACHE_SECONDS", "600"))
+LOOKUP_PER_MINUTE, LOOKUP_BURST = 10, 5
+
+KEY_PREFIX = "sf:rl:"
+CUSTOMER_PREFIX = "sf:rl:known:"
+IN_FLIGHT_KEY = "sf:inflight"
+
+# KEYS[1] bucket hash; ARGV rate (tokens/s), burst, cost
+# -> {allowed, seconds until enough tokens}
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, (cost - tokens) / rate
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed, wait = 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+# KEYS[1] sorted set of slot -> start time; ARGV limit, stale seconds, slot id
+_ACQUIRE_SLOT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    # register_script runs EVALSHA and reloads the script if Redis lost it
+    if source not in _scripts:
+        _scripts[source] = config.get_redis_client().register_script(source)
+    return _scripts[source]
+
+
+def _limits(name, per_minute, burst):
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if override:
+        rate, _, override_burst = override.partition("/")
+        per_minute = float(rate)
+        burst = int(override_burst) if override_burst else burst
+    return per_minute or DEFAULT_PER_MINUTE, burst or DEFAULT_BURST
+
+
+def cached_customer(stripe_id):
+    """True/False from the Redis cache, None if `stripe_id` hasn't been looked up lately."""
+    try:
+        cached = config.get_redis_client().get(CUSTOMER_PREFIX + stripe_id)
+    except Exception:
+        return None
+    return None if cached is None else cached == "1"
+
+
+def known_customer(stripe_id):
+    """Look `stripe_id` up in `users` and cache the answer in Redis either way."""
+    ttl = CUSTOMER_CACHE_SECONDS
+    try:
+        # Shared connection: a burst of lookups must not open one each
+        with db.shared_cursor() as cur:
+            cur.execute("SELECT 1 FROM users WHERE stripe_id = %s", (stripe_id,))
+            known = cur.fetchone() is not None
+    except Exception as e:
+        # Don't try Postgres on every request while it's down; use the IP for a minute
+        debug_log(f"⚠️ Rate limiter could not look up customer, using IP: {e}")
+        known, ttl = False, 60
+    try:
+        config.get_redis_client().set(CUSTOMER_PREFIX + stripe_id, "1" if known else "0", ex=ttl)
+    except Exception:
+        pass
+    return known
+
+
+def client_key():
+    """The stripe_id if it belongs to a customer, else the client's IP address."""
+    stripe_id = request.args.get("stripe_id") or request.headers.get("X-Stripe-Id")
+    if not stripe_id and request.is_json:
+        body = request.get_json(silent=True)
+        stripe_id = body.get("stripe_id") if isinstance(body, dict) else None
+    # remote_addr is the hop our own proxy appended (ProxyFix)
+    ip_key = f"ip:{request.remote_addr}"
+    # A made-up ID would otherwise get a fresh bucket on every call
+    if not (isinstance(stripe_id, str) and 0 < len(stripe_id) <= 255):
+        return ip_key
+    known = cached_customer(stripe_id)
+    if known is None:
+        # Random IDs all miss the cache; only so many may reach Postgres per IP
+        per_minute, burst = _limits("customer_lookup", LOOKUP_PER_MINUTE, LOOKUP_BURST)
+        if take_token("customer_lookup", ip_key, per_minute, burst):
+            return ip_key
+        known = known_customer(stripe_id)
+    return f"cus:{stripe_id}" if known else ip_key
+
+
+def take_token(name, client, per_minute, burst, cost=1):
+    """Seconds to wait before `client` may call `name` again (0 = go ahead)."""
+    try:
+        allowed, wait = _script(_TOKEN_BUCKET)(
+            keys=[f"{KEY_PREFIX}{name}:{client}"], args=[per_minute / 60, burst, cost]
+        )
+    except Exception as e:
+        debug_log(f"⚠️ Rate limiter unavailable, letting request through: {e}")
+        return 0
+    return 0 if int(allowed) else float(wait)
+
+
+def acquire_slot():
+    """Slot id, None when every slot is busy, or "" if Redis can't be asked."""
+    slot = uuid.uuid4().hex
+    try:
+        ok = _script(_ACQUIRE_SLOT)(
+            keys=[IN_FLIGHT_KEY], args=[MAX_IN_FLIGHT, IN_FLIGHT_STALE_SECONDS, slot]
+        )
+    except Exception as e:
+        debug_log(f"⚠️ In-flight guard unavailable, letting request through: {e}")
+        return ""
+    return slot if int(ok) else None
+
+
+def release_slot(slot):
+    if not slot:
+        return
+    try:
+        config.get_redis_client().zrem(IN_FLIGHT_KEY, slot)
+    except Exception as e:
+        # The slot ages out after IN_FLIGHT_STALE_SECONDS
+        debug_log(f"⚠️ Could not release in-flight slot: {e}")
+
+
+def _reject(status, message, retry_after, reason):
+    RATE_LIMITED.labels(request.url_rule.rule if request.url_rule else "unmatched", reason).inc()
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def rate_limited(name, per_minute=None, burst=None):
+    """Token-bucket limit per client plus the global in-flight cap for a route."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+
+            client = client_key()
+            rate, capacity = _limits(name, per_minute, burst)
+            wait = take_token(name, client, rate, capacity)
+            if wait:
+                retry_after = max(1, math.ceil(wait))
+                debug_log(f"🚦 {name}: {client} rate limited, retry in {retry_after}s")
+                return _reject(429, "Too many requests", retry_after, "rate")
+
+            slot = acquire_slot()
+            if slot is None:
+                debug_log(f"🚦 {name}: {MAX_IN_FLIGHT} requests already in flight, shedding {client}")
+                return _reject(503, "Server busy, try again shortly", IN_FLIGHT_RETRY_AFTER, "in_flight")
+            try:
+                return view(*args, **kwargs)
+            finally:
+                release_slot(slot)
+        return wrapper
+    return decorator
+
+
+def register_rate_limit(app):
+    """Take the client address from the hops our proxies appended, not the client's own."""
+    if PROXY_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
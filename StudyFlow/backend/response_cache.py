@@ -0,0 +1,200 @@
+# response_cache.py
+"""
+Content-addressed cache for deterministic model calls (explanations).
+
+    explanation = cached_chat("openai", "gpt-3.5-turbo", messages, temperature=0)
+
+The key is a SHA-256 of provider, model, call options and the prompt after
+normalisation (Unicode NFC, whitespace collapsed), so the same
+(question, option) pair hits however the OCR JSON was spaced.
+
+Lookups go Redis -> Postgres -> model:
+- Redis holds hot entries with a sliding TTL (every hit renews it). All
+  keys carry a TTL, so with `maxmemory-policy volatile-lru` Redis evicts
+  the least recently used ones and never Celery's queue keys.
+- Postgres (`response_cache` table) keeps what Redis has evicted; a
+  Postgres hit is promoted back into Redis. Rows older than
+  RESPONSE_CACHE_PG_TTL are deleted by a daily beat task (purge_expired).
+
+Either store being down just means a miss. Hit/miss counters live in a
+Redis hash so every worker reports the same rates (see stats()), and in
+studyflow_response_cache_lookups_total on /metrics.
+"""
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+from flask import jsonify
+
+from StudyFlow import config
+from StudyFlow.backend import db
+from StudyFlow.backend.llm_client import chat
+from StudyFlow.backend.metrics import CACHE_LOOKUPS
+from StudyFlow.backend.profiler import admin_required
+from StudyFlow.logging_utils import debug_log
+
+REDIS_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+POSTGRES_TTL = int(os.getenv("RESPONSE_CACHE_PG_TTL", str(180 * 24 * 3600)))
+KEY_PREFIX = "sf:llm:"
+STATS_KEY = "sf:llm:stats"
+
+# Call options that don't change the answer, so they stay out of the key
+_TRANSPORT_OPTIONS = ("timeout", "retries")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", str(text))).strip()
+
+
+def canonical_json(value):
+    """Stable text for a JSON document given as a dict or a JSON string."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return normalize_prompt(value)
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def cache_key(provider, model, messages, **options):
+    payload = json.dumps({
+        "provider": provider,
+        "model": model,
+        "options": {k: v for k, v in options.items() if k not in _TRANSPORT_OPTIONS},
+        "messages": [[m["role"], normalize_prompt(m["content"])] for m in messages],
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------
+# Redis tier
+# ---------------------------------------------------------------
+def _redis_get(key):
+    try:
+        pipe = config.get_redis_client().pipeline(transaction=False)
+        pipe.get(KEY_PREFIX + key)
+        pipe.expire(KEY_PREFIX + key, REDIS_TTL)
+        value, _ = pipe.execute()
+        return value
+    except Exception as e:
+        debug_log(f"⚠️ response cache: Redis get failed: {e}")
+        return None
+
+
+def _redis_set(key, value):
+    try:
+        config.get_redis_client().set(KEY_PREFIX + key, value, ex=REDIS_TTL)
+    except Exception as e:
+        debug_log(f"⚠️ response cache: Redis set failed: {e}")
+
+
+def _count(outcome):
+    CACHE_LOOKUPS.labels(outcome).inc()
+    try:
+        config.get_redis_client().hincrby(STATS_KEY, outcome, 1)
+    except Exception:
+        pass
+
+
+# ---------------------------------------------------------------
+# Postgres tier
+# ---------------------------------------------------------------
+def _pg_get(key):
+    try:
+        with db.shared_cursor() as cur:
+            cur.execute("""
+                UPDATE response_cache SET hits = hits + 1
+                WHERE key = %s AND created_at > NOW() - %s * INTERVAL '1 second'
+                RETURNING response
+            """, (key, POSTGRES_TTL))
+            row = cur.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        debug_log(f"⚠️ response cache: Postgres get failed: {e}")
+        return None
+
+
+def _pg_set(key, provider, model, value):
+    try:
+        with db.shared_cursor() as cur:
+            cur.execute("""
+                INSERT INTO response_cache (key, provider, model, response)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (key)
+                DO UPDATE SET response = EXCLUDED.response, created_at = CURRENT_TIMESTAMP
+            """, (key, provider, model, value))
+    except Exception as e:
+        debug_log(f"⚠️ response cache: Postgres set failed: {e}")
+
+
+def purge_expired():
+    """Delete Postgres entries older than RESPONSE_CACHE_PG_TTL; returns how many went."""
+    conn = db.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM response_cache WHERE created_at < NOW() - %s * INTERVAL '1 second'",
+            (POSTGRES_TTL,),
+        )
+        deleted = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    debug_log(f"🧹 response cache: purged {deleted} expired rows")
+    return deleted
+
+
+# ---------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------
+def cached_chat(provider, model, messages, **kwargs):
+    """
+    llm_client.chat() behind the cache. Only for deterministic calls
+    (temperature=0); anything sampled would be frozen at its first answer.
+    """
+    key = cache_key(provider, model, messages, **kwargs)
+
+    text = _redis_get(key)
+    if text is not None:
+        _count("hit_redis")
+        return text
+
+    text = _pg_get(key)
+    if text is not None:
+        _count("hit_postgres")
+        _redis_set(key, text)
+        return text
+
+    _count("miss")
+    text = chat(provider, model, messages, **kwargs)
+    _redis_set(key, text)
+    _pg_set(key, provider, model, text)
+    return text
+
+
+def stats():
+    try:
+        counts = config.get_redis_client().hgetall(STATS_KEY)
+    except Exception as e:
+        debug_log(f"⚠️ response cache: stats unavailable: {e}")
+        counts = {}
+    hits_redis = int(counts.get("hit_redis", 0))
+    hits_postgres = int(counts.get("hit_postgres", 0))
+    misses = int(counts.get("miss", 0))
+    lookups = hits_redis + hits_postgres + misses
+    return {
+        "hits_redis": hits_redis,
+        "hits_postgres": hits_postgres,
+        "misses": misses,
+        "hit_rate": round((hits_redis + hits_postgres) / lookups, 4) if lookups else None,
+    }
+
+
+def register_response_cache(app):
+    @app.route("/admin/cache-stats")
+    @admin_required
+    def response_cache_stats():
+        return jsonify(stats()), 200
@@ -0,0 +1,255 @@
+# study_sessions.py
+"""
+Server-side DeepFlow sessions in Redis.
+
+    POST /api/deepflow/session                  {"topic", "stripe_id"?} -> session
+    GET  /api/deepflow/session/<id>             resume: topic, score, current question
+    POST /api/deepflow/session/<id>/shown       {"question"}: an offline pack question is on screen
+    POST /api/deepflow/session/<id>/answer      {"question", "answer_index"} -> updated score
+    POST /api/deepflow_question                 {"session_id"} -> next question
+
+A session is a Redis hash (topic, score, answered, current question) plus
+a set of hashes of every question it has seen and a short list of the
+most recent question texts, which go into the prompt so the model
+doesn't repeat itself. The client only holds the session ID, so any
+device with the ID can pick the session up where it was left. All keys
+expire SESSION_TTL seconds after the session was last used.
+
+Scores are counted once per question (answering the same question twice
+doesn't count twice), and only for questions the session has asked. Every
+answer is checked against a correct index the server holds, never one the
+client sends. Questions the desktop app took from an offline topic pack
+are reported through /shown first: they must be in the question bank for
+the session's topic (packs are built from it), which supplies the correct
+index, and the backend won't generate them again. Anything else gets 409.
+"""
+import json
+import os
+import re
+import secrets
+import time
+
+from flask import jsonify, request
+
+from StudyFlow import config
+from StudyFlow.backend.topic_packs import banked_answer, question_hash, topic_key
+from StudyFlow.logging_utils import debug_log
+
+SESSION_TTL = int(os.getenv("DEEPFLOW_SESSION_TTL", str(7 * 24 * 3600)))
+# Recent questions sent to the model as "already asked"
+PROMPT_HISTORY = int(os.getenv("DEEPFLOW_PROMPT_HISTORY", "20"))
+
+KEY_PREFIX = "sf:session:"
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+class UnknownQuestion(ValueError):
+    """A question this session never asked, or a pack question that isn't banked."""
+
+
+def _keys(session_id):
+    if not _SESSION_ID.match(str(session_id)):
+        raise SessionNotFound(session_id)
+    base = f"{KEY_PREFIX}{session_id}"
+    # :answers maps the hash of each question asked to its correct_index
+    return base, f"{base}:asked", f"{base}:scored", f"{base}:recent", f"{base}:answers"
+
+
+def _touch(pipe, session_id):
+    for key in _keys(session_id):
+        pipe.expire(key, SESSION_TTL)
+
+
+def create_session(topic, stripe_id=None):
+    session_id = secrets.token_urlsafe(16)
+    now = time.time()
+    state = {"topic": str(topic).strip(), "score": 0, "answered": 0, "created": now, "updated": now}
+    if stripe_id:
+        state["stripe_id"] = stripe_id
+    pipe = config.get_redis_client().pipeline()
+    pipe.hset(_keys(session_id)[0], mapping=state)
+    _touch(pipe, session_id)
+    pipe.execute()
+    return session_id
+
+
+def get_session(session_id):
+    """The session's public state; raises SessionNotFound once it has expired."""
+    base, asked = _keys(session_id)[:2]
+    pipe = config.get_redis_client().pipeline()
+    pipe.hgetall(base)
+    pipe.scard(asked)
+    state, asked_count = pipe.execute()
+    if not state:
+        raise SessionNotFound(session_id)
+    return {
+        "session_id": session_id,
+        "topic": state["topic"],
+        "score": int(state.get("score", 0)),
+        "answered": int(state.get("answered", 0)),
+        "asked": asked_count,
+        "current_question": json.loads(state["current"]) if state.get("current") else None,
+    }
+
+
+def prompt_context(session_id):
+    """
+    (topic, recent question texts, hashes of every question asked) for the
+    session's next question: the texts go into the prompt, the hashes keep
+    banked questions from repeating.
+    """
+    base, asked, _, recent, _ = _keys(session_id)
+    pipe = config.get_redis_client().pipeline()
+    pipe.hget(base, "topic")
+    pipe.lrange(recent, 0, PROMPT_HISTORY - 1)
+    pipe.smembers(asked)
+    topic, previous, asked_hashes = pipe.execute()
+    if topic is None:
+        raise SessionNotFound(session_id)
+    return topic, previous, set(asked_hashes)
+
+
+def record_question(session_id, question):
+    """Remember a question the session has been shown. Returns False if it had seen it already."""
+    base, asked, _, recent, answers = _keys(session_id)
+    r = config.get_redis_client()
+    qhash = question_hash(question["question"])
+    if not r.sadd(asked, qhash):
+        return False
+    pipe = r.pipeline()
+    correct_index = question.get("correct_index")
+    pipe.hset(answers, qhash, correct_index if isinstance(correct_index, int) else -1)
+    pipe.lpush(recent, question["question"])
+    pipe.ltrim(recent, 0, PROMPT_HISTORY - 1)
+    pipe.hset(base, mapping={"current": json.dumps(question), "updated": time.time()})
+    _touch(pipe, session_id)
+    pipe.execute()
+    return True
+
+
+def record_shown(session_id, question_text):
+    """An offline pack question is on screen: don't generate it again, and accept its answer."""
+    base, asked, _, recent, answers = _keys(session_id)
+    r = config.get_redis_client()
+    topic = r.hget(base, "topic")
+    if topic is None:
+        raise SessionNotFound(session_id)
+    qhash = question_hash(question_text)
+    if r.hget(answers, qhash) is None:
+        correct_index = banked_answer(topic, qhash)
+        if correct_index is None:
+            raise UnknownQuestion("This question is not in the topic's question bank")
+        r.hset(answers, qhash, correct_index)
+    pipe = r.pipeline()
+    if r.sadd(asked, qhash):
+        pipe.lpush(recent, question_text)
+        pipe.ltrim(recent, 0, PROMPT_HISTORY - 1)
+    pipe.hset(base, "updated", time.time())
+    _touch(pipe, session_id)
+    pipe.execute()
+    return get_session(session_id)
+
+
+def record_answer(session_id, question_text, answer_index):
+    """Score an answer once per question, against the correct_index stored when it was asked."""
+    base, _, scored, _, answers = _keys(session_id)
+    r = config.get_redis_client()
+    if not r.exists(base):
+        raise SessionNotFound(session_id)
+    qhash = question_hash(question_text)
+    expected = r.hget(answers, qhash)
+    if expected is None:
+        raise UnknownQuestion("This question was not asked in this session")
+    pipe = r.pipeline()
+    if r.sadd(scored, qhash):
+        pipe.hincrby(base, "answered", 1)
+        if int(answer_index) == int(expected):
+            pipe.hincrby(base, "score", 1)
+    pipe.hset(base, "updated", time.time())
+    _touch(pipe, session_id)
+    pipe.execute()
+    return get_session(session_id)
+
+
+def next_session_question(session_id, generate):
+    """
+    Get the session's next question with generate(topic, previous,
+    exclude_hashes) and record it. A repeat of something already asked is
+    retried once; if that repeats too, the question is None.
+    """
+    topic, previous, asked_hashes = prompt_context(session_id)
+    for _ in range(2):
+        question = generate(topic, previous, exclude_hashes=asked_hashes)
+        if question is None:
+            return None, topic
+        if record_question(session_id, question):
+            return question, topic
+        debug_log(f"🔁 DeepFlow session {session_id[:6]}: repeated question, retrying")
+        previous = [question["question"]] + previous
+        asked_hashes.add(question_hash(question["question"]))
+    return None, topic
+
+
+def register_study_sessions(app):
+    @app.route("/api/deepflow/session", methods=["POST"])
+    def deepflow_session_create():
+        data = request.get_json(silent=True) or {}
+        topic = str(data.get("topic", "")).strip()
+        if not topic:
+            return jsonify({"error": "topic is required"}), 400
+        try:
+            session_id = create_session(topic, data.get("stripe_id"))
+            debug_log(f"🆕 DeepFlow session {session_id[:6]} for '{topic_key(topic)}'")
+            return jsonify(get_session(session_id)), 201
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/session error: {e}")
+            return jsonify({"error": "Session store unavailable"}), 503
+
+    @app.route("/api/deepflow/session/<session_id>")
+    def deepflow_session_get(session_id):
+        try:
+            return jsonify(get_session(session_id)), 200
+        except SessionNotFound:
+            return jsonify({"error": "Session not found or expired"}), 404
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/session/{session_id} error: {e}")
+            return jsonify({"error": "Session store unavailable"}), 503
+
+    @app.route("/api/deepflow/session/<session_id>/shown", methods=["POST"])
+    def deepflow_session_shown(session_id):
+        data = request.get_json(silent=True) or {}
+        question = data.get("question")
+        if not isinstance(question, str) or not question.strip():
+            return jsonify({"error": "question is required"}), 400
+        try:
+            return jsonify(record_shown(session_id, question)), 200
+        except SessionNotFound:
+            return jsonify({"error": "Session not found or expired"}), 404
+        except UnknownQuestion as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/session/{session_id}/shown error: {e}")
+            return jsonify({"error": "Session store unavailable"}), 503
+
+    @app.route("/api/deepflow/session/<session_id>/answer", methods=["POST"])
+    def deepflow_session_answer(session_id):
+        data = request.get_json(silent=True) or {}
+        question = data.get("question")
+        answer_index = data.get("answer_index")
+        if not isinstance(question, str) or not question.strip() or answer_index is None:
+            return jsonify({"error": "question and answer_index are required"}), 400
+        if isinstance(answer_index, bool) or not isinstance(answer_index, int):
+            return jsonify({"error": "answer_index must be an integer"}), 400
+        try:
+            return jsonify(record_answer(session_id, question, answer_index)), 200
+        except SessionNotFound:
+            return jsonify({"error": "Session not found or expired"}), 404
+        except UnknownQuestion as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/session/{session_id}/answer error: {e}")
+            return jsonify({"error": "Session store unavailable"}), 503
@@ -1,10 +1,12 @@
 from StudyFlow.backend.celery_worker import celery_app
 from StudyFlow.backend.ai_manager import triple_call_ai_api_json_final
-import psycopg2
-import os
+from StudyFlow.backend import db, response_cache, warmup
+from StudyFlow.backend.deepflow import get_deepflow_question
+from StudyFlow.backend.emails import send_access_key_email
 import json
 
-@celery_app.task(name="StudyFlow.backend.tasks.process_question_async")
+# Not safe to run twice (three more model votes, count bumped again), so it acks on receipt
+@celery_app.task(name="StudyFlow.backend.tasks.process_question_async", acks_late=False)
 def process_question_async(ocr_json):
     try:
         print("🚀 Task started.")
@@ -31,7 +33,7 @@ def process_question_async(ocr_json):
             raise ValueError(f"Chosen answer text is empty for index {chosen_index}. Answers dict: {json.dumps(answers, indent=2)}")
 
         # Insert or update into Postgres
-        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        conn = db.connect()
         cur = conn.cursor()
         try:
             cur.execute("""
@@ -50,3 +52,38 @@ def process_question_async(ocr_json):
 
     except Exception as e:
         print("❌ Error in task:", str(e))
+
+
+@celery_app.task(name="StudyFlow.backend.tasks.warm_trending_topics")
+def warm_trending_topics():
+    """Beat job (celery_worker.beat_schedule): queue a warm-up for each trending topic."""
+    topics = warmup.trending_topics()
+    for topic, _ in topics:
+        warm_topic_async.delay(topic)
+    warmup.record_run({"topics": [{"topic": t, "requests": n} for t, n in topics]})
+    print(f"🌅 Queued warm-up for {len(topics)} trending DeepFlow topics")
+    return len(topics)
+
+
+# Runs several generations back to back, so it gets longer limits
+@celery_app.task(name="StudyFlow.backend.tasks.warm_topic_async",
+                 soft_time_limit=240, time_limit=300)
+def warm_topic_async(topic):
+    return warmup.warm_topic(topic, get_deepflow_question)
+
+
+@celery_app.task(name="StudyFlow.backend.tasks.purge_response_cache")
+def purge_response_cache():
+    """Beat job: drop response_cache rows past RESPONSE_CACHE_PG_TTL."""
+    return response_cache.purge_expired()
+
+
+# Sending twice is worse than a retry, so this one acks on receipt
+@celery_app.task(name="StudyFlow.backend.tasks.send_access_key_email_async",
+                 bind=True, acks_late=False, max_retries=3, default_retry_delay=60,
+                 soft_time_limit=30, time_limit=45)
+def send_access_key_email_async(self, to_email, stripe_id):
+    if not send_access_key_email(to_email, stripe_id):
+        raise self.retry()
+    print(f"✅ Access key emailed to {to_email}")
+    return True
@@ -0,0 +1,277 @@
+# topic_packs.py
+"""
+DeepFlow question bank and the topic packs the desktop app downloads.
+
+Every DeepFlow question the backend generates is kept in the
+`deepflow_question_bank` table, keyed by a normalised topic. Topics with
+enough questions are offered as packs:
+
+    GET /api/deepflow/packs                    popular topics: question count and version
+    GET /api/deepflow/packs/<topic>?since=N    questions added after version N
+
+A pack's version is the highest bank id in it, so a client that stores
+the version it last synced only ever downloads new questions. Ids are
+handed out before commit, so a slow insert can become visible after a
+higher id already has; packs only include rows older than
+PACK_SETTLE_SECONDS so a client's version never skips past one. Pack
+responses are plain JSON; backend.encoding compresses them on the way out.
+
+Pre-generate a pack from the command line:
+
+    python -m StudyFlow.backend.topic_packs generate "renal physiology" --count 50
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from flask import jsonify, request
+
+from StudyFlow.backend import db
+from StudyFlow.logging_utils import debug_log
+
+# A topic needs this many banked questions before it's offered as a pack
+PACK_MIN_QUESTIONS = int(os.getenv("PACK_MIN_QUESTIONS", "20"))
+PACK_PAGE_SIZE = int(os.getenv("PACK_PAGE_SIZE", "500"))
+PACK_LIST_LIMIT = int(os.getenv("PACK_LIST_LIMIT", "50"))
+# Longer than any bank insert transaction takes (created_at is its start time)
+PACK_SETTLE_SECONDS = int(os.getenv("PACK_SETTLE_SECONDS", "60"))
+
+BANK_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS deepflow_question_bank (
+        id         SERIAL PRIMARY KEY,
+        topic_key  TEXT NOT NULL,
+        topic      TEXT NOT NULL,
+        question   TEXT NOT NULL,
+        body       TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (topic_key, question)
+    );
+    CREATE INDEX IF NOT EXISTS deepflow_question_bank_topic_id
+        ON deepflow_question_bank (topic_key, id);
+    -- question_hash() of the text, so sessions can exclude everything they've asked
+    ALTER TABLE deepflow_question_bank ADD COLUMN IF NOT EXISTS qhash TEXT;
+    UPDATE deepflow_question_bank
+        SET qhash = encode(sha1(convert_to(
+            lower(btrim(regexp_replace(question, '\\s+', ' ', 'g'))), 'UTF8')), 'hex')
+        WHERE qhash IS NULL;
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def topic_key(topic):
+    """'  Renal   Physiology ' -> 'renal physiology'"""
+    return _WHITESPACE.sub(" ", str(topic)).strip().lower()
+
+
+def question_hash(text):
+    """Same normalisation as the desktop topic packs."""
+    return hashlib.sha1(_WHITESPACE.sub(" ", str(text)).strip().lower().encode("utf-8")).hexdigest()
+
+
+def is_valid_question(data):
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("question"), str) and data["question"].strip()
+        and isinstance(data.get("options"), list) and len(data["options"]) >= 2
+        and isinstance(data.get("correct_index"), int)
+        and 0 <= data["correct_index"] < len(data["options"])
+    )
+
+
+def save_questions(topic, questions):
+    """Add generated questions to the bank (duplicates are skipped). Returns how many were new."""
+    rows = [
+        (topic_key(topic), topic, q["question"].strip(), question_hash(q["question"]), json.dumps({
+            "question": q["question"].strip(),
+            "options": q["options"],
+            "correct_index": q["correct_index"],
+            "explanation": q.get("explanation", ""),
+        }, separators=(",", ":")))
+        for q in questions if is_valid_question(q)
+    ]
+    if not rows:
+        return 0
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            added = 0
+            for row in rows:
+                cur.execute("""
+                    INSERT INTO deepflow_question_bank (topic_key, topic, question, qhash, body)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (topic_key, question) DO NOTHING
+                """, row)
+                added += cur.rowcount
+        conn.commit()
+        return added
+    finally:
+        conn.close()
+
+
+def save_question_quietly(topic, question):
+    """Bank a freshly generated question without ever failing the request that made it."""
+    try:
+        save_questions(topic, [question])
+    except Exception as e:
+        debug_log(f"⚠️ Could not bank DeepFlow question for '{topic}': {e}")
+
+
+def banked_question(topic, exclude=(), exclude_hashes=()):
+    """
+    A random banked question for `topic` that is neither one of the texts
+    in `exclude` nor one of the question_hash()es in `exclude_hashes`, or None.
+    """
+    hashes = set(exclude_hashes) | {question_hash(q) for q in exclude}
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT body FROM deepflow_question_bank
+                WHERE topic_key = %s AND NOT (COALESCE(qhash, '') = ANY(%s))
+                ORDER BY random()
+                LIMIT 1
+            """, (topic_key(topic), list(hashes)))
+            row = cur.fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+def banked_answer(topic, qhash):
+    """correct_index of the banked `topic` question with this question_hash(), or None if there isn't one."""
+    # Asked once per pack question a client shows, so no connection of its own
+    with db.shared_cursor() as cur:
+        cur.execute("""
+            SELECT body FROM deepflow_question_bank
+            WHERE topic_key = %s AND qhash = %s
+            LIMIT 1
+        """, (topic_key(topic), qhash))
+        row = cur.fetchone()
+    return json.loads(row[0])["correct_index"] if row else None
+
+
+def recent_bank_questions(topic, limit=20):
+    """Texts of the newest banked questions for `topic` (so generation can avoid them)."""
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT question FROM deepflow_question_bank
+                WHERE topic_key = %s
+                ORDER BY id DESC
+                LIMIT %s
+            """, (topic_key(topic), limit))
+            return [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def list_packs(min_questions=PACK_MIN_QUESTIONS, limit=PACK_LIST_LIMIT):
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT topic_key, MIN(topic), COUNT(*), MAX(id)
+                FROM deepflow_question_bank
+                WHERE created_at < NOW() - %s * INTERVAL '1 second'
+                GROUP BY topic_key
+                HAVING COUNT(*) >= %s
+                ORDER BY COUNT(*) DESC
+                LIMIT %s
+            """, (PACK_SETTLE_SECONDS, min_questions, limit))
+            return [
+                {"topic": key, "title": title, "questions": count, "version": version}
+                for key, title, count, version in cur.fetchall()
+            ]
+    finally:
+        conn.close()
+
+
+def pack_delta(topic, since=0, limit=PACK_PAGE_SIZE):
+    """Settled questions for `topic` with id > since, oldest first, at most `limit` of them."""
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, body FROM deepflow_question_bank
+                WHERE topic_key = %s AND id > %s
+                  AND created_at < NOW() - %s * INTERVAL '1 second'
+                ORDER BY id
+                LIMIT %s
+            """, (topic_key(topic), since, PACK_SETTLE_SECONDS, limit + 1))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "topic": topic_key(topic),
+        "version": rows[-1][0] if rows else since,
+        "complete": not more,
+        "questions": [dict(json.loads(body), id=row_id) for row_id, body in rows],
+    }
+
+
+def register_topic_packs(app):
+    @app.route("/api/deepflow/packs")
+    def deepflow_packs():
+        try:
+            return jsonify({"packs": list_packs()}), 200
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/packs error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/deepflow/packs/<path:topic>")
+    def deepflow_pack(topic):
+        try:
+            since = int(request.args.get("since", 0))
+            limit = min(int(request.args.get("limit", PACK_PAGE_SIZE)), PACK_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"error": "since and limit must be integers"}), 400
+        try:
+            response = jsonify(pack_delta(topic, since, limit))
+            # Deltas only ever grow, so a few minutes of staleness is harmless
+            response.headers["Cache-Control"] = "public, max-age=300"
+            return response, 200
+        except Exception as e:
+            debug_log(f"🔥 /api/deepflow/packs/{topic} error: {e}")
+            return jsonify({"error": str(e)}), 500
+
+
+# ---------------------------------------------------------------
+# CLI: pre-generate a pack
+# ---------------------------------------------------------------
+def generate(topic, count):
+    from StudyFlow.backend.deepflow import get_deepflow_question
+    seen = []
+    added = 0
+    for _ in range(count):
+        question = get_deepflow_question(topic, seen[-20:])
+        if not is_valid_question(question):
+            continue
+        seen.append(question["question"])
+        added += save_questions(topic, [question])
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeepFlow topic packs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="Generate questions for a topic into the bank")
+    gen.add_argument("topic")
+    gen.add_argument("--count", type=int, default=PACK_MIN_QUESTIONS)
+    sub.add_parser("list", help="Show topics that are offered as packs")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        print(f"✅ Added {generate(args.topic, args.count)} questions to '{topic_key(args.topic)}'")
+    else:
+        for pack in list_packs():
+            print(f"{pack['questions']:>6}  v{pack['version']:<8} {pack['title']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+# tracing.py
+"""
+Request tracing across the web app, Celery and Postgres.
+
+Spans follow the OpenTelemetry model (trace id, span id, parent, kind,
+attributes, start/end in unix nanoseconds) and travel between processes
+in a W3C `traceparent` header, so one DeepFlow or email request becomes a
+single trace:
+
+    HTTP POST /api/deepflow_question          (web, server)
+      db.query SELECT body FROM deepflow_...  (client)
+      llm openai gpt-4-turbo                  (client)
+        HTTP POST api.openai.com              (client)
+      celery.publish ...                      (producer)
+        celery.task ...                       (worker, consumer)
+          sendgrid.send                       (client)
+
+Off unless TRACING is set:
+
+    TRACING=file   append spans as JSON lines to TRACE_FILE (traces.jsonl)
+    TRACING=http   POST batches of spans to TRACE_ENDPOINT, e.g. the
+                   collector stand-in in benchmarks/trace_viewer.py
+
+TRACE_SAMPLE_RATE (default 1.0) samples whole traces at the root; the
+decision travels with the trace. Spans are exported from a background
+thread, so a request never waits on the exporter.
+
+    python -m StudyFlow.benchmarks.trace_viewer show traces.jsonl --slowest 5
+
+prints a timing waterfall per trace. Every response carries its trace id
+in X-Trace-Id.
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+TRACING = os.getenv("TRACING", "").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_ENDPOINT = os.getenv("TRACE_ENDPOINT", "http://127.0.0.1:4318/v1/spans")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME") or os.getenv("ROLE", "web")
+ENABLED = TRACING in ("file", "http")
+
+EXPORT_BATCH = 200
+EXPORT_INTERVAL = 1.0
+QUEUE_LIMIT = 10000
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_current = contextvars.ContextVar("studyflow_span", default=None)
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, sampled, kind="internal", attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.status = "error"
+        self.attributes["error"] = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                _exporter.submit(self.to_dict())
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": SERVICE_NAME,
+            "pid": os.getpid(),
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# ---------------------------------------------------------------
+# Context
+# ---------------------------------------------------------------
+def parse_traceparent(value):
+    """(trace_id, parent span id, sampled) from a traceparent header, or None."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, kind="internal", traceparent=None, **attributes):
+    """
+    A new span, child of `traceparent` if given, else of the current span,
+    else the root of a new trace. It is not made current; see activate().
+    """
+    if not ENABLED:
+        return NOOP_SPAN
+    remote = parse_traceparent(traceparent) if traceparent else None
+    parent = _current.get()
+    if remote:
+        trace_id, parent_id, sampled = remote
+    elif parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    else:
+        trace_id, parent_id = "%032x" % random.getrandbits(128), None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    return Span(name, trace_id, parent_id, sampled, kind, attributes)
+
+
+def activate(span):
+    """Make `span` current; returns a token for deactivate()."""
+    return _current.set(span if span is not NOOP_SPAN else None)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """
+    with tracing.span("sendgrid.send", kind="client", to=email):
+        ...
+    """
+    if not ENABLED:
+        yield NOOP_SPAN
+        return
+    s = start_span(name, kind, **attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+def inject(headers):
+    """Add the current trace context to an outgoing headers dict."""
+    s = _current.get()
+    if s is not None:
+        headers["traceparent"] = s.traceparent
+    return headers
+
+
+# ---------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------
+class _Exporter:
+    """Hands finished spans to a background thread that writes them in batches."""
+
+    def __init__(self):
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _start(self):
+        # Threads don't survive a fork: each gunicorn / Celery child starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=QUEUE_LIMIT)
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, span_dict):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(span_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first=None):
+        batch = [] if first is None else [first]
+        while len(batch) < EXPORT_BATCH:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=EXPORT_INTERVAL)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+
+    def flush(self):
+        if self._queue is not None and self._pid == os.getpid():
+            batch = self._drain()
+            while batch:
+                self._write(batch)
+                batch = self._drain()
+
+    def _write(self, batch):
+        try:
+            if TRACING == "http":
+                import urllib.request
+                request = urllib.request.Request(
+                    TRACE_ENDPOINT, data=json.dumps(batch).encode("utf-8"),
+                    headers={"Content-Type": "application/json"}, method="POST",
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                lines = "".join(json.dumps(s, separators=(",", ":")) + "\n" for s in batch)
+                with self._lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write(lines)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"⚠️ tracing: dropped {len(batch)} spans: {e}")
+
+
+_exporter = _Exporter()
+atexit.register(_exporter.flush)
+
+
+# ---------------------------------------------------------------
+# Integrations
+# ---------------------------------------------------------------
+_WHITESPACE = re.compile(r"\s+")
+
+
+def db_statement(query):
+    """A short, single-line form of a SQL query for span attributes."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    return _WHITESPACE.sub(" ", str(query)).strip()[:300]
+
+
+_requests_installed = False
+
+
+def install_requests():
+    """Span (and traceparent) on every call made through `requests` (OpenAI, Stripe, internal calls)."""
+    global _requests_installed
+    if not ENABLED or _requests_installed:
+        return
+    import requests
+    from urllib.parse import urlsplit
+
+    original_send = requests.Session.send
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        with span(f"HTTP {request.method} {url.hostname}", kind="client",
+                  **{"http.method": request.method, "http.url": f"{url.scheme}://{url.netloc}{url.path}"}) as s:
+            inject(request.headers)
+            response = original_send(self, request, **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                s.status = "error"
+            return response
+
+    requests.Session.send = send
+    _requests_installed = True
+
+
+def register_tracing(app):
+    """A server span per Flask request, continuing the caller's trace if it sent one."""
+    if not ENABLED:
+        return
+    from flask import g, request
+
+    install_requests()
+
+    @app.before_request
+    def start_request_span():
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        s = start_span(
+            f"HTTP {request.method} {rule}", kind="server",
+            traceparent=request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.route": rule},
+        )
+        g._trace = (s, activate(s))
+
+    @app.after_request
+    def tag_response(response):
+        trace = g.get("_trace")
+        if trace is not None:
+            trace[0].set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                trace[0].status = "error"
+            response.headers["X-Trace-Id"] = trace[0].trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        trace = g.pop("_trace", None)
+        if trace is not None:
+            if exc is not None:
+                trace[0].record_error(exc)
+            deactivate(trace[1])
+            trace[0].end()
+
+
+_published = {}
+_running = {}
+
+
+def register_celery_tracing():
+    """Carry the trace through the broker: publish spans on the sender, task spans on the worker."""
+    if not ENABLED:
+        return
+    from celery.signals import (
+        after_task_publish, before_task_publish, task_failure, task_postrun, task_prerun,
+    )
+
+    install_requests()
+
+    @before_task_publish.connect(weak=False)
+    def trace_publish(sender=None, headers=None, routing_key=None, **kwargs):
+        if headers is None:
+            return
+        s = start_span(f"celery.publish {sender}", kind="producer",
+                       **{"celery.task": sender, "celery.queue": routing_key})
+        headers["traceparent"] = s.traceparent
+        headers["sf_published_ns"] = time.time_ns()
+        _published[headers.get("id")] = s
+
+    @after_task_publish.connect(weak=False)
+    def trace_published(sender=None, headers=None, **kwargs):
+        s = _published.pop((headers or {}).get("id"), None)
+        if s is not None:
+            s.end()
+
+    @task_prerun.connect(weak=False)
+    def trace_task_start(task_id=None, task=None, **kwargs):
+        s = start_span(f"celery.task {task.name}", kind="consumer",
+                       traceparent=getattr(task.request, "traceparent", None),
+                       **{"celery.task": task.name, "celery.task_id": task_id})
+        published = getattr(task.request, "sf_published_ns", None)
+        if published:
+            # Time the message spent in the queue before a worker picked it up
+            s.set_attribute("celery.queue_wait_ms", round((s.start_ns - int(published)) / 1e6, 1))
+        _running[task_id] = (s, activate(s))
+
+    @task_failure.connect(weak=False)
+    def trace_task_failure(task_id=None, exception=None, **kwargs):
+        running = _running.get(task_id)
+        if running is not None and exception is not None:
+            running[0].record_error(exception)
+
+    @task_postrun.connect(weak=False)
+    def trace_task_end(task_id=None, state=None, **kwargs):
+        running = _running.pop(task_id, None)
+        if running is not None:
+            running[0].set_attribute("celery.state", state)
+            deactivate(running[1])
+            running[0].end()
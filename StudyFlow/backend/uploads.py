@@ -0,0 +1,145 @@
+# uploads.py
+import os
+import resource
+import threading
+from functools import wraps
+
+from flask import g, jsonify, make_response
+from PIL import Image
+
+from StudyFlow.logging_utils import debug_log
+
+# Hard cap on the request body; Flask answers 413 before the route runs
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+# Reject anything bigger than this before decoding a single pixel
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+# Longest side we bother feeding Tesseract (~300 dpi on a letter page)
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "3300"))
+
+# Pillow's own decompression-bomb guard should agree with ours
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class ImageTooLarge(ValueError):
+    """Uploaded image exceeds MAX_IMAGE_PIXELS."""
+
+
+def open_upload_image(file_storage, max_dimension=OCR_MAX_DIMENSION, mode="L"):
+    """
+    Decode an uploaded image at no more resolution than OCR needs.
+
+    Image.open only parses the header, so the pixel limit is checked before
+    any decoding. JPEGs are then decoded straight to a smaller size and to
+    grayscale via draft() (DCT scaling, so the full-size bitmap never
+    exists); other formats are shrunk with reduce()/thumbnail().
+
+    Returns (image, scale) where scale maps coordinates in the returned
+    image back to the original: original_x = x * scale.
+    """
+    try:
+        image = Image.open(file_storage.stream)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        # Pillow refuses images over 2x MAX_IMAGE_PIXELS before we see the size
+        raise ImageTooLarge(str(e)) from e
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"Image is {width}x{height}; limit is {MAX_IMAGE_PIXELS} pixels")
+
+    longest = max(width, height)
+    if longest > max_dimension:
+        ratio = max_dimension / longest
+        target = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+        image.draft(mode, target)
+        # thumbnail() uses reduce() for the integer part, then a cheap resample
+        image.thumbnail(target, Image.BILINEAR, reducing_gap=2.0)
+
+    if image.mode != mode:
+        image = image.convert(mode)
+    return image, width / image.width
+
+
+def scale_mapping(mapping, scale):
+    """Map OCR word boxes from a downscaled image back to upload coordinates."""
+    if scale == 1:
+        return mapping
+    for word in mapping.values():
+        for key in ("left", "top", "width", "height"):
+            word[key] = int(round(word[key] * scale))
+    return mapping
+
+
+def _read_rss_kb():
+    """(current RSS, peak RSS) in kB for this process."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+    except (OSError, KeyError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak, peak
+
+
+def _reset_peak_rss():
+    """Reset VmHWM, the peak RSS of the whole process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# Requests in flight on this worker, and how many have started, so a
+# peak is only attributed to a route that had the worker to itself
+_requests = {"in_flight": 0, "started": 0}
+_requests_lock = threading.Lock()
+
+
+def report_peak_rss(view):
+    """
+    Log start/peak RSS for a route and expose it as X-Peak-RSS-KB.
+
+    VmHWM is a process-wide peak: under gevent other requests share the
+    worker, so the peak is reset and reported only when this request ran
+    alone from start to finish. Otherwise only the current RSS is logged.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with _requests_lock:
+            alone = _requests["in_flight"] == 1
+            started = _requests["started"]
+            if alone:
+                _reset_peak_rss()
+        start_kb, _ = _read_rss_kb()
+        response = make_response(view(*args, **kwargs))
+        end_kb, peak_kb = _read_rss_kb()
+        with _requests_lock:
+            alone = alone and _requests["started"] == started
+        if alone:
+            debug_log(f"📏 {view.__name__}: rss start={start_kb} kB, peak={peak_kb} kB (+{peak_kb - start_kb} kB)")
+            response.headers["X-Peak-RSS-KB"] = str(peak_kb)
+        else:
+            debug_log(f"📏 {view.__name__}: rss start={start_kb} kB, end={end_kb} kB (worker shared, no peak)")
+        return response
+    return wrapper
+
+
+def register_upload_limits(app):
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+
+    @app.before_request
+    def count_request_start():
+        with _requests_lock:
+            _requests["in_flight"] += 1
+            _requests["started"] += 1
+        g._counted_request = True
+
+    @app.teardown_request
+    def count_request_end(exc):
+        if not g.pop("_counted_request", False):
+            return
+        with _requests_lock:
+            _requests["in_flight"] -= 1
+
+    @app.errorhandler(413)
+    def upload_too_large(e):
+        return jsonify({"error": f"Upload exceeds {MAX_UPLOAD_BYTES} bytes"}), 413
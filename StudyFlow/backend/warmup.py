@@ -0,0 +1,221 @@
+# warmup.py
+"""
+Warm-up of DeepFlow questions for trending topics.
+
+Every /api/deepflow_question request counts towards its topic's demand
+(a Redis sorted set per UTC day) and is answered from the question bank
+when the bank has a question the user hasn't seen, so only a topic nobody
+has asked about before makes the user wait for the model ("cold").
+
+Once a day, at WARMUP_HOUR (UTC, off-peak), Celery beat runs
+tasks.warm_trending_topics. It takes the WARMUP_TOP_TOPICS topics with the
+most requests over the last WARMUP_LOOKBACK_DAYS days and queues
+tasks.warm_topic_async for each, which generates questions into the bank
+until the topic has WARMUP_STOCK warmed questions nobody has been served
+yet. Every generation first reserves its estimated cost against
+WARMUP_DAILY_BUDGET_USD; once the day's budget is spent, warming stops.
+
+Served questions are counted by source (studyflow_deepflow_questions_total,
+and per day at /admin/warmup):
+
+    warmed      pre-generated by the warm-up and served for the first time:
+                a cold miss the warm-up prevented
+    banked      another banked question
+    generated   the user waited for the model
+"""
+import json
+import os
+import time
+
+from flask import jsonify
+
+from StudyFlow import config
+from StudyFlow.backend import topic_packs
+from StudyFlow.backend.metrics import DEEPFLOW_SERVES
+from StudyFlow.backend.profiler import admin_required
+from StudyFlow.logging_utils import debug_log
+
+SERVE_BANKED = os.getenv("DEEPFLOW_SERVE_BANKED", "1") == "1"
+WARMUP_HOUR = int(os.getenv("WARMUP_HOUR", "3"))
+WARMUP_TOP_TOPICS = int(os.getenv("WARMUP_TOP_TOPICS", "20"))
+WARMUP_LOOKBACK_DAYS = int(os.getenv("WARMUP_LOOKBACK_DAYS", "3"))
+# Topics asked for fewer times than this aren't worth warming
+WARMUP_MIN_REQUESTS = int(os.getenv("WARMUP_MIN_REQUESTS", "3"))
+WARMUP_STOCK = int(os.getenv("WARMUP_STOCK", "10"))
+WARMUP_DAILY_BUDGET_USD = float(os.getenv("WARMUP_DAILY_BUDGET_USD", "1.00"))
+STATS_DAYS = 7
+
+DEMAND_PREFIX = "sf:topics:"
+WARMED_PREFIX = "sf:warm:"
+SPEND_PREFIX = "sf:warmup:spend:"
+STATS_PREFIX = "sf:warmup:stats:"
+LAST_RUN_KEY = "sf:warmup:last"
+DAY_SECONDS = 24 * 3600
+
+
+def _day(offset=0):
+    return time.strftime("%Y%m%d", time.gmtime(time.time() - offset * DAY_SECONDS))
+
+
+def _count(source):
+    DEEPFLOW_SERVES.labels(source).inc()
+    try:
+        pipe = config.get_redis_client().pipeline(transaction=False)
+        pipe.hincrby(STATS_PREFIX + _day(), source, 1)
+        pipe.expire(STATS_PREFIX + _day(), (STATS_DAYS + 1) * DAY_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        debug_log(f"⚠️ warm-up: could not count a {source} question: {e}")
+
+
+# ---------------------------------------------------------------
+# Request path
+# ---------------------------------------------------------------
+def record_demand(topic):
+    try:
+        key = DEMAND_PREFIX + _day()
+        pipe = config.get_redis_client().pipeline(transaction=False)
+        pipe.zincrby(key, 1, topic_packs.topic_key(topic))
+        pipe.expire(key, (WARMUP_LOOKBACK_DAYS + 1) * DAY_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        debug_log(f"⚠️ warm-up: could not record demand for '{topic}': {e}")
+
+
+def next_deepflow_question(topic, previous_questions, generate, exclude_hashes=()):
+    """
+    A question for `topic` the user hasn't seen (neither in
+    previous_questions nor, by question_hash, in exclude_hashes): from the
+    bank if it has one, else generate(topic, previous_questions) (banked
+    for next time).
+    """
+    record_demand(topic)
+    if SERVE_BANKED:
+        try:
+            question = topic_packs.banked_question(topic, previous_questions, exclude_hashes)
+        except Exception as e:
+            debug_log(f"⚠️ warm-up: question bank unavailable: {e}")
+            question = None
+        if question is not None:
+            warmed = False
+            try:
+                warmed = config.get_redis_client().srem(
+                    WARMED_PREFIX + topic_packs.topic_key(topic), topic_packs.question_hash(question["question"])
+                )
+            except Exception:
+                pass
+            _count("warmed" if warmed else "banked")
+            return question
+
+    question = generate(topic, previous_questions)
+    if question is not None:
+        _count("generated")
+        topic_packs.save_question_quietly(topic, question)
+    return question
+
+
+# ---------------------------------------------------------------
+# Beat job
+# ---------------------------------------------------------------
+def trending_topics(limit=WARMUP_TOP_TOPICS, days=WARMUP_LOOKBACK_DAYS):
+    """[(topic, requests)] over the last `days` days, busiest first."""
+    pipe = config.get_redis_client().pipeline(transaction=False)
+    for offset in range(days):
+        pipe.zrange(DEMAND_PREFIX + _day(offset), 0, -1, withscores=True)
+    totals = {}
+    for day in pipe.execute():
+        for topic, count in day:
+            totals[topic] = totals.get(topic, 0) + int(count)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [(topic, count) for topic, count in ranked if count >= WARMUP_MIN_REQUESTS][:limit]
+
+
+def generation_cost():
+    """Estimated USD per question, priced at the dearest configured model."""
+    from StudyFlow.backend.model_router import candidates, expected_cost
+    return max(expected_cost(model) for _, model in candidates())
+
+
+def reserve_budget(cost):
+    """Take `cost` from today's budget; False (nothing taken) if it would overspend."""
+    r = config.get_redis_client()
+    key = SPEND_PREFIX + _day()
+    spent = float(r.incrbyfloat(key, cost))
+    r.expire(key, (STATS_DAYS + 1) * DAY_SECONDS)
+    if spent > WARMUP_DAILY_BUDGET_USD:
+        r.incrbyfloat(key, -cost)
+        return False
+    return True
+
+
+def warm_topic(topic, generate):
+    """Top up `topic`'s unserved warmed questions to WARMUP_STOCK. Returns {"generated", "spent", "stopped"}."""
+    r = config.get_redis_client()
+    warmed_key = WARMED_PREFIX + topic_packs.topic_key(topic)
+    needed = WARMUP_STOCK - r.scard(warmed_key)
+    result = {"topic": topic, "generated": 0, "spent": 0.0, "stopped": None}
+    if needed <= 0:
+        result["stopped"] = "stocked"
+        return result
+
+    previous = topic_packs.recent_bank_questions(topic)
+    cost = generation_cost()
+    for _ in range(needed):
+        if not reserve_budget(cost):
+            result["stopped"] = "budget"
+            break
+        result["spent"] += cost
+        question = generate(topic, previous)
+        if not topic_packs.is_valid_question(question):
+            continue
+        previous = [question["question"]] + previous[:19]
+        if topic_packs.save_questions(topic, [question]):
+            r.sadd(warmed_key, topic_packs.question_hash(question["question"]))
+            r.expire(warmed_key, 30 * DAY_SECONDS)
+            result["generated"] += 1
+    result["spent"] = round(result["spent"], 4)
+    debug_log(f"🌅 Warmed '{topic}': +{result['generated']} questions, ${result['spent']:.4f}"
+              + (f" (stopped: {result['stopped']})" if result["stopped"] else ""))
+    return result
+
+
+def record_run(summary):
+    config.get_redis_client().set(LAST_RUN_KEY, json.dumps(dict(summary, ts=time.time())))
+
+
+def stats():
+    r = config.get_redis_client()
+    pipe = r.pipeline(transaction=False)
+    days = [_day(offset) for offset in range(STATS_DAYS)]
+    for day in days:
+        pipe.hgetall(STATS_PREFIX + day)
+        pipe.get(SPEND_PREFIX + day)
+    pipe.get(LAST_RUN_KEY)
+    *results, last_run = pipe.execute()
+    per_day = {}
+    for i, day in enumerate(days):
+        counts = {source: int(results[2 * i].get(source, 0)) for source in ("warmed", "banked", "generated")}
+        served = sum(counts.values())
+        per_day[day] = dict(
+            counts,
+            cold_misses_prevented=counts["warmed"],
+            cold_rate=round(counts["generated"] / served, 4) if served else None,
+            spent_usd=round(float(results[2 * i + 1] or 0), 4),
+        )
+    return {
+        "budget_usd_per_day": WARMUP_DAILY_BUDGET_USD,
+        "days": per_day,
+        "last_run": json.loads(last_run) if last_run else None,
+        "trending": trending_topics(),
+    }
+
+
+def register_warmup(app):
+    @app.route("/admin/warmup")
+    @admin_required
+    def warmup_stats():
+        try:
+            return jsonify(stats()), 200
+        except Exception as e:
+            debug_log(f"🔥 /admin/warmup error: {e}")
+            return jsonify({"error": str(e)}), 500
@@ -0,0 +1,98 @@
+# encoding_bench.py
+"""
+JSON encoding and compression benchmark for backend responses.
+
+    python -m StudyFlow.benchmarks.encoding_bench
+    python -m StudyFlow.benchmarks.encoding_bench --deepflow-batch 100 --ocr-words 800
+
+For representative payloads (a short message, an /ocr result, a batch of
+DeepFlow questions) reports the time to build the Flask response with the
+stdlib and orjson providers, and the body size and compression time for
+gzip and brotli at the levels backend.encoding uses.
+"""
+import argparse
+import random
+import timeit
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from StudyFlow.backend import encoding
+from StudyFlow.benchmarks.fake_llm import DEEPFLOW_QUESTION
+
+WORDS = ("which", "of", "the", "following", "best", "explains", "renal", "clearance", "enzyme",
+         "patient", "presents", "with", "acute", "onset", "pressure", "increased", "decreased")
+
+
+def message_payload():
+    return {"message": "Welcome back! DeepFlow now remembers the topics you studied last week."}
+
+
+def ocr_payload(words, rng):
+    mapping = {}
+    for tag in range(1, words + 1):
+        mapping[tag] = {
+            "text": rng.choice(WORDS), "left": rng.randrange(2000), "top": rng.randrange(3000),
+            "width": rng.randrange(20, 200), "height": rng.randrange(18, 40),
+            "conf": round(rng.uniform(60, 99), 2),
+        }
+    text = " ".join(w["text"] for w in mapping.values())
+    return {"ocr_text": " ".join(f"[{k}] {v['text']}" for k, v in mapping.items()),
+            "plain_text": text, "mapping": mapping}
+
+
+def deepflow_batch_payload(count, rng):
+    questions = []
+    for i in range(count):
+        q = dict(DEEPFLOW_QUESTION)
+        q["question"] = f"{q['question']} (variant {i}: {' '.join(rng.choices(WORDS, k=12))})"
+        questions.append(q)
+    return {"topic": "renal physiology", "questions": questions}
+
+
+def time_call(fn, repeat):
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ocr-words", type=int, default=400)
+    parser.add_argument("--deepflow-batch", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = {
+        "message": message_payload(),
+        "ocr": ocr_payload(args.ocr_words, rng),
+        "deepflow_batch": deepflow_batch_payload(args.deepflow_batch, rng),
+    }
+    providers = {"stdlib": DefaultJSONProvider}
+    if encoding.orjson is not None:
+        providers["orjson"] = encoding.OrjsonProvider
+    else:
+        print("orjson not installed; only the stdlib provider is measured")
+
+    print(f"{'payload':<16}{'provider':<9}{'encode ms':>11}{'bytes':>10}"
+          f"{'gzip':>9}{'gzip ms':>9}{'br':>9}{'br ms':>8}")
+    for name, payload in payloads.items():
+        for provider_name, provider_class in providers.items():
+            app = Flask(__name__)
+            app.json = provider_class(app)
+            with app.app_context():
+                encode_ms = time_call(lambda: app.json.response(payload), args.repeat)
+                body = app.json.response(payload).get_data()
+            gzip_body = encoding.compress(body, "gzip")
+            gzip_ms = time_call(lambda: encoding.compress(body, "gzip"), args.repeat // 4 or 1)
+            if encoding.brotli is not None:
+                br_size = f"{len(encoding.compress(body, 'br')):>9}"
+                br_ms = f"{time_call(lambda: encoding.compress(body, 'br'), args.repeat // 4 or 1):>8.3f}"
+            else:
+                br_size, br_ms = f"{'-':>9}", f"{'-':>8}"
+            note = "  (below threshold, sent raw)" if len(body) < encoding.COMPRESS_MIN_BYTES else ""
+            print(f"{name:<16}{provider_name:<9}{encode_ms:>11.3f}{len(body):>10}"
+                  f"{len(gzip_body):>9}{gzip_ms:>9.3f}{br_size}{br_ms}{note}")
+
+
+if __name__ == "__main__":
+    main()
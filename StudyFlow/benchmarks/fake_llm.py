@@ -0,0 +1,303 @@
+# fake_llm.py
+"""
+Local stand-in for the OpenAI, Anthropic and Cohere chat APIs, for
+offline, repeatable performance work.
+
+    python -m StudyFlow.benchmarks.fake_llm --port 8765 --latency lognormal:400,0.5 --error-rate 0.02
+
+    OPENAI_API_BASE=http://127.0.0.1:8765/v1     # openai==0.28
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+    CO_API_URL=http://127.0.0.1:8765
+
+Endpoints (same request/response shapes as the real APIs, as used by
+backend.llm_client):
+    POST /v1/chat/completions   OpenAI
+    POST /v1/messages           Anthropic
+    POST /v2/chat               Cohere v2
+    GET  /stats                 requests served, by provider and outcome
+
+Latency specs (milliseconds):
+    fixed:300   uniform:100-800   normal:300,80   lognormal:300,0.5 (median, sigma)
+
+Replies come from canned rules: the first rule whose `match` substring
+appears in the prompt wins. The defaults cover DeepFlow questions, OCR
+layout, explanations and the answer votes; --payloads adds rules from a
+JSON file of [{"match": "...", "reply": "text" or {...}}, ...] in front.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEEPFLOW_QUESTION = {
+    "question": "Which enzyme converts angiotensin I to angiotensin II?",
+    "options": ["Renin", "Angiotensin-converting enzyme", "Aldosterone synthase", "Chymase"],
+    "correct_index": 1,
+    "explanation": "ACE, mostly in pulmonary endothelium, cleaves angiotensin I to angiotensin II.",
+}
+
+EXPLANATION = "It is the only option consistent with the mechanism described in the question."
+
+ERROR_BODIES = {
+    "openai": lambda status, msg: {"error": {"message": msg, "type": "server_error", "code": status}},
+    "anthropic": lambda status, msg: {"type": "error", "error": {
+        "type": "rate_limit_error" if status == 429 else "api_error", "message": msg}},
+    "cohere": lambda status, msg: {"message": msg},
+}
+
+
+# ---------------------------------------------------------------
+# Latency
+# ---------------------------------------------------------------
+def parse_latency(spec):
+    """Turn a latency spec into fn(rng) -> seconds."""
+    kind, _, params = spec.partition(":")
+    try:
+        if kind == "fixed":
+            ms = float(params or 0)
+            return lambda rng: ms / 1000
+        if kind == "uniform":
+            low, high = (float(x) for x in params.split("-"))
+            return lambda rng: rng.uniform(low, high) / 1000
+        if kind == "normal":
+            mean, sd = (float(x) for x in params.split(","))
+            return lambda rng: max(0.0, rng.gauss(mean, sd)) / 1000
+        if kind == "lognormal":
+            median, sigma = (float(x) for x in params.split(","))
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"Bad latency spec: {spec!r}")
+
+
+# ---------------------------------------------------------------
+# Canned replies
+# ---------------------------------------------------------------
+def layout_reply(prompt):
+    """Echo the OCR tags back as a question/answers layout, like /api/layout expects."""
+    tags = re.findall(r"\[(\d+)\]\s*([^\[]*)", prompt.split("Return JSON in this shape")[-1])
+    answers = {tag: {"text": text.strip() or f"Option {tag}", "tag": int(tag)} for tag, text in tags[1:5]}
+    question = tags[0][1].strip() if tags else "Question"
+    return json.dumps({"question": question, "answers": answers})
+
+
+DEFAULT_RULES = [
+    {"match": "multiple-choice question", "reply": DEEPFLOW_QUESTION},
+    {"match": "OCR layout engine", "reply": layout_reply},
+    {"match": "Explain why", "reply": EXPLANATION},
+    {"match": "", "reply": "1"},
+]
+
+
+def load_rules(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f) + DEFAULT_RULES
+
+
+def canned_reply(rules, prompt):
+    for rule in rules:
+        if rule["match"] in prompt:
+            reply = rule["reply"]
+            if callable(reply):
+                return reply(prompt)
+            return reply if isinstance(reply, str) else json.dumps(reply)
+    return "1"
+
+
+# ---------------------------------------------------------------
+# Provider request/response shapes
+# ---------------------------------------------------------------
+def _text(content):
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+def prompt_of(body):
+    parts = [_text(body.get("system", ""))]
+    parts += [_text(m.get("content")) for m in body.get("messages", [])]
+    return "\n".join(p for p in parts if p)
+
+
+def openai_response(body, reply, prompt_tokens, completion_tokens):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def anthropic_response(body, reply, prompt_tokens, completion_tokens):
+    return {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "fake"),
+        "content": [{"type": "text", "text": reply}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens},
+    }
+
+
+def cohere_response(body, reply, prompt_tokens, completion_tokens):
+    tokens = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}
+    return {
+        "id": "fake",
+        "finish_reason": "COMPLETE",
+        "message": {"role": "assistant", "content": [{"type": "text", "text": reply}]},
+        "usage": {"billed_units": tokens, "tokens": tokens},
+    }
+
+
+PROVIDERS = {
+    "/v1/chat/completions": ("openai", openai_response),
+    "/v1/messages": ("anthropic", anthropic_response),
+    "/v2/chat": ("cohere", cohere_response),
+}
+
+
+# ---------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    # Filled in by serve()
+    rules = DEFAULT_RULES
+    latency = staticmethod(parse_latency("fixed:0"))
+    error_rate = 0.0
+    error_statuses = (429, 500, 503)
+    hang_rate = 0.0
+    hang_seconds = 60.0
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+    stats = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, {f"{p}:{o}": n for (p, o), n in sorted(self.stats.items())})
+        else:
+            self.send_json(404, {"message": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        route = PROVIDERS.get(self.path.split("?", 1)[0])
+        if route is None:
+            self.send_json(404, {"message": f"No fake for {self.path}"})
+            return
+        provider, shape = route
+
+        with self.rng_lock:
+            delay = self.latency(self.rng)
+            roll = self.rng.random()
+            status = self.rng.choice(self.error_statuses)
+
+        if roll < self.hang_rate:
+            self.stats[provider, "hang"] += 1
+            time.sleep(self.hang_seconds)
+            return
+        time.sleep(delay)
+        if roll < self.hang_rate + self.error_rate:
+            self.stats[provider, str(status)] += 1
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            self.send_json(status, ERROR_BODIES[provider](status, "Injected error from fake_llm"), headers)
+            return
+
+        prompt = prompt_of(body)
+        reply = canned_reply(self.rules, prompt)
+        self.stats[provider, "ok"] += 1
+        self.send_json(200, shape(body, reply, max(1, len(prompt) // 4), max(1, len(reply) // 4)))
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host="127.0.0.1", port=0, latency="fixed:0", error_rate=0.0, error_statuses=(429, 500, 503),
+          hang_rate=0.0, hang_seconds=60.0, payloads=None, seed=0):
+    """Start the server on a daemon thread and return it (server.server_port has the port)."""
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {
+        "rules": load_rules(payloads) if payloads else DEFAULT_RULES,
+        "latency": staticmethod(parse_latency(latency) if isinstance(latency, str) else latency),
+        "error_rate": error_rate,
+        "error_statuses": tuple(error_statuses),
+        "hang_rate": hang_rate,
+        "hang_seconds": hang_seconds,
+        "rng": random.Random(seed),
+        "rng_lock": threading.Lock(),
+        "stats": Counter(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def provider_env(server):
+    """Environment variables that point the SDKs at `server`."""
+    base = f"http://{server.server_address[0]}:{server.server_port}"
+    return {
+        "OPENAI_API_BASE": f"{base}/v1",
+        "ANTHROPIC_BASE_URL": base,
+        "CO_API_URL": base,
+        "OPENAI_API_KEY": "fake",
+        "ANTHROPIC_API_KEY": "fake",
+        "COHERE_API_KEY": "fake",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0", type=str, help="Latency spec, see above")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail")
+    parser.add_argument("--error-statuses", default="429,500,503",
+                        help="Comma-separated statuses injected errors are drawn from")
+    parser.add_argument("--hang-rate", type=float, default=0.0,
+                        help="Fraction of calls that never answer (exercises client timeouts)")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--payloads", help="JSON file of extra canned reply rules")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error sampling")
+    args = parser.parse_args()
+    parse_latency(args.latency)  # fail fast on a bad spec
+
+    server = serve(
+        args.host, args.port, args.latency, args.error_rate,
+        [int(s) for s in args.error_statuses.split(",")], args.hang_rate, args.hang_seconds,
+        args.payloads, args.seed,
+    )
+    print(f"Fake LLM listening on http://{args.host}:{server.server_port}")
+    for key, value in provider_env(server).items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# flashcard_bench.py
+"""
+Open-time and memory benchmark for the flashcard deck view.
+
+    QT_QPA_PLATFORM=offscreen python -m StudyFlow.benchmarks.flashcard_bench --cards 10000
+
+Writes a synthetic deck, then in a fresh process each:
+  deck     FlashcardDeck (QListView + delegate, cards fetched as you scroll)
+  widgets  the old approach: a QLabel/QLabel/QPushButton widget per card
+           in a scroll area (skip with --no-widgets, it is slow on big decks)
+
+and reports the time until the deck is on screen, the time to scroll to
+the last card, and the resident memory added.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+OPEN_SNIPPET = """
+import json, resource, sys, time
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+app.processEvents()
+base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{build}
+window.resize(600, 400)
+window.show()
+app.processEvents()
+opened = time.perf_counter() - start
+start = time.perf_counter()
+{scroll}
+app.processEvents()
+scrolled = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"open_ms": opened * 1000, "scroll_ms": scrolled * 1000,
+                  "rss_mb": (peak_kb - base_kb) / 1024}}))
+"""
+
+DECK_BUILD = """
+from StudyFlow.frontend.flashcard_deck import FlashcardDeck
+window = FlashcardDeck(sys.argv[1])
+"""
+DECK_SCROLL = """
+model = window.model
+while model.canFetchMore():
+    model.fetchMore()
+window.view.scrollToBottom()
+"""
+
+WIDGETS_BUILD = """
+from PySide6.QtWidgets import QLabel, QPushButton, QScrollArea, QVBoxLayout, QWidget
+with open(sys.argv[1], encoding="utf-8") as f:
+    cards = json.load(f)
+window = QScrollArea()
+window.setWidgetResizable(True)
+inner = QWidget()
+column = QVBoxLayout(inner)
+for card in cards:
+    item = QWidget()
+    layout = QVBoxLayout(item)
+    layout.addWidget(QLabel(f"Q: {card['question']}"))
+    answer = QLabel(f"A: {card['answer']}")
+    answer.setVisible(False)
+    layout.addWidget(answer)
+    layout.addWidget(QPushButton("Show Answer"))
+    column.addWidget(item)
+window.setWidget(inner)
+"""
+WIDGETS_SCROLL = """
+bar = window.verticalScrollBar()
+bar.setValue(bar.maximum())
+"""
+
+
+def write_deck(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([
+            {"question": f"Card {i}: which structure is described by clue #{i}?",
+             "answer": f"Answer {i}, with a sentence or two of explanation to make it realistic."}
+            for i in range(count)
+        ], f, indent=2)
+
+
+def run(build, scroll, deck_path):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    proc = subprocess.run(
+        [sys.executable, "-c", OPEN_SNIPPET.format(build=build, scroll=scroll), deck_path],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit("Benchmark process failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--no-widgets", action="store_true", help="Skip the widget-per-card comparison")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the deck takes longer than this to open")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        deck_path = os.path.join(tmp, "flashcards.json")
+        write_deck(deck_path, args.cards)
+        results = {"deck": run(DECK_BUILD, DECK_SCROLL, deck_path)}
+        if not args.no_widgets:
+            results["widgets"] = run(WIDGETS_BUILD, WIDGETS_SCROLL, deck_path)
+
+    print(f"{args.cards} cards")
+    print(f"{'':<10}{'open ms':>10}{'scroll ms':>11}{'+RSS MB':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['open_ms']:>10.1f}{r['scroll_ms']:>11.1f}{r['rss_mb']:>10.1f}")
+
+    if args.budget_ms is not None and results["deck"]["open_ms"] > args.budget_ms:
+        print(f"FAIL: deck opened in {results['deck']['open_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# ocr_bench.py
+"""
+Compare the old two-process OCR path (image_to_string + image_to_data) with
+the single-pass OCR pool on note-page images.
+
+    python -m StudyFlow.benchmarks.ocr_bench                 # synthetic pages
+    python -m StudyFlow.benchmarks.ocr_bench notes/*.png -n 5
+
+Reports per-image wall latency and CPU seconds per page. CPU includes
+child processes, so the cost of spawning `tesseract` is counted too.
+"""
+import argparse
+import resource
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+import pytesseract
+
+from StudyFlow.config import TESSERACT_PATH
+from StudyFlow.backend.image_processing import preprocess_image
+from StudyFlow.backend.ocr_pool import OcrPool
+
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+
+OCR_CONFIG = "--psm 6 --oem 3"
+
+
+def synthetic_page(width=1700, height=2200, lines=40):
+    """A white page of black text, roughly a phone photo of printed notes."""
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    for i in range(lines):
+        draw.text(
+            (80, 60 + i * 50),
+            f"{i + 1}. Which enzyme converts angiotensin I to angiotensin II? Option {i % 4 + 1}",
+            fill="black",
+        )
+    return page
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def legacy_ocr(image):
+    text = pytesseract.image_to_string(image)
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, config=OCR_CONFIG)
+    return text, data
+
+
+def pooled_ocr(pool):
+    def run(image):
+        return pool.recognize(image, OCR_CONFIG)
+    return run
+
+
+def measure(name, fn, images, repeats):
+    latencies = []
+    cpu_start = cpu_seconds()
+    for _ in range(repeats):
+        for image in images:
+            start = time.perf_counter()
+            fn(image)
+            latencies.append(time.perf_counter() - start)
+    cpu_per_page = (cpu_seconds() - cpu_start) / len(latencies)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{name:<22} pages={len(latencies):<4} "
+        f"mean={statistics.mean(latencies) * 1000:8.1f} ms  "
+        f"p95={p95 * 1000:8.1f} ms  "
+        f"cpu/page={cpu_per_page * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="Note-page images (default: synthetic pages)")
+    parser.add_argument("-n", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    raw = [Image.open(path) for path in args.images] or [synthetic_page() for _ in range(3)]
+    images = [preprocess_image(img) for img in raw]
+
+    pool = OcrPool(size=1)
+    # Warm both paths so one-off start-up cost doesn't skew the first page
+    legacy_ocr(images[0])
+    pool.recognize(images[0], OCR_CONFIG)
+
+    measure("legacy (2 processes)", legacy_ocr, images, args.repeats)
+    measure(f"pool ({pool.backend})", pooled_ocr(pool), images, args.repeats)
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# preprocess_bench.py
+"""
+Micro-benchmark: the old Pillow preprocessing chain vs the NumPy/OpenCV
+lookup-table version in backend.image_processing.
+
+    python -m StudyFlow.benchmarks.preprocess_bench
+    python -m StudyFlow.benchmarks.preprocess_bench photo1.jpg photo2.jpg -n 20
+
+Default inputs are synthetic note pages at common phone-camera sizes.
+Also checks that both paths produce the same binary image.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageOps
+
+from StudyFlow.backend.image_processing import binarize
+
+PAGE_SIZES = [(1700, 2200), (3024, 4032), (4000, 6000)]
+
+
+def legacy_preprocess(image, contrast_factor=3.0, threshold_val=130):
+    """The pre-vectorisation implementation, minus the debug PNG write."""
+    gray = ImageOps.grayscale(image)
+    enhanced = ImageEnhance.Contrast(gray).enhance(contrast_factor)
+    return enhanced.point(lambda x: 0 if x < threshold_val else 255, '1')
+
+
+def synthetic_page(size):
+    """Off-white paper with uneven lighting and lines of dark text."""
+    width, height = size
+    rng = np.random.default_rng(0)
+    shade = np.linspace(200, 245, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 6, (height, width, 1)).astype(np.float32)
+    page = Image.fromarray(np.clip(shade + noise, 0, 255).astype(np.uint8).repeat(3, axis=2))
+    draw = ImageDraw.Draw(page)
+    for y in range(60, height - 60, 48):
+        draw.text((80, y), "Loop of Henle: countercurrent multiplier, ADH acts on collecting duct.", fill=(30, 30, 30))
+    return page
+
+
+def time_it(fn, image, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(image)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="Images to preprocess (default: synthetic pages)")
+    parser.add_argument("-n", "--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.images:
+        inputs = [(path, Image.open(path).convert("RGB")) for path in args.images]
+    else:
+        inputs = [(f"synthetic {w}x{h}", synthetic_page((w, h))) for w, h in PAGE_SIZES]
+
+    print(f"{'image':<26}{'legacy ms':>12}{'vectorised ms':>16}{'speed-up':>10}{'diff px':>10}")
+    for name, image in inputs:
+        legacy_ms = time_it(legacy_preprocess, image, args.repeats)
+        new_ms = time_it(binarize, image, args.repeats)
+        diff = int((np.asarray(legacy_preprocess(image)) != np.asarray(binarize(image))).sum())
+        print(f"{name:<26}{legacy_ms:>12.1f}{new_ms:>16.1f}{legacy_ms / new_ms:>9.1f}x{diff:>10}")
+
+
+if __name__ == "__main__":
+    main()
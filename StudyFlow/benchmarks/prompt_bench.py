@@ -0,0 +1,110 @@
+# prompt_bench.py
+"""
+Token count, cacheable prefix and latency for every prompt template version.
+
+    python -m StudyFlow.benchmarks.prompt_bench
+    python -m StudyFlow.benchmarks.prompt_bench --calls 20 --latency lognormal:400,0.5
+    python -m StudyFlow.benchmarks.prompt_bench --live --calls 5 --only deepflow_question
+
+Each template in backend.prompts is rendered with representative values
+and reported with:
+
+    tokens   prompt size (tiktoken cl100k_base if installed, else chars / 4)
+    static   tokens of the leading text that is the same on every call,
+             i.e. what a provider can serve from its prompt cache
+    render   microseconds to render the messages
+    p50/p95  latency of --calls chat calls, against fake_llm by default or
+             the real provider with --live (needs API keys; costs money)
+"""
+import argparse
+import statistics
+import time
+import timeit
+
+from StudyFlow.backend import prompts
+from StudyFlow.benchmarks.fake_llm import DEEPFLOW_QUESTION
+
+OCR_JSON = (
+    '{"answers":{"1":{"tag":14,"text":"A. Renin"},"2":{"tag":17,"text":"B. Angiotensin-converting '
+    'enzyme"},"3":{"tag":21,"text":"C. Aldosterone synthase"},"4":{"tag":24,"text":"D. Chymase"}},'
+    '"question":"Which enzyme converts angiotensin I to angiotensin II?"}'
+)
+
+SAMPLE_VALUES = {
+    "deepflow_question": {
+        "topic": "Renal physiology",
+        "previous_questions": [DEEPFLOW_QUESTION["question"]] * 5,
+    },
+    "explanation": {"ocr_json": OCR_JSON, "index": 2},
+    "answer_vote": {"ocr_json": OCR_JSON},
+    "select_best_ocr": {
+        "candidates": "\n\n".join(f"Candidate {i}:\n{OCR_JSON}" for i in (1, 2, 3)),
+        "count": 3,
+    },
+    "ocr_layout": {"text": "[3] Which enzyme converts angiotensin I to angiotensin II? "
+                           "[14] A. Renin [17] B. ACE [21] C. Aldosterone synthase [24] D. Chymase"},
+}
+
+# Where each prompt is sent in the app
+MODELS = {
+    "deepflow_question": ("openai", "gpt-4-turbo"),
+    "answer_vote": ("openai", "gpt-4o"),
+}
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text)), "tiktoken"
+    except ImportError:
+        return lambda text: max(1, len(text) // 4), "chars/4"
+
+
+def latencies(messages, provider, model, calls):
+    from StudyFlow.backend.llm_client import chat
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        chat(provider, model, messages, retries=0)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=0, help="Chat calls per template (0 = no latency)")
+    parser.add_argument("--latency", default="fixed:50", help="fake_llm latency spec")
+    parser.add_argument("--live", action="store_true", help="Call the real providers instead of fake_llm")
+    parser.add_argument("--only", help="Benchmark just this prompt name")
+    args = parser.parse_args()
+
+    if args.calls and not args.live:
+        import os
+        from StudyFlow.benchmarks.fake_llm import provider_env, serve
+        os.environ.update(provider_env(serve(latency=args.latency)))
+
+    count, method = token_counter()
+    print(f"tokens counted with {method}")
+    print(f"{'template':<26}{'tokens':>8}{'static':>8}{'cached%':>9}{'render us':>11}"
+          + (f"{'p50 ms':>9}{'p95 ms':>9}" if args.calls else ""))
+    for template in prompts.all_templates():
+        if args.only and template.name != args.only:
+            continue
+        values = SAMPLE_VALUES[template.name]
+        messages = template.render(**values)
+        tokens = count("".join(m["content"] for m in messages))
+        static = count(template.static_prefix) if template.static_prefix else 0
+        runs = 10000
+        render_us = timeit.timeit(lambda: template.render(**values), number=runs) / runs * 1e6
+        line = f"{template.key:<26}{tokens:>8}{static:>8}{static / tokens:>9.0%}{render_us:>11.2f}"
+        if args.calls:
+            provider, model = MODELS.get(template.name, ("openai", "gpt-3.5-turbo"))
+            times = sorted(latencies(messages, provider, model, args.calls))
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            line += f"{statistics.median(times):>9.1f}{p95:>9.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
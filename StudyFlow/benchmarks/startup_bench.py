@@ -0,0 +1,127 @@
+# startup_bench.py
+"""
+Cold-start benchmark for the desktop menu, meant to run in CI.
+
+    QT_QPA_PLATFORM=offscreen python -m StudyFlow.benchmarks.startup_bench --budget-ms 1500
+
+1. Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+   and reports the cumulative import time plus the slowest imports.
+2. Fails if any mode-only heavyweight (OpenCV, pyautogui, Tesseract, AI
+   SDKs...) is imported just to show the menu.
+3. Times a fresh process from start until ModernMenu has been shown.
+
+Exit status is 1 when a budget is exceeded or a forbidden module shows up.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MENU_MODULE = "StudyFlow.frontend.studyflow_menu"
+
+# These belong to individual study modes and must stay out of the startup path
+FORBIDDEN_AT_STARTUP = [
+    "cv2", "pyautogui", "pytesseract", "numpy", "openai", "anthropic", "cohere", "requests",
+]
+
+MENU_READY_SNIPPET = """
+import time
+start = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+from {module} import ModernMenu
+app = QApplication([])
+menu = ModernMenu()
+menu.show()
+app.processEvents()
+print(f"{{(time.perf_counter() - start) * 1000:.1f}}")
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def run_importtime(module):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"Importing {module} failed")
+    return parse_importtime(proc.stderr)
+
+
+def time_menu_ready(module, runs):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", MENU_READY_SNIPPET.format(module=module)],
+            capture_output=True, text=True, env=env,
+        )
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit("Building the menu failed")
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=MENU_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="Max cumulative import time of --module")
+    parser.add_argument("--ready-budget-ms", type=float, default=3000.0,
+                        help="Max time from process start until the menu is shown")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--skip-ready", action="store_true", help="Only run the import-time check")
+    args = parser.parse_args()
+
+    failures = []
+
+    runs = [run_importtime(args.module) for _ in range(args.runs)]
+    timings = runs[-1]
+    import_ms = statistics.median(run[args.module][1] for run in runs) / 1000
+    print(f"import {args.module}: {import_ms:.1f} ms cumulative (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+
+    print("\nSlowest imports (self time):")
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms cum  {name}")
+
+    if import_ms > args.budget_ms:
+        failures.append(f"import time {import_ms:.1f} ms exceeds {args.budget_ms:.0f} ms")
+
+    leaked = sorted(
+        name for name in timings
+        if name.split(".")[0] in FORBIDDEN_AT_STARTUP
+    )
+    if leaked:
+        roots = sorted({name.split(".")[0] for name in leaked})
+        failures.append("mode-only modules imported at startup: " + ", ".join(roots))
+
+    if not args.skip_ready:
+        ready_ms = time_menu_ready(args.module, args.runs)
+        print(f"\nmenu ready: {ready_ms:.1f} ms (median of {args.runs}, budget {args.ready_budget_ms:.0f} ms)")
+        if ready_ms > args.ready_budget_ms:
+            failures.append(f"menu ready {ready_ms:.1f} ms exceeds {args.ready_budget_ms:.0f} ms")
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# trace_viewer.py
+"""
+Collector stand-in and waterfall view for backend.tracing spans.
+
+    # Collect spans from every process (web, Celery workers) into one file
+    python -m StudyFlow.benchmarks.trace_viewer serve --port 4318 --out traces.jsonl
+    TRACING=http TRACE_ENDPOINT=http://127.0.0.1:4318/v1/spans gunicorn ...
+
+    # Or have each process append to a file directly
+    TRACING=file TRACE_FILE=traces.jsonl ...
+
+    # Timing waterfall for the slowest traces, or one trace by id (X-Trace-Id)
+    python -m StudyFlow.benchmarks.trace_viewer show traces.jsonl --slowest 5
+    python -m StudyFlow.benchmarks.trace_viewer show traces.jsonl --trace 4bf92f3577b34da6a3ce929d0e0e4736
+
+Each line of the waterfall is one span: start offset and duration in ms,
+the service (web / worker role) it ran in, and a bar on the trace's
+timeline, nested under its parent.
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ---------------------------------------------------------------
+# Collector
+# ---------------------------------------------------------------
+def serve(port, out, host="127.0.0.1"):
+    lock = threading.Lock()
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                spans = json.loads(self.rfile.read(length) or b"[]")
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with lock, open(out, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span, separators=(",", ":")) + "\n")
+            self.send_response(204)
+            self.end_headers()
+
+    server = ThreadingHTTPServer((host, port), CollectorHandler)
+    print(f"Collecting spans on http://{host}:{server.server_port}/v1/spans into {out}")
+    return server
+
+
+# ---------------------------------------------------------------
+# Waterfall
+# ---------------------------------------------------------------
+def load_traces(path):
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def _duration_ms(spans):
+    start = min(s["start_time_unix_nano"] for s in spans)
+    end = max(s["end_time_unix_nano"] for s in spans)
+    return (end - start) / 1e6
+
+
+def waterfall(spans, width=40):
+    """Lines of the timing waterfall for one trace's spans."""
+    ids = {s["span_id"] for s in spans}
+    children = defaultdict(list)
+    for s in spans:
+        parent = s["parent_span_id"] if s["parent_span_id"] in ids else None
+        children[parent].append(s)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s["start_time_unix_nano"])
+
+    start = min(s["start_time_unix_nano"] for s in spans)
+    total = max(_duration_ms(spans), 1e-3)
+    lines = []
+
+    def walk(parent, depth):
+        for s in children.get(parent, []):
+            offset = (s["start_time_unix_nano"] - start) / 1e6
+            duration = (s["end_time_unix_nano"] - s["start_time_unix_nano"]) / 1e6
+            left = int(offset / total * width)
+            bar = " " * left + "█" * max(1, int(round(duration / total * width)))
+            name = ("  " * depth + s["name"])[:56]
+            flag = " !" if s.get("status") == "error" else ""
+            lines.append(f"{offset:>9.1f}{duration:>10.1f}  {s.get('service', ''):<8}{name:<58}|{bar:<{width}}|{flag}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+def show(path, trace_id=None, slowest=5, width=40):
+    traces = load_traces(path)
+    if trace_id:
+        selected = [trace_id] if trace_id in traces else []
+        if not selected:
+            print(f"No trace {trace_id} in {path}")
+    else:
+        selected = sorted(traces, key=lambda t: _duration_ms(traces[t]), reverse=True)[:slowest]
+    for tid in selected:
+        spans = traces[tid]
+        root = min(spans, key=lambda s: s["start_time_unix_nano"])
+        services = sorted({s.get("service", "") for s in spans})
+        print(f"\ntrace {tid}  {root['name']}  {_duration_ms(spans):.1f} ms  "
+              f"{len(spans)} spans  ({', '.join(services)})")
+        print(f"{'start ms':>9}{'dur ms':>10}  {'service':<8}{'span':<58}")
+        for line in waterfall(spans, width):
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    collect = sub.add_parser("serve", help="Receive spans over HTTP and append them to a file")
+    collect.add_argument("--host", default="127.0.0.1")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", default="traces.jsonl")
+    view = sub.add_parser("show", help="Print timing waterfalls")
+    view.add_argument("path")
+    view.add_argument("--trace", help="Trace id to show (default: the slowest traces)")
+    view.add_argument("--slowest", type=int, default=5)
+    view.add_argument("--width", type=int, default=40, help="Width of the timeline bars")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = serve(args.port, args.out, args.host)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        show(args.path, args.trace, args.slowest, args.width)
+
+
+if __name__ == "__main__":
+    main()
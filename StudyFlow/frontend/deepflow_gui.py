@@ -5,8 +5,12 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QPainter, QColor, QLinearGradient, QBrush, QPixmap
 from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve
-# Import the DeepFlow logic; adjust the import as needed for your package structure.
-from .deepflow import get_deepflow_question
+from .deepflow_session import DeepFlowSession
+from .task_runner import TaskRunner
+from .topic_packs import next_question, sync_pack
+
+# How long to wait for a question before giving up (the model call itself keeps running)
+QUESTION_TIMEOUT_MS = 45000
 
 class GradientWidget(QWidget):
     def paintEvent(self, event):
@@ -63,9 +67,19 @@ class DeepFlowWindow(QMainWindow):
 
         # State variables for quiz logic
         self.topic = ""
+        # Topic, asked questions and score live in the backend session; the
+        # local list only keeps the offline pack from repeating itself
+        self.session = None
         self.previous_questions = []
         self.current_question_data = None
 
+        # Model calls run on a worker thread so the window keeps painting
+        self.tasks = TaskRunner(self)
+        self.pending_question = None
+        # Pack question text -> answer index waiting for /shown to go through
+        # (None until answered); the backend rejects answers it wasn't shown
+        self.pending_shown = {}
+
         # Fade-in animation
         self.setWindowOpacity(0)
         self.fade_anim = QPropertyAnimation(self, b"windowOpacity")
@@ -163,6 +177,7 @@ class DeepFlowWindow(QMainWindow):
         control_layout.addWidget(self.help_button)
         self.next_button = GlowButton("Next", self.content_widget)
         self.next_button.clicked.connect(self.load_next_question)
+        self.next_button.setEnabled(False)  # until Start creates the session
         control_layout.addWidget(self.next_button)
         self.content_layout.addWidget(control_widget)
 
@@ -173,16 +188,52 @@ class DeepFlowWindow(QMainWindow):
         entered_topic = self.topic_input.text().strip()
         if entered_topic:
             self.topic = entered_topic
+            self.session = DeepFlowSession(self.topic)  # created on the backend with the first question
             self.previous_questions = []  # Reset previous questions for the new topic
+            self.pending_shown = {}
+            # Top up the offline pack for this topic in the background; failures just mean no pack
+            self.tasks.submit(sync_pack, self.topic, on_success=lambda count: None,
+                              on_error=lambda message: None, timeout_ms=QUESTION_TIMEOUT_MS)
             self.load_next_question()
         else:
             self.question_label.setText("Please enter a topic before starting DeepFlow.")
 
     def load_next_question(self):
-        """Loads a new quiz question using your deepflow logic."""
+        """Requests a new quiz question in the background; the UI updates when it arrives."""
+        if self.session is None:
+            return
         self.explanation_label.setVisible(False)
-        # Call your deepflow logic to get a new question
-        question_data = get_deepflow_question(self.topic, self.previous_questions)
+        if self.pending_question is not None:
+            self.pending_question.cancel()
+        # A downloaded topic pack answers instantly, no round trip
+        local_question = next_question(self.topic, self.previous_questions)
+        if local_question is not None:
+            self.show_question(local_question)
+            self.report_shown(local_question.get("question", ""))
+            return
+        self.question_label.setText("Loading question...")
+        self.next_button.setEnabled(False)
+        self.start_button.setEnabled(False)
+        # Ask the backend session for the next question (off the GUI thread)
+        self.pending_question = self.tasks.submit(
+            self.session.next_question,
+            on_success=self.show_question,
+            on_error=lambda message: self.question_failed("Failed to load question."),
+            on_timeout=lambda: self.question_failed("Timed out loading question. Press Next to retry."),
+            timeout_ms=QUESTION_TIMEOUT_MS,
+        )
+
+    def question_failed(self, message):
+        self.pending_question = None
+        self.next_button.setEnabled(True)
+        self.start_button.setEnabled(True)
+        self.question_label.setText(message)
+
+    def show_question(self, question_data):
+        """Renders a question returned by the background request."""
+        self.pending_question = None
+        self.next_button.setEnabled(True)
+        self.start_button.setEnabled(True)
         if question_data:
             self.current_question_data = question_data
             self.previous_questions.append(question_data.get("question", ""))
@@ -200,6 +251,26 @@ class DeepFlowWindow(QMainWindow):
         else:
             self.question_label.setText("Failed to load question.")
 
+    def report_shown(self, question_text):
+        """Tell the backend a pack question is on screen, so it won't generate it again and will score it."""
+        self.pending_shown[question_text] = None
+        self.tasks.submit(self.session.record_shown, question_text,
+                          on_success=lambda state, text=question_text: self.shown_reported(text),
+                          on_error=lambda message, text=question_text: self.pending_shown.pop(text, None),
+                          on_timeout=lambda text=question_text: self.pending_shown.pop(text, None),
+                          timeout_ms=QUESTION_TIMEOUT_MS)
+
+    def shown_reported(self, question_text):
+        selected_index = self.pending_shown.pop(question_text, None)
+        if selected_index is not None:
+            self.report_answer(question_text, selected_index)
+
+    def report_answer(self, question_text, selected_index):
+        # The backend keeps the score (counted once per question)
+        self.tasks.submit(self.session.record_answer, question_text, selected_index,
+                          on_success=lambda state: None, on_error=lambda message: None,
+                          timeout_ms=QUESTION_TIMEOUT_MS)
+
     def check_answer(self, selected_index):
         """Checks the answer and displays feedback."""
         correct_index = self.current_question_data.get("correct_index", -1)
@@ -208,15 +279,29 @@ class DeepFlowWindow(QMainWindow):
             self.question_label.setText("Correct! " + self.current_question_data.get("question", ""))
         else:
             self.question_label.setText("Incorrect! " + self.current_question_data.get("question", ""))
+        question_text = self.current_question_data.get("question", "")
+        if question_text in self.pending_shown:
+            # Sent once /shown has gone through; only the first answer counts anyway
+            if self.pending_shown[question_text] is None:
+                self.pending_shown[question_text] = selected_index
+        else:
+            self.report_answer(question_text, selected_index)
         self.explanation_label.setText(explanation)
         self.explanation_label.setVisible(True)
 
     def show_explanation(self):
         """Shows the explanation for the current question."""
+        if not self.current_question_data:
+            return
         explanation = self.current_question_data.get("explanation", "")
         self.explanation_label.setText(explanation)
         self.explanation_label.setVisible(True)
 
+    def closeEvent(self, event):
+        # Drop any in-flight request so its callback never touches a closed window
+        self.tasks.cancel_all()
+        super().closeEvent(event)
+
     # Overridden mouse events to allow the window to be moved by dragging anywhere
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -0,0 +1,83 @@
+# deepflow_session.py
+"""
+Client side of the backend's DeepFlow sessions (backend/study_sessions.py).
+
+    session = DeepFlowSession("Renal physiology")
+    question = session.next_question()      # creates the session on first use
+    session.record_answer(question["question"], answer_index=2)
+
+    session.record_shown(pack_question["question"])   # offline pack question on screen
+    session.record_answer(pack_question["question"], answer_index=1)   # only once that returned
+
+The backend keeps the topic, the questions already asked and the score,
+so requests carry only the session ID. DeepFlowSession.resume(session_id)
+picks up a session started on another device. All methods block, so the
+GUI runs them through TaskRunner; the session is created only once even
+when several of them run at the same time.
+"""
+import threading
+
+from StudyFlow import config
+
+REQUEST_TIMEOUT = 45
+
+
+class DeepFlowSession:
+    def __init__(self, topic, session_id=None, stripe_id=None):
+        self.topic = topic
+        self.session_id = session_id
+        self.stripe_id = stripe_id
+        self.score = 0
+        self.answered = 0
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def resume(cls, session_id):
+        """Load a session by ID, e.g. one started on another device."""
+        session = cls(None, session_id)
+        session._update(session._request("GET", f"/api/deepflow/session/{session_id}"))
+        return session
+
+    def _request(self, method, path, payload=None):
+        import requests
+        response = requests.request(method, f"{config.BACKEND_URL}{path}", json=payload,
+                                    timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _update(self, state):
+        self.session_id = state["session_id"]
+        self.topic = state["topic"]
+        self.score = state["score"]
+        self.answered = state["answered"]
+        return state
+
+    def start(self):
+        payload = {"topic": self.topic}
+        if self.stripe_id:
+            payload["stripe_id"] = self.stripe_id
+        return self._update(self._request("POST", "/api/deepflow/session", payload))
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self.session_id is None:
+                self.start()
+
+    def next_question(self):
+        self._ensure_started()
+        return self._request("POST", "/api/deepflow_question", {"session_id": self.session_id})
+
+    def record_shown(self, question_text):
+        """Tell the backend an offline pack question is on screen, before its answer is reported."""
+        self._ensure_started()
+        return self._update(self._request(
+            "POST", f"/api/deepflow/session/{self.session_id}/shown", {"question": question_text},
+        ))
+
+    def record_answer(self, question_text, answer_index):
+        """Report an answer; the backend scores it and returns the updated session state."""
+        self._ensure_started()
+        return self._update(self._request(
+            "POST", f"/api/deepflow/session/{self.session_id}/answer",
+            {"question": question_text, "answer_index": answer_index},
+        ))
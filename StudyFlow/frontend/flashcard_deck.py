@@ -0,0 +1,193 @@
+# flashcard_deck.py
+"""
+Flashcard deck browser built on Qt's model/view classes.
+
+Instead of a widget tree per card, one QListView asks FlashcardModel for the
+rows it is about to show and FlashcardDelegate paints them. Cards are read
+from the JSON deck in batches as the view scrolls (canFetchMore/fetchMore),
+so opening a 10k-card deck parses only the first screenful, and the only
+per-card cost is the question/answer strings themselves.
+"""
+import json
+
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QVBoxLayout, QLabel, QWidget
+from PySide6.QtGui import QColor, QFont, QPainter, QPen
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, Signal
+
+from StudyFlow import config
+from StudyFlow.logging_utils import debug_log
+
+BATCH_SIZE = 200
+CARD_HEIGHT = 110
+CARD_MARGIN = 6
+CARD_PADDING = 12
+
+AnswerRole = Qt.UserRole + 1
+RevealedRole = Qt.UserRole + 2
+
+
+def iter_cards(path, chunk_size=1 << 16):
+    """Yield (question, answer) from a JSON array of cards without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf, pos, started = "", 0, False
+        while True:
+            # Skip whitespace, the opening bracket and separators between cards
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                started = started or buf[pos] == "["
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if not started or pos >= len(buf):
+                    raise ValueError("need more data")
+                card, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    if buf[pos:].strip():
+                        raise ValueError(f"Truncated flashcard deck: {path}")
+                    return
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield str(card.get("question", "")), str(card.get("answer", ""))
+
+
+class FlashcardModel(QAbstractListModel):
+    """Cards loaded so far, plus which of them have their answer showing."""
+
+    batch_loaded = Signal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cards = []
+        self._revealed = set()
+        self._source = None  # opened on the first fetchMore
+        self._pending = None
+        self._exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._cards)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        question, answer = self._cards[index.row()]
+        if role == Qt.DisplayRole:
+            return question
+        if role == AnswerRole:
+            return answer
+        if role == RevealedRole:
+            return index.row() in self._revealed
+        if role == Qt.ToolTipRole:
+            return f"Q: {question}\n\nA: {answer}"
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        if self._source is None:
+            self._source = iter_cards(self.path)
+        # Read one card past the batch so the model knows when the deck is done
+        batch = [self._pending] if self._pending is not None else []
+        self._pending = None
+        try:
+            for card in self._source:
+                batch.append(card)
+                if len(batch) > BATCH_SIZE:
+                    break
+            else:
+                self._exhausted = True
+        except (OSError, ValueError) as e:
+            debug_log(f"❌ Could not read flashcards from {self.path}: {e}")
+            self._exhausted = True
+        if len(batch) > BATCH_SIZE:
+            self._pending = batch.pop()
+        if batch:
+            first = len(self._cards)
+            self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+            self._cards.extend(batch)
+            self.endInsertRows()
+        self.batch_loaded.emit()
+
+    def toggle_answer(self, index):
+        row = index.row()
+        self._revealed.symmetric_difference_update({row})
+        self.dataChanged.emit(index, index, [RevealedRole])
+
+
+class FlashcardDelegate(QStyledItemDelegate):
+    """Paints a card: question on top, answer (or a hint) underneath."""
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), CARD_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        card = option.rect.adjusted(CARD_MARGIN, CARD_MARGIN, -CARD_MARGIN, -CARD_MARGIN)
+        hovered = option.state & QStyle.State_MouseOver
+        painter.setPen(QPen(QColor(174, 201, 245), 1))
+        painter.setBrush(QColor(255, 255, 255) if not hovered else QColor(240, 247, 255))
+        painter.drawRoundedRect(card, 12, 12)
+
+        text = card.adjusted(CARD_PADDING, CARD_PADDING, -CARD_PADDING, -CARD_PADDING)
+        half = text.height() // 2
+        flags = Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap
+
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor(51, 51, 51))
+        painter.drawText(QRect(text.left(), text.top(), text.width(), half), flags,
+                         f"Q: {index.data(Qt.DisplayRole)}")
+
+        font.setBold(False)
+        painter.setFont(font)
+        answer_rect = QRect(text.left(), text.top() + half, text.width(), text.height() - half)
+        if index.data(RevealedRole):
+            painter.setPen(QColor(255, 47, 47))
+            painter.drawText(answer_rect, flags, f"A: {index.data(AnswerRole)}")
+        else:
+            painter.setPen(QColor(140, 140, 140))
+            painter.drawText(answer_rect, flags, "Click to show answer")
+        painter.restore()
+
+
+class FlashcardDeck(QWidget):
+    """Deck browser: click a card to show or hide its answer."""
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        self.count_label = QLabel(self)
+        self.count_label.setStyleSheet("font-size: 14px; color: #333333; font-weight: bold;")
+        layout.addWidget(self.count_label)
+
+        self.model = FlashcardModel(path or config.FLASHCARDS_FILE, self)
+        self.view = QListView(self)
+        # Every card is the same height, so the view never measures rows
+        # it is not about to draw.
+        self.view.setUniformItemSizes(True)
+        self.view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.view.setMouseTracking(True)
+        self.view.setStyleSheet("QListView { background: transparent; border: none; }")
+        self.view.setItemDelegate(FlashcardDelegate(self.view))
+        self.view.setModel(self.model)
+        self.view.clicked.connect(self.model.toggle_answer)
+        layout.addWidget(self.view, 1)
+
+        self.model.batch_loaded.connect(self.update_count)
+        self.update_count()
+
+    def update_count(self):
+        count = self.model.rowCount()
+        more = "+" if self.model.canFetchMore() else ""
+        self.count_label.setText(f"{count}{more} cards")
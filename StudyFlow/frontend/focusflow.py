@@ -16,6 +16,10 @@ from StudyFlow.ocr_extraction import (
     convert_answers_list_to_dict
 )
 from StudyFlow.ai_manager import triple_call_ai_api_json_final
+from .task_runner import TaskRunner
+
+# OCR + three model votes + an explanation can take a while on a slow link
+ANALYSIS_TIMEOUT_MS = 60000
 
 # Global variables to store the selected question region and the last OCR mapping.
 QUESTION_REGION = None
@@ -108,6 +112,12 @@ class FocusFlowOverlay(QDialog):
         self.debounce_timer = None  # For debouncing updates
         self.last_tagged_text = None  # To store last OCR text
         self.scanning_active = False  # State flag for scanning
+        self.pending_tagged_text = None  # OCR text waiting out the debounce
+
+        # OCR and model calls run on worker threads so the overlay stays responsive
+        self.tasks = TaskRunner(self)
+        self.poll_task = None     # In-flight OCR poll
+        self.refresh_task = None  # In-flight full refresh
 
         # Center the overlay on the screen.
         screen = self.screen().availableGeometry()
@@ -215,30 +225,40 @@ class FocusFlowOverlay(QDialog):
         selector = RegionSelector()
         if selector.exec() == QDialog.Accepted:
             QUESTION_REGION = selector.selected_rect
-            full_answer, explanation, merged_json = get_focusflow_data(QUESTION_REGION)
-            self.full_answer = full_answer
-            self.explanation = explanation
-            self.answer_label.setText(f"Answer:\n{self.full_answer}")
-            self.explanation_label.setText(f"Explanation:\n{self.explanation}")
-            region_tuple = (QUESTION_REGION.x(), QUESTION_REGION.y(), QUESTION_REGION.width(), QUESTION_REGION.height())
-            new_tagged_text, _ = get_tagged_words_from_region(region_tuple)
-            self.last_tagged_text = new_tagged_text
-            # Optionally, create a highlighter overlay.
-            try:
-                chosen_index = triple_call_ai_api_json_final(merged_json)
-                chosen_tag = merged_json["answers"][str(chosen_index)]["tag"]
-                global LAST_MAPPING
-                if LAST_MAPPING and chosen_tag in LAST_MAPPING:
-                    word_info = LAST_MAPPING[chosen_tag]
-                    highlight_rect = QRect(
-                        QUESTION_REGION.x() + word_info['left'],
-                        QUESTION_REGION.y() + word_info['top'],
-                        word_info['width'],
-                        word_info['height']
-                    )
-                    AnswerHighlighter(highlight_rect)
-            except Exception as e:
-                print("Error highlighting answer:", e)
+            self.answer_label.setText("Answer:\nAnalysing question...")
+            if self.refresh_task is not None:
+                self.refresh_task.cancel()
+            self.refresh_task = self.tasks.submit(
+                analyse_region,
+                QUESTION_REGION,
+                on_success=self.show_region_analysis,
+                on_error=lambda message: self.show_refresh_error("Error analysing region: " + message),
+                on_timeout=lambda: self.show_refresh_error("Timed out analysing region."),
+                timeout_ms=ANALYSIS_TIMEOUT_MS,
+            )
+
+    def show_region_analysis(self, analysis):
+        self.refresh_task = None
+        full_answer, explanation, new_tagged_text, chosen_tag = analysis
+        self.full_answer = full_answer
+        self.explanation = explanation
+        self.answer_label.setText(f"Answer:\n{self.full_answer}")
+        self.explanation_label.setText(f"Explanation:\n{self.explanation}")
+        self.last_tagged_text = new_tagged_text
+        # Optionally, create a highlighter overlay.
+        if LAST_MAPPING and chosen_tag in LAST_MAPPING:
+            word_info = LAST_MAPPING[chosen_tag]
+            highlight_rect = QRect(
+                QUESTION_REGION.x() + word_info['left'],
+                QUESTION_REGION.y() + word_info['top'],
+                word_info['width'],
+                word_info['height']
+            )
+            self.highlighter = AnswerHighlighter(highlight_rect)
+
+    def show_refresh_error(self, message):
+        self.refresh_task = None
+        self.answer_label.setText(f"Answer:\n{message}")
 
     def immediate_refresh(self):
         # Cancel any pending debounce timer and update immediately.
@@ -254,33 +274,61 @@ class FocusFlowOverlay(QDialog):
 
     def check_for_update(self):
         global QUESTION_REGION
-        if QUESTION_REGION:
-            region_tuple = (QUESTION_REGION.x(), QUESTION_REGION.y(), QUESTION_REGION.width(), QUESTION_REGION.height())
-            new_tagged_text, mapping = get_tagged_words_from_region(region_tuple)
-            # If there's no previous text or the new text is significantly different.
-            if self.last_tagged_text is None or difflib.SequenceMatcher(None, self.last_tagged_text, new_tagged_text).ratio() < 0.90:
-                self.pending_tagged_text = new_tagged_text
-                # Only start a new debounce timer if one isn’t already running.
-                if not self.debounce_timer or not self.debounce_timer.isActive():
-                    self.debounce_timer = QTimer(self)
-                    self.debounce_timer.setSingleShot(True)
-                    self.debounce_timer.timeout.connect(self.update_focusflow_data)
-                    self.debounce_timer.start(2000)  # 2-second delay
+        # Skip this tick if the previous OCR poll (or a refresh) hasn't come back yet
+        if not QUESTION_REGION or self.poll_task is not None or self.refresh_task is not None:
+            return
+        region_tuple = (QUESTION_REGION.x(), QUESTION_REGION.y(), QUESTION_REGION.width(), QUESTION_REGION.height())
+        self.poll_task = self.tasks.submit(
+            get_tagged_words_from_region,
+            region_tuple,
+            on_success=self.on_poll_result,
+            on_error=lambda message: self.clear_poll(),
+            on_timeout=self.clear_poll,
+            timeout_ms=ANALYSIS_TIMEOUT_MS,
+        )
+
+    def clear_poll(self):
+        self.poll_task = None
+
+    def on_poll_result(self, result):
+        self.poll_task = None
+        new_tagged_text, mapping = result
+        # If there's no previous text or the new text is significantly different.
+        if self.last_tagged_text is None or difflib.SequenceMatcher(None, self.last_tagged_text, new_tagged_text).ratio() < 0.90:
+            self.pending_tagged_text = new_tagged_text
+            # Only start a new debounce timer if one isn’t already running.
+            if not self.debounce_timer or not self.debounce_timer.isActive():
+                self.debounce_timer = QTimer(self)
+                self.debounce_timer.setSingleShot(True)
+                self.debounce_timer.timeout.connect(self.update_focusflow_data)
+                self.debounce_timer.start(2000)  # 2-second delay
 
     def update_focusflow_data(self):
         global QUESTION_REGION
-        if QUESTION_REGION:
-            region_tuple = (QUESTION_REGION.x(), QUESTION_REGION.y(), QUESTION_REGION.width(), QUESTION_REGION.height())
-            current_tagged_text, mapping = get_tagged_words_from_region(region_tuple)
-            if difflib.SequenceMatcher(None, self.pending_tagged_text, current_tagged_text).ratio() >= 0.90:
-                full_answer, explanation, _ = get_focusflow_data(QUESTION_REGION)
-                if full_answer != self.full_answer or explanation != self.explanation:
-                    self.full_answer = full_answer
-                    self.explanation = explanation
-                    self.answer_label.setText(f"Answer:\n{self.full_answer}")
-                    self.explanation_label.setText(f"Explanation:\n{self.explanation}")
-                    self.last_tagged_text = self.pending_tagged_text
         self.debounce_timer = None
+        if QUESTION_REGION and self.refresh_task is None:
+            self.refresh_task = self.tasks.submit(
+                refresh_region,
+                QUESTION_REGION,
+                self.pending_tagged_text,
+                on_success=self.on_refresh_result,
+                on_error=lambda message: self.show_refresh_error("Error refreshing: " + message),
+                on_timeout=lambda: self.show_refresh_error("Timed out refreshing answer."),
+                timeout_ms=ANALYSIS_TIMEOUT_MS,
+            )
+
+    def on_refresh_result(self, result):
+        self.refresh_task = None
+        if result is None:
+            return  # text was still changing; the next poll will pick it up
+        full_answer, explanation = result
+        if full_answer != self.full_answer or explanation != self.explanation:
+            self.full_answer = full_answer
+            self.explanation = explanation
+            self.answer_label.setText(f"Answer:\n{self.full_answer}")
+            self.explanation_label.setText(f"Explanation:\n{self.explanation}")
+            if self.pending_tagged_text is not None:
+                self.last_tagged_text = self.pending_tagged_text
 
     def stop_polling(self):
         if self.timer:
@@ -292,6 +340,7 @@ class FocusFlowOverlay(QDialog):
 
     def closeEvent(self, event):
         self.stop_polling()
+        self.tasks.cancel_all()
         event.accept()
 
     # Make the overlay moveable.
@@ -320,13 +369,12 @@ def get_explanation(ocr_json, chosen_index):
         " is correct. Provide a concise explanation (max 100 words)."
     )
     try:
-        import openai
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        from StudyFlow.backend.llm_client import chat
+        explanation = chat(
+            "openai", "gpt-3.5-turbo",
+            [{"role": "user", "content": prompt}],
             temperature=0.0
         )
-        explanation = response['choices'][0]['message']['content'].strip()
     except Exception as e:
         explanation = "Error generating explanation: " + str(e)
     return explanation
@@ -361,6 +409,34 @@ def get_focusflow_data(region):
     explanation = get_explanation(merged_json, correct_index)
     return full_answer, explanation, merged_json
 
+def analyse_region(region):
+    """
+    Blocking OCR + AI pass over `region` for FocusFlowOverlay.select_region.
+    Runs on a worker thread; returns (full_answer, explanation, tagged_text, chosen_tag).
+    """
+    full_answer, explanation, merged_json = get_focusflow_data(region)
+    region_tuple = (region.x(), region.y(), region.width(), region.height())
+    new_tagged_text, _ = get_tagged_words_from_region(region_tuple)
+    chosen_tag = None
+    try:
+        chosen_index = triple_call_ai_api_json_final(merged_json)
+        chosen_tag = merged_json["answers"][str(chosen_index)]["tag"]
+    except Exception as e:
+        print("Error highlighting answer:", e)
+    return full_answer, explanation, new_tagged_text, chosen_tag
+
+def refresh_region(region, pending_tagged_text):
+    """
+    Re-OCR `region` and, once the text has settled (or on a manual refresh),
+    return (full_answer, explanation). Returns None if the text is still changing.
+    """
+    region_tuple = (region.x(), region.y(), region.width(), region.height())
+    current_tagged_text, _ = get_tagged_words_from_region(region_tuple)
+    if pending_tagged_text is not None and difflib.SequenceMatcher(None, pending_tagged_text, current_tagged_text).ratio() < 0.90:
+        return None
+    full_answer, explanation, _ = get_focusflow_data(region)
+    return full_answer, explanation
+
 def launch_focus_flow(parent_window):
     """
     Checks if a question region is set; if not, launches the region selector.
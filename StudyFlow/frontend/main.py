@@ -1,13 +1,11 @@
 import os
-import pytesseract
 from StudyFlow.config import TESSERACT_PATH
 from StudyFlow.studyflow_menu import main as launch_menu
 from StudyFlow.logging_utils import debug_log
 
-# Set Tesseract command path early
-if os.path.exists(TESSERACT_PATH):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
-else:
+# Fail fast if Tesseract is missing; pytesseract itself is configured in
+# ocr_extraction, which is only imported once an OCR mode is opened.
+if not os.path.exists(TESSERACT_PATH):
     raise FileNotFoundError(f"Tesseract not found at {TESSERACT_PATH}")
 
 def main():
@@ -4,10 +4,14 @@ import re
 import difflib
 import pyautogui
 from StudyFlow.image_processing import preprocess_image, preprocess_image_custom
+from StudyFlow.config import TESSERACT_PATH
 from StudyFlow.logging_utils import debug_log
 import time
 import random
 
+# Set Tesseract command path (moved here from main.py so startup doesn't pay for it)
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+
 def get_tagged_words_from_processed(processed):
     data = pytesseract.image_to_data(processed, output_type=pytesseract.Output.DICT,
                                      config="--psm 6 --oem 3")
@@ -91,13 +95,12 @@ def get_best_tagged_words_from_region(region):
     
     debug_log("Sending combined OCR candidates to OpenAI for selection.")
     try:
-        import openai
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": combined_prompt}],
+        from StudyFlow.backend.llm_client import chat
+        ai_choice = chat(
+            "openai", "gpt-3.5-turbo",
+            [{"role": "user", "content": combined_prompt}],
             temperature=0.0
         )
-        ai_choice = response['choices'][0]['message']['content'].strip()
         debug_log(f"AI chose candidate: {ai_choice}")
         chosen_candidate = int(re.findall(r'\d+', ai_choice)[0])
     except Exception as e:
@@ -115,13 +118,12 @@ def ai_structure_layout(ocr_text):
     )
     debug_log("Sending OCR text to OpenAI for layout correction.")
     try:
-        import openai
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        from StudyFlow.backend.llm_client import chat
+        ai_response = chat(
+            "openai", "gpt-3.5-turbo",
+            [{"role": "user", "content": prompt}],
             temperature=0.0
         )
-        ai_response = response['choices'][0]['message']['content'].strip()
         debug_log("AI layout correction response: " + ai_response)
         structured = json.loads(ai_response)
         return structured
@@ -10,15 +10,21 @@ from PySide6.QtGui import (
 from PySide6.QtCore import (
     Qt, QPoint, QRect, QPropertyAnimation, QEasingCurve, QTimer
 )
-
-# Attempt to import your quiz GUI, or use a placeholder.
-try:
-    from StudyFlow.gui import MainWindow as QuizMainWindow
-except ImportError:
-    class QuizMainWindow(QMainWindow):
-        def __init__(self):
-            super().__init__()
-            self.setWindowTitle("Quiz Window Placeholder")
+from .flashcard_deck import FlashcardDeck
+
+# Mode windows (quiz GUI, FocusFlow, DeepFlow) pull in pyautogui, OpenCV,
+# Tesseract and the AI SDKs, so they are imported when first opened rather
+# than at startup.
+def load_quiz_window_class():
+    """Attempt to import your quiz GUI, or use a placeholder."""
+    try:
+        from StudyFlow.gui import MainWindow as QuizMainWindow
+    except ImportError:
+        class QuizMainWindow(QMainWindow):
+            def __init__(self):
+                super().__init__()
+                self.setWindowTitle("Quiz Window Placeholder")
+    return QuizMainWindow
 
 ###############################################################################
 # GradientWidget: Pastel background with rounded corners
@@ -70,38 +76,6 @@ class GlowButton(QPushButton):
         self.setGraphicsEffect(None)
         super().leaveEvent(event)
 
-###############################################################################
-# FlashcardWidget (kept for legacy or future use, not integrated now)
-###############################################################################
-class FlashcardWidget(QWidget):
-    def __init__(self, question, answer, parent=None):
-        super().__init__(parent)
-        self.question = question
-        self.answer = answer
-        self.init_ui()
-
-    def init_ui(self):
-        layout = QVBoxLayout(self)
-        self.question_label = QLabel(f"Q: {self.question}", self)
-        self.question_label.setWordWrap(True)
-        layout.addWidget(self.question_label)
-        self.answer_label = QLabel(f"A: {self.answer}", self)
-        self.answer_label.setWordWrap(True)
-        self.answer_label.setVisible(False)
-        layout.addWidget(self.answer_label)
-        self.toggle_button = QPushButton("Show Answer", self)
-        self.toggle_button.clicked.connect(self.toggle_answer)
-        layout.addWidget(self.toggle_button)
-        self.setLayout(layout)
-
-    def toggle_answer(self):
-        if self.answer_label.isVisible():
-            self.answer_label.setVisible(False)
-            self.toggle_button.setText("Show Answer")
-        else:
-            self.answer_label.setVisible(True)
-            self.toggle_button.setText("Hide Answer")
-
 ###############################################################################
 # ModernMenu QMainWindow (Main Application Window)
 ###############################################################################
@@ -156,7 +130,7 @@ class ModernMenu(QMainWindow):
         spacer.setFixedWidth(20)
         self.top_bar_layout.addWidget(spacer)
 
-        # Tab bar - now with four tabs: Home, FreeFlow, FocusFlow, DeepFlow
+        # Tab bar - Home, FreeFlow, FocusFlow, DeepFlow, Flashcards
         self.tab_bar = QTabBar(self.top_bar)
         self.tab_bar.setStyleSheet("""
             QTabBar::tab {
@@ -181,6 +155,7 @@ class ModernMenu(QMainWindow):
         self.tab_bar.addTab("FreeFlow")     # index 1
         self.tab_bar.addTab("FocusFlow")    # index 2
         self.tab_bar.addTab("DeepFlow")     # index 3
+        self.tab_bar.addTab("Flashcards")   # index 4
         self.tab_bar.setCurrentIndex(0)
         self.tab_bar.currentChanged.connect(self.slide_to_index)
         self.top_bar_layout.addWidget(self.tab_bar)
@@ -334,6 +309,10 @@ class ModernMenu(QMainWindow):
         self.deepflow_page.setLayout(deep_layout)
         self.stacked_widget.addWidget(self.deepflow_page)  # index 3
 
+        # -- (4) Flashcards Page: one list view for the whole deck, cards load as you scroll
+        self.flashcards_page = FlashcardDeck()
+        self.stacked_widget.addWidget(self.flashcards_page)  # index 4
+
         # For window dragging in the main window
         self._drag_pos = None
 
@@ -388,7 +367,7 @@ class ModernMenu(QMainWindow):
 
     def open_quiz_gui(self):
         """Opens your quiz GUI."""
-        self.quiz_window = QuizMainWindow()
+        self.quiz_window = load_quiz_window_class()()
         self.quiz_window.show()
     
     def start_focus_flow(self):
@@ -414,6 +393,7 @@ def show_main_window(splash):
     global main_window
     main_window = ModernMenu()
     main_window.show()
+    # Dismiss the splash as soon as the menu is actually on screen
     splash.finish(main_window)
 
 def main():
@@ -425,7 +405,10 @@ def main():
                                    Qt.SmoothTransformation)
     splash = QSplashScreen(splash_pix)
     splash.show()
-    QTimer.singleShot(2000, lambda: show_main_window(splash))
+    # Paint the splash before building the menu, then build it right away
+    # instead of waiting a fixed delay.
+    app.processEvents()
+    QTimer.singleShot(0, lambda: show_main_window(splash))
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+# task_runner.py
+"""
+Run blocking network / model calls off the Qt main thread.
+
+    self.tasks = TaskRunner(self)
+    self.tasks.submit(get_deepflow_question, topic, previous,
+                      on_success=self.show_question,
+                      on_error=self.show_error,
+                      timeout_ms=30000)
+
+Callbacks always run on the main (GUI) thread, so they can touch widgets.
+Exactly one of success / error / timeout / cancel fires per task.
+"""
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+DEFAULT_TIMEOUT_MS = 30000
+
+
+class TaskSignals(QObject):
+    succeeded = Signal(object)
+    failed = Signal(str)
+    timed_out = Signal()
+    cancelled = Signal()
+    # Emitted when the pool thread is finished with the task, whatever the outcome
+    released = Signal()
+
+
+class BackgroundTask(QRunnable):
+    """
+    One call to `fn(*args, **kwargs)` on a pool thread.
+
+    A call that is already running can't be interrupted, so cancel() and
+    timeouts just stop waiting: the matching signal fires right away and the
+    late result is dropped when it arrives.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._lock = threading.Lock()
+        self._done = False
+
+    def _finish(self, signal, *payload):
+        """Emit `signal` unless another outcome already won."""
+        with self._lock:
+            if self._done:
+                return False
+            self._done = True
+        signal.emit(*payload)
+        return True
+
+    @property
+    def done(self):
+        return self._done
+
+    def cancel(self):
+        self._finish(self.signals.cancelled)
+
+    def expire(self):
+        self._finish(self.signals.timed_out)
+
+    def run(self):
+        try:
+            if self._done:
+                return  # cancelled before a thread picked it up
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                self._finish(self.signals.failed, str(e))
+            else:
+                self._finish(self.signals.succeeded, result)
+        finally:
+            self.signals.released.emit()
+
+
+class TaskRunner(QObject):
+    """Submits BackgroundTasks to a QThreadPool and wires up their callbacks."""
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._active = set()
+
+    def submit(self, fn, *args, on_success=None, on_error=None, on_timeout=None,
+               on_cancel=None, timeout_ms=DEFAULT_TIMEOUT_MS, **kwargs):
+        task = BackgroundTask(fn, *args, **kwargs)
+        signals = task.signals
+        for signal, callback in (
+            (signals.succeeded, on_success),
+            (signals.failed, on_error),
+            (signals.timed_out, on_timeout),
+            (signals.cancelled, on_cancel),
+        ):
+            if callback is not None:
+                signal.connect(callback)
+        # Hold a reference until the pool thread lets go, even after a
+        # cancel/timeout, so Qt never runs a deleted QRunnable
+        signals.released.connect(lambda t=task: self._forget(t))
+
+        if timeout_ms:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(task.expire)
+            signals.succeeded.connect(timer.stop)
+            signals.failed.connect(timer.stop)
+            signals.cancelled.connect(timer.stop)
+            timer.start(timeout_ms)
+            task.timer = timer
+
+        self._active.add(task)
+        self.pool.start(task)
+        return task
+
+    def _forget(self, task):
+        self._active.discard(task)
+        timer = getattr(task, "timer", None)
+        if timer is not None:
+            timer.deleteLater()
+            task.timer = None
+
+    def cancel_all(self):
+        for task in list(self._active):
+            task.cancel()
+
+    @property
+    def busy(self):
+        return any(not task.done for task in self._active)
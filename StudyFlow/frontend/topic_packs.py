@@ -0,0 +1,191 @@
+# topic_packs.py
+"""
+Offline DeepFlow topic packs on the desktop.
+
+A pack is one SQLite file per topic under config.DEEPFLOW_PACK_DIR:
+
+    meta(key, value)                    topic, version (last bank id synced)
+    questions(id, qhash, body)          body = zlib-compressed JSON question
+
+The file is opened with a memory map, so picking a question is a page
+lookup rather than a read into Python, and nothing but the chosen row is
+ever decompressed. sync_pack() asks the backend only for questions added
+since the stored version, so keeping a pack fresh costs one small request.
+
+    question = next_question("Renal physiology", previous_questions)
+    # -> a question dict from the local pack, or None to fall back to the API
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from urllib.parse import quote
+
+from StudyFlow import config
+from StudyFlow.logging_utils import debug_log
+
+MMAP_BYTES = 64 * 1024 * 1024
+SYNC_TIMEOUT = 20
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS questions (
+        id    INTEGER PRIMARY KEY,
+        qhash TEXT NOT NULL UNIQUE,
+        body  BLOB NOT NULL
+    );
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def topic_key(topic):
+    """Same normalisation as the backend bank: '  Renal   Physiology ' -> 'renal physiology'"""
+    return _WHITESPACE.sub(" ", str(topic)).strip().lower()
+
+
+def question_hash(text):
+    return hashlib.sha1(_WHITESPACE.sub(" ", str(text)).strip().lower().encode("utf-8")).hexdigest()
+
+
+def pack_path(topic):
+    key = topic_key(topic)
+    slug = re.sub(r"[^a-z0-9]+", "-", key).strip("-")[:60] or "topic"
+    # The hash keeps topics that slug the same apart
+    return os.path.join(config.DEEPFLOW_PACK_DIR, f"{slug}-{question_hash(key)[:8]}.sqlite")
+
+
+class TopicPack:
+    """One topic's local question store."""
+
+    def __init__(self, topic):
+        self.topic = topic_key(topic)
+        self.path = pack_path(topic)
+        self._lock = threading.Lock()  # the GUI thread and sync workers share the connection
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @property
+    def version(self):
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def add(self, questions, version):
+        """Store a delta from the backend and move the pack to `version`."""
+        rows = [
+            (q["id"], question_hash(q["question"]), zlib.compress(json.dumps({
+                "question": q["question"],
+                "options": q["options"],
+                "correct_index": q["correct_index"],
+                "explanation": q.get("explanation", ""),
+            }, separators=(",", ":")).encode("utf-8"), 9))
+            for q in questions
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO questions (id, qhash, body) VALUES (?, ?, ?)", rows)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("topic", self.topic), ("version", str(version))],
+                )
+
+    def random_question(self, exclude=()):
+        """A random question whose text isn't in `exclude`, or None when the pack has run out."""
+        hashes = [question_hash(q) for q in exclude]
+        placeholders = ",".join("?" * len(hashes))
+        sql = "SELECT body FROM questions"
+        if hashes:
+            sql += f" WHERE qhash NOT IN ({placeholders})"
+        sql += " ORDER BY random() LIMIT 1"
+        with self._lock:
+            row = self._connect().execute(sql, hashes).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_packs = {}
+_packs_lock = threading.Lock()
+
+
+def get_pack(topic):
+    """Open (once per process) the pack for `topic`, or None if it was never downloaded."""
+    key = topic_key(topic)
+    with _packs_lock:
+        if key not in _packs:
+            if not os.path.exists(pack_path(key)):
+                return None
+            _packs[key] = TopicPack(key)
+        return _packs[key]
+
+
+def next_question(topic, previous_questions=()):
+    """A question from the local pack for `topic`, or None (no pack, or all of it seen)."""
+    try:
+        pack = get_pack(topic)
+        return pack.random_question(previous_questions) if pack is not None else None
+    except sqlite3.Error as e:
+        debug_log(f"⚠️ DeepFlow pack for '{topic}' unreadable: {e}")
+        return None
+
+
+# ---------------------------------------------------------------
+# Sync with the backend
+# ---------------------------------------------------------------
+def available_packs():
+    """[{"topic", "title", "questions", "version"}] the backend offers."""
+    import requests
+    response = requests.get(f"{config.BACKEND_URL}/api/deepflow/packs", timeout=SYNC_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["packs"]
+
+
+def sync_pack(topic):
+    """Download questions added since the local version. Returns how many arrived."""
+    import requests
+    key = topic_key(topic)
+    pack = get_pack(key)
+    received = 0
+    with requests.Session() as session:
+        while True:
+            response = session.get(
+                f"{config.BACKEND_URL}/api/deepflow/packs/{quote(key)}",
+                params={"since": pack.version if pack else 0}, timeout=SYNC_TIMEOUT,
+            )
+            response.raise_for_status()
+            delta = response.json()
+            if not delta["questions"]:
+                break
+            if pack is None:
+                # First questions for this topic: only now create the file
+                with _packs_lock:
+                    pack = _packs.setdefault(key, TopicPack(key))
+            pack.add(delta["questions"], delta["version"])
+            received += len(delta["questions"])
+            if delta["complete"]:
+                break
+    if pack is not None:
+        debug_log(f"📦 DeepFlow pack '{key}': +{received} questions, {len(pack)} total (v{pack.version})")
+    return received